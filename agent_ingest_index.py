@@ -1 +1,370 @@
-# TODO: implement agent ingest
+# Bulk ingest of the local library into Weaviate
+"""Push chunks with precomputed vectors to Weaviate's batch API.
+
+Extraction, splitting and embedding are shared with ``ingest_books``; objects
+get deterministic UUIDs (``uuid5`` of ``source#chunk``) so retried or resumed
+batches overwrite instead of duplicating. Completed files are recorded in a
+checkpoint manifest, so an interrupted run picks up where it stopped:
+
+    python agent_ingest_index.py --workers 4 --batch-size 200
+
+The vectors must come from the same model as the Weaviate class vectorizer
+(e.g. ``USE_OPENAI_EMBEDDINGS=true`` with ``text2vec-openai``) for
+``nearText`` queries to match them.
+"""
+import argparse
+import os
+import random
+import threading
+import time
+import uuid
+from concurrent.futures import ThreadPoolExecutor
+from pathlib import Path
+from typing import Any, Callable, Dict, Iterable, List, Optional, Tuple
+
+import requests
+
+import ingest_books
+from agent_retriever_http_fix import WeaviateRetriever, WeaviateUnavailable
+from app.manifest import IngestManifest, ManifestEntry, hash_file
+
+CHECKPOINT_FILENAME = "weaviate_checkpoint.json"
+DEFAULT_BATCH_SIZE = 100
+MAX_BATCH_SIZE = 1000
+MIN_BATCH_SIZE = 10
+TARGET_BATCH_SECONDS = 2.0
+
+BatchItem = Tuple[str, Dict[str, Any]]
+
+
+def object_id(source: str, index: int) -> str:
+    return str(uuid.uuid5(uuid.NAMESPACE_URL, f"{source}#{index}"))
+
+
+class BatchSizer:
+    """Grow batches while requests finish well under target time; halve on slow or failed ones."""
+
+    def __init__(
+        self,
+        initial: int = DEFAULT_BATCH_SIZE,
+        minimum: int = MIN_BATCH_SIZE,
+        maximum: int = MAX_BATCH_SIZE,
+        target_seconds: float = TARGET_BATCH_SECONDS,
+    ):
+        self.minimum = max(1, minimum)
+        self.maximum = max(self.minimum, maximum)
+        self.size = min(max(initial, self.minimum), self.maximum)
+        self.target_seconds = target_seconds
+        self._lock = threading.Lock()
+
+    def observe(self, seconds: float, ok: bool) -> None:
+        with self._lock:
+            if not ok or seconds > self.target_seconds:
+                self.size = max(self.minimum, self.size // 2)
+            elif seconds < self.target_seconds / 2:
+                self.size = min(self.maximum, int(self.size * 1.5) + 1)
+
+
+class BatchUploader:
+    """Send objects to ``/v1/batch/objects`` from a pool of workers, retrying failed objects.
+
+    ``finish_source`` registers a callback that fires once every object of that
+    source has been acknowledged (``ok`` is False if any object gave up).
+    """
+
+    def __init__(
+        self,
+        retriever: WeaviateRetriever,
+        *,
+        workers: int = 4,
+        sizer: Optional[BatchSizer] = None,
+        max_retries: int = 5,
+        backoff: float = 0.5,
+    ):
+        self.retriever = retriever
+        self.sizer = sizer or BatchSizer()
+        self.max_retries = max_retries
+        self.backoff = backoff
+        self.workers = max(1, workers)
+        self._pool = ThreadPoolExecutor(max_workers=self.workers, thread_name_prefix="weaviate")
+        self._slots = threading.BoundedSemaphore(self.workers * 2)
+        self._lock = threading.Lock()
+        self._buffer: List[BatchItem] = []
+        self._outstanding: Dict[str, int] = {}
+        self._failed_sources: set = set()
+        self._callbacks: Dict[str, Callable[[bool], None]] = {}
+        self.stats = {"objects": 0, "batches": 0, "retried": 0, "failed": 0}
+
+    def add(self, source: str, objects: Iterable[Dict[str, Any]]) -> None:
+        for obj in objects:
+            with self._lock:
+                self._outstanding[source] = self._outstanding.get(source, 0) + 1
+            self._buffer.append((source, obj))
+            if len(self._buffer) >= self.sizer.size:
+                self.flush()
+
+    def finish_source(self, source: str, callback: Callable[[bool], None]) -> None:
+        with self._lock:
+            if self._outstanding.get(source, 0) > 0:
+                self._callbacks[source] = callback
+                return
+            ok = source not in self._failed_sources
+        callback(ok)
+
+    def flush(self) -> None:
+        if not self._buffer:
+            return
+        batch, self._buffer = self._buffer, []
+        self._slots.acquire()  # bound memory: at most 2 batches per worker queued
+        future = self._pool.submit(self._send, batch)
+        future.add_done_callback(lambda _: self._slots.release())
+
+    def close(self) -> None:
+        self.flush()
+        self._pool.shutdown(wait=True)
+
+    def _post(
+        self, items: List[BatchItem]
+    ) -> Tuple[Optional[List[BatchItem]], Optional[float]]:
+        """Return ``(failed_items, retry_after)``; ``failed_items`` is None if not retryable."""
+        self.retriever.ensure_ready()
+        resp = self.retriever.session.post(
+            f"{self.retriever.url}/v1/batch/objects",
+            json={"objects": [obj for _, obj in items]},
+            timeout=max(self.retriever.timeout, 60.0),
+        )
+        if resp.status_code == 429 or resp.status_code >= 500:
+            retry_after = resp.headers.get("Retry-After")
+            return items, float(retry_after) if retry_after else None
+        if resp.status_code >= 400:
+            print(f"⚠️ Weaviate rejected a batch ({resp.status_code}): {resp.text[:200]}")
+            return None, None
+        results = resp.json()
+        if not isinstance(results, list):
+            results = []
+        failed = [
+            item
+            for item, result in zip(items, results)
+            if ((result or {}).get("result") or {}).get("errors")
+        ]
+        # Objects Weaviate returned no result for are not known to be stored.
+        failed.extend(items[len(results) :])
+        return failed, None
+
+    def _send(self, batch: List[BatchItem]) -> None:
+        """Upload ``batch``; whatever is not acknowledged as stored is acknowledged as failed."""
+        pending = batch
+        attempt = 0
+        try:
+            while pending:
+                started = time.monotonic()
+                try:
+                    failed, retry_after = self._post(pending)
+                except (requests.RequestException, WeaviateUnavailable):
+                    failed, retry_after = pending, None
+                self.sizer.observe(time.monotonic() - started, ok=not failed)
+                if failed is None:
+                    break
+                failed_ids = {id(item) for item in failed}
+                stored = [item for item in pending if id(item) not in failed_ids]
+                pending = failed
+                self._acknowledge(stored, ok=True)
+                attempt += 1
+                if not pending or attempt > self.max_retries:
+                    break
+                with self._lock:
+                    self.stats["retried"] += len(pending)
+                if retry_after is None:
+                    retry_after = self.backoff * (2 ** (attempt - 1)) * (0.5 + random.random())
+                time.sleep(retry_after)
+        except Exception as exc:
+            print(f"⚠️ Weaviate batch of {len(pending)} objects failed ({exc!r}).")
+        self._acknowledge(pending, ok=False)
+        with self._lock:
+            self.stats["batches"] += 1
+
+    def _acknowledge(self, items: List[BatchItem], ok: bool) -> None:
+        ready: List[Tuple[Callable[[bool], None], bool]] = []
+        with self._lock:
+            for source, _ in items:
+                if ok:
+                    self.stats["objects"] += 1
+                else:
+                    self.stats["failed"] += 1
+                    self._failed_sources.add(source)
+                self._outstanding[source] -= 1
+                if self._outstanding[source] == 0:
+                    del self._outstanding[source]
+                    callback = self._callbacks.pop(source, None)
+                    if callback is not None:
+                        ready.append((callback, source not in self._failed_sources))
+        for callback, source_ok in ready:
+            try:
+                callback(source_ok)
+            except Exception as exc:  # pragma: no cover - defensive
+                print(f"⚠️ Source callback failed ({exc!r}).")
+
+
+def _delete_tail(retriever: WeaviateRetriever, source: str, keep: int, previous: int) -> None:
+    """Delete chunks ``keep..previous-1`` of ``source`` left over from a longer version.
+
+    Objects are deleted by their deterministic ids: a ``where`` filter on the
+    word-tokenized ``source`` property would also match other paths with the
+    same words (``books/pricing.md`` and ``books/advanced/pricing.md``).
+    """
+    retriever.ensure_ready()
+    for index in range(keep, previous):
+        resp = retriever.session.delete(
+            f"{retriever.url}/v1/objects/{retriever.class_name}/{object_id(source, index)}",
+            timeout=retriever.timeout,
+        )
+        if resp.status_code != 404:
+            resp.raise_for_status()
+
+
+def checkpoint_path() -> Path:
+    return ingest_books.settings.embeddings_path / CHECKPOINT_FILENAME
+
+
+def ingest_to_weaviate(
+    source_dirs: Optional[List[Path]] = None,
+    *,
+    retriever: Optional[WeaviateRetriever] = None,
+    workers: int = 4,
+    batch_size: int = DEFAULT_BATCH_SIZE,
+    max_batch_size: int = MAX_BATCH_SIZE,
+    checkpoint: Optional[Path] = None,
+    force: bool = False,
+) -> Dict[str, Any]:
+    retriever = retriever or WeaviateRetriever.from_env()
+    if retriever is None:
+        raise RuntimeError("Set WEAVIATE_URL and OPENAI_API_KEY to ingest into Weaviate.")
+    directories = source_dirs or ingest_books.SOURCE_DIRS
+    manifest = IngestManifest.load(checkpoint or checkpoint_path())
+    model = ingest_books.embedding_model_id()
+    splitter = ingest_books.make_splitter()
+    manifest_lock = threading.Lock()
+    uploader = BatchUploader(
+        retriever,
+        workers=workers,
+        sizer=BatchSizer(initial=batch_size, maximum=max_batch_size),
+    )
+    stats = {"files": 0, "chunks": 0, "skipped": 0, "failed_files": 0}
+
+    def completed(
+        src: str, entry: ManifestEntry, previous: Optional[int]
+    ) -> Callable[[bool], None]:
+        def done(ok: bool) -> None:
+            if not ok:
+                with manifest_lock:
+                    stats["failed_files"] += 1
+                print(f"⚠️ {src}: some objects failed; it will be retried on the next run.")
+                return
+            try:
+                if previous is not None and previous > entry.chunks:
+                    _delete_tail(retriever, src, entry.chunks, previous)
+            except requests.RequestException as exc:  # pragma: no cover - defensive
+                print(f"⚠️ {src}: could not delete stale chunks ({exc}).")
+                return
+            with manifest_lock:
+                manifest.record(src, entry)
+                manifest.save()
+
+        return done
+
+    for path, base_dir in ingest_books.iter_source_files(directories):
+        src = ingest_books.source_key(path, base_dir)
+        stat = path.stat()
+        entry = manifest.get(src)
+        if not force and entry is not None and entry.is_fresh(stat, model):
+            stats["skipped"] += 1
+            continue
+        sha256 = hash_file(path)
+        if not force and entry is not None and entry.matches(sha256, model):
+            with manifest_lock:
+                manifest.touch(src, stat)
+            stats["skipped"] += 1
+            continue
+
+        location_key = ingest_books.location_key(path)
+        count = 0
+        error = None
+        for index, (start, stop) in enumerate(ingest_books.plan_windows(path)):
+            window = ingest_books.extract_window(path, index, start, stop, splitter)
+            if window.error:
+                error = window.error
+                break
+            try:
+                vectors = ingest_books.embed_chunks(window.chunks)
+            except Exception as exc:
+                error = f"embedding failed: {exc}"
+                break
+            objects = []
+            for text, location, vector in zip(window.chunks, window.locations, vectors):
+                properties = {"content": text, "source": src, "chunk": count}
+                if location_key and location is not None:
+                    properties[location_key] = location
+                objects.append(
+                    {
+                        "class": retriever.class_name,
+                        "id": object_id(src, count),
+                        "properties": properties,
+                        "vector": list(vector),
+                    }
+                )
+                count += 1
+            uploader.add(src, objects)
+        if error is not None:
+            # Not checkpointed: the next run retries the whole file.
+            with manifest_lock:
+                stats["failed_files"] += 1
+            print(f"⚠️ {src}: ingestion failed ({error}).")
+            continue
+        record = ManifestEntry(
+            path=path.as_posix(),
+            base=base_dir.as_posix(),
+            size=stat.st_size,
+            mtime_ns=stat.st_mtime_ns,
+            sha256=sha256,
+            chunks=count,
+            embedding_model=model,
+        )
+        uploader.finish_source(src, completed(src, record, entry.chunks if entry else None))
+        stats["files"] += 1
+        stats["chunks"] += count
+        print(f"📦 {src}: {count} chunks queued for Weaviate.")
+
+    uploader.close()
+    with manifest_lock:
+        manifest.save()
+    print(
+        f"✅ Weaviate ingest: {stats['files']} files, {uploader.stats['objects']} objects in "
+        f"{uploader.stats['batches']} batches ({uploader.stats['retried']} retried, "
+        f"{uploader.stats['failed']} failed), {stats['skipped']} files unchanged."
+    )
+    return {**stats, **uploader.stats, "batch_size": uploader.sizer.size}
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Bulk ingest the local library into Weaviate.")
+    parser.add_argument(
+        "--workers", type=int, default=int(os.getenv("WEAVIATE_INGEST_WORKERS", "4"))
+    )
+    parser.add_argument("--batch-size", type=int, default=DEFAULT_BATCH_SIZE)
+    parser.add_argument("--max-batch-size", type=int, default=MAX_BATCH_SIZE)
+    parser.add_argument("--checkpoint", type=Path, default=None)
+    parser.add_argument(
+        "--force", action="store_true", help="Re-upload files already in the checkpoint."
+    )
+    args = parser.parse_args()
+    ingest_to_weaviate(
+        workers=args.workers,
+        batch_size=args.batch_size,
+        max_batch_size=args.max_batch_size,
+        checkpoint=args.checkpoint,
+        force=args.force,
+    )
+
+
+if __name__ == "__main__":
+    main()
@@ -1,6 +1,167 @@
 # Agent retriever implementation using Weaviate
+import json
 import os
-import weaviate
+import threading
+import time
+from typing import Any, Dict, List, Optional, Sequence
+
+import requests
+from requests.adapters import HTTPAdapter
+
+from app.config import _int
+
+
+class WeaviateUnavailable(RuntimeError):
+    """Raised when Weaviate does not report ready, even after reconnecting."""
+
+
+class WeaviateRetriever:
+    """
+    Long-lived near-text retriever talking to Weaviate's REST/GraphQL API.
+
+    One keep-alive ``requests.Session`` (with a bounded connection pool) is
+    created lazily and shared by every call; readiness is re-checked at most
+    every ``health_interval`` seconds, and a failed check rebuilds the session
+    before giving up.
+    """
+
+    def __init__(
+        self,
+        url: str,
+        *,
+        openai_api_key: Optional[str] = None,
+        api_key: Optional[str] = None,
+        class_name: str = "Document",
+        properties: Sequence[str] = ("content",),
+        limit: int = 1,
+        timeout: float = 10.0,
+        pool_size: int = 10,
+        health_interval: float = 30.0,
+    ):
+        self.url = url.rstrip("/")
+        self.class_name = class_name
+        self.properties = list(properties)
+        self.limit = max(1, limit)
+        self.timeout = timeout
+        self.pool_size = pool_size
+        self.health_interval = health_interval
+        self.headers = {"Content-Type": "application/json"}
+        if openai_api_key:
+            self.headers["X-OpenAI-Api-Key"] = openai_api_key
+        if api_key:
+            self.headers["Authorization"] = f"Bearer {api_key}"
+        self._session: Optional[requests.Session] = None
+        self._checked_at = 0.0
+        self._lock = threading.Lock()
+        self.sessions_created = 0
+
+    @classmethod
+    def from_env(cls) -> Optional["WeaviateRetriever"]:
+        weaviate_url = os.getenv("WEAVIATE_URL")
+        openai_api_key = os.getenv("OPENAI_API_KEY")
+        if not weaviate_url or not openai_api_key:
+            return None
+        return cls(
+            weaviate_url,
+            openai_api_key=openai_api_key,
+            api_key=os.getenv("WEAVIATE_API_KEY"),
+            class_name=os.getenv("WEAVIATE_CLASS", "Document"),
+            limit=_int(os.getenv("WEAVIATE_LIMIT"), 1),
+        )
+
+    def _new_session(self) -> requests.Session:
+        session = requests.Session()
+        adapter = HTTPAdapter(pool_connections=1, pool_maxsize=self.pool_size)
+        session.mount("http://", adapter)
+        session.mount("https://", adapter)
+        session.headers.update(self.headers)
+        self.sessions_created += 1
+        return session
+
+    @property
+    def session(self) -> requests.Session:
+        if self._session is None:
+            with self._lock:
+                if self._session is None:
+                    self._session = self._new_session()
+        return self._session
+
+    def is_ready(self) -> bool:
+        try:
+            resp = self.session.get(f"{self.url}/v1/.well-known/ready", timeout=self.timeout)
+            return resp.status_code == 200
+        except requests.RequestException:
+            return False
+
+    def ensure_ready(self) -> None:
+        if time.monotonic() - self._checked_at < self.health_interval:
+            return
+        if not self.is_ready():
+            # Drop pooled connections (they may point at a dead node) and try once more.
+            self.reset()
+            if not self.is_ready():
+                raise WeaviateUnavailable(f"Weaviate at {self.url} is not ready.")
+        self._checked_at = time.monotonic()
+
+    def reset(self) -> None:
+        with self._lock:
+            if self._session is not None:
+                self._session.close()
+            self._session = None
+            self._checked_at = 0.0
+
+    close = reset
+
+    def _graphql(self, question: str, limit: int) -> str:
+        fields = " ".join(self.properties)
+        return (
+            f"{{ Get {{ {self.class_name}(nearText: {{concepts: [{json.dumps(question)}]}}, "
+            f"limit: {int(limit)}) {{ {fields} _additional {{ distance }} }} }} }}"
+        )
+
+    def _documents(self, payload: Dict[str, Any]) -> List[Dict[str, Any]]:
+        if payload.get("errors"):
+            raise RuntimeError(payload["errors"][0].get("message", "GraphQL error"))
+        return ((payload.get("data") or {}).get("Get") or {}).get(self.class_name) or []
+
+    def _post(self, path: str, body: Any) -> Any:
+        self.ensure_ready()
+        try:
+            resp = self.session.post(f"{self.url}{path}", json=body, timeout=self.timeout)
+        except requests.ConnectionError:
+            self.reset()
+            self.ensure_ready()
+            resp = self.session.post(f"{self.url}{path}", json=body, timeout=self.timeout)
+        resp.raise_for_status()
+        return resp.json()
+
+    def search(self, question: str, limit: Optional[int] = None) -> List[Dict[str, Any]]:
+        payload = self._post("/v1/graphql", {"query": self._graphql(question, limit or self.limit)})
+        return self._documents(payload)
+
+    def search_many(
+        self, questions: Sequence[str], limit: Optional[int] = None
+    ) -> List[List[Dict[str, Any]]]:
+        """Run one near-text query per question in a single ``/v1/graphql/batch`` request."""
+        if not questions:
+            return []
+        body = [{"query": self._graphql(question, limit or self.limit)} for question in questions]
+        payloads = self._post("/v1/graphql/batch", body)
+        return [self._documents(payload) for payload in payloads]
+
+
+_retriever: Optional[WeaviateRetriever] = None
+_retriever_lock = threading.Lock()
+
+
+def get_retriever() -> Optional[WeaviateRetriever]:
+    """Process-wide retriever built from env vars on first use (None when unconfigured)."""
+    global _retriever
+    if _retriever is None:
+        with _retriever_lock:
+            if _retriever is None:
+                _retriever = WeaviateRetriever.from_env()
+    return _retriever
 
 
 def ask_agent(question: str) -> str:
@@ -8,20 +169,13 @@ def ask_agent(question: str) -> str:
     Handle questions for the agent by querying the Weaviate instance.
     Returns the most relevant piece of text from the knowledge base or a fallback message.
     """
-    weaviate_url = os.getenv("WEAVIATE_URL")
-    openai_api_key = os.getenv("OPENAI_API_KEY")
-    if not weaviate_url or not openai_api_key:
+    retriever = get_retriever()
+    if retriever is None:
         return "Agent is not configured with Weaviate URL or OpenAI API key."
     try:
-        client = weaviate.Client(
-            url=weaviate_url,
-            additional_headers={"X-OpenAI-Api-Key": openai_api_key},
-        )
-        # Query the knowledge base using a simple near text search. Adjust class and property names as needed.
-        result = client.query.get("Document", ["content"]).with_near_text({"concepts": [question]}).with_limit(1).do()
-        docs = result.get("data", {}).get("Get", {}).get("Document", [])
+        docs = retriever.search(question)
         if docs:
-            return docs[0].get("content", "")
+            return "\n\n".join(doc.get("content", "") for doc in docs)
         else:
             return "I couldn't find an answer in the knowledge base."
     except Exception as e:
@@ -0,0 +1,154 @@
+from __future__ import annotations
+
+import math
+from pathlib import Path
+from typing import Callable, Optional, Tuple, Union
+
+import numpy as np
+
+# Returns float32 vectors for a slice or an array of store rows.
+FetchFn = Callable[[Union[slice, np.ndarray]], np.ndarray]
+ASSIGN_BLOCK_ROWS = 1 << 16
+TRAIN_SAMPLES_PER_LIST = 64
+MAX_TRAIN_SAMPLES = 200_000
+
+
+def default_nlist(rows: int) -> int:
+    return max(1, min(65536, int(round(4 * math.sqrt(max(rows, 1))))))
+
+
+def _normalize(matrix: np.ndarray) -> np.ndarray:
+    norms = np.linalg.norm(matrix, axis=1, keepdims=True)
+    norms[norms == 0] = 1.0
+    return matrix / norms
+
+
+def nearest_centroids(vectors: np.ndarray, centroids: np.ndarray, block: int = 8192) -> np.ndarray:
+    """Index of the most similar centroid per row, computed in blocks to bound memory."""
+    out = np.empty(len(vectors), dtype=np.int32)
+    for start in range(0, len(vectors), block):
+        out[start : start + block] = np.argmax(vectors[start : start + block] @ centroids.T, axis=1)
+    return out
+
+
+def spherical_kmeans(
+    sample: np.ndarray, nlist: int, iterations: int = 10, seed: int = 0
+) -> np.ndarray:
+    """Unit-norm centroids for ``sample`` (rows already unit length)."""
+    rng = np.random.default_rng(seed)
+    nlist = min(nlist, len(sample))
+    centroids = sample[rng.choice(len(sample), nlist, replace=False)].copy()
+    for _ in range(iterations):
+        assign = nearest_centroids(sample, centroids)
+        order = np.argsort(assign, kind="stable")
+        counts = np.bincount(assign, minlength=nlist)
+        starts = np.concatenate([[0], np.cumsum(counts)[:-1]])
+        filled = counts > 0
+        sums = np.add.reduceat(sample[order], starts[filled], axis=0)
+        centroids[filled] = _normalize(sums)
+        empty = np.flatnonzero(~filled)
+        if len(empty):
+            centroids[empty] = sample[rng.choice(len(sample), len(empty), replace=False)]
+    return centroids.astype(np.float32)
+
+
+class IVFIndex:
+    """Inverted-file index over the rows of a ``NumpyStore``.
+
+    ``ivf_centroids.npy`` holds the coarse quantizer and ``ivf_assign.bin`` one
+    int32 list id per store row (-1 until assigned). New rows are assigned as
+    they are written; ``train`` re-clusters everything when the corpus outgrows
+    the centroids.
+    """
+
+    def __init__(self, path: Path):
+        self.centroids_path = path / "ivf_centroids.npy"
+        self.assign_path = path / "ivf_assign.bin"
+        self.centroids: Optional[np.ndarray] = None
+        self._centroids_mtime: Optional[int] = None
+
+    @property
+    def trained(self) -> bool:
+        return self.centroids_path.exists()
+
+    def load_centroids(self) -> Optional[np.ndarray]:
+        if not self.trained:
+            return None
+        mtime = self.centroids_path.stat().st_mtime_ns
+        if self.centroids is None or mtime != self._centroids_mtime:
+            self.centroids = np.load(self.centroids_path)
+            self._centroids_mtime = mtime
+        return self.centroids
+
+    def _write_assign(self, rows: np.ndarray, lists: np.ndarray, total: int) -> None:
+        with open(self.assign_path, "ab") as handle:
+            current = handle.tell() // 4
+            if current < total:
+                handle.write(np.full(total - current, -1, dtype=np.int32).tobytes())
+        assign = np.memmap(self.assign_path, dtype=np.int32, mode="r+", shape=(total,))
+        assign[rows] = lists
+        assign.flush()
+        del assign
+
+    def assign(self, rows: np.ndarray, vectors: np.ndarray, total: int) -> None:
+        """Record the nearest list of freshly written ``rows`` (no-op until trained)."""
+        if self.load_centroids() is None or not len(rows):
+            return
+        self._write_assign(rows, nearest_centroids(_normalize(vectors), self.centroids), total)
+
+    def train(self, fetch: FetchFn, live: np.ndarray, nlist: int = 0, seed: int = 0) -> int:
+        rows = np.flatnonzero(live)
+        if not len(rows):
+            return 0
+        nlist = min(nlist or default_nlist(len(rows)), len(rows))
+        rng = np.random.default_rng(seed)
+        size = min(len(rows), MAX_TRAIN_SAMPLES, max(nlist * TRAIN_SAMPLES_PER_LIST, nlist))
+        picked = np.sort(rng.choice(rows, size, replace=False))
+        sample = _normalize(fetch(picked))
+        self.centroids = spherical_kmeans(sample, nlist, seed=seed)
+        total = len(live)
+        lists = np.full(total, -1, dtype=np.int32)
+        for start in range(0, total, ASSIGN_BLOCK_ROWS):
+            stop = min(total, start + ASSIGN_BLOCK_ROWS)
+            lists[start:stop] = nearest_centroids(
+                _normalize(fetch(slice(start, stop))), self.centroids
+            )
+        lists[~live] = -1
+        tmp_assign = self.assign_path.with_suffix(".tmp")
+        lists.tofile(tmp_assign)
+        tmp_assign.replace(self.assign_path)
+        with open(self.centroids_path.with_suffix(".tmp"), "wb") as handle:
+            np.save(handle, self.centroids)
+        self.centroids_path.with_suffix(".tmp").replace(self.centroids_path)
+        self._centroids_mtime = self.centroids_path.stat().st_mtime_ns
+        return len(self.centroids)
+
+    def lists(self, live: np.ndarray) -> Optional[Tuple[np.ndarray, np.ndarray]]:
+        """``(rows_by_list, offsets)``: live rows grouped by list, ``offsets[i]:offsets[i+1]``."""
+        centroids = self.load_centroids()
+        if centroids is None or not self.assign_path.exists():
+            return None
+        total = len(live)
+        stored = min(total, self.assign_path.stat().st_size // 4)
+        assign = np.full(total, -1, dtype=np.int32)
+        if stored:
+            assign[:stored] = np.fromfile(self.assign_path, dtype=np.int32, count=stored)
+        rows = np.flatnonzero(live & (assign >= 0))
+        if len(rows) < live.sum():
+            return None  # rows written before training; search exactly until retrained
+        order = rows[np.argsort(assign[rows], kind="stable")]
+        offsets = np.searchsorted(assign[order], np.arange(len(centroids) + 1))
+        return order, offsets
+
+    def candidates(
+        self, queries: np.ndarray, lists: Tuple[np.ndarray, np.ndarray], nprobe: int
+    ) -> list:
+        """Candidate rows per query from the ``nprobe`` closest lists."""
+        order, offsets = lists
+        centroid_scores = queries @ self.centroids.T
+        nprobe = max(1, min(nprobe, centroid_scores.shape[1]))
+        probes = np.argpartition(-centroid_scores, nprobe - 1, axis=1)[:, :nprobe]
+        return [
+            np.concatenate([order[offsets[idx] : offsets[idx + 1]] for idx in probe])
+            for probe in probes
+        ]
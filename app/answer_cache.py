@@ -0,0 +1,135 @@
+from __future__ import annotations
+
+import hashlib
+import json
+import sqlite3
+import threading
+import time
+from pathlib import Path
+from typing import Any, Dict, Optional, Sequence
+
+import numpy as np
+
+from app.config import Settings, get_settings
+
+CACHE_FILENAME = "answer_cache.sqlite3"
+
+
+def answer_key(
+    model: str, config: Dict[str, Any], contexts: Sequence[Dict[str, Any]]
+) -> str:
+    """Exact-match part of the cache key: generation settings plus the retrieved chunks."""
+    digest = hashlib.sha1()
+    digest.update(
+        json.dumps(
+            [model, config.get("top_k"), config.get("temperature"), config.get("max_tokens")]
+        ).encode("utf-8")
+    )
+    for ctx in contexts:
+        digest.update(str(ctx.get("id")).encode("utf-8"))
+        digest.update(hashlib.sha1((ctx.get("text") or "").encode("utf-8")).digest())
+    return digest.hexdigest()
+
+
+class AnswerCache:
+    """Persistent semantic cache of LLM answers.
+
+    Answers are only reused for the same exact key (see ``answer_key``) and a
+    question embedding within ``threshold`` cosine similarity.
+    """
+
+    def __init__(self, path: Path, threshold: float, max_entries: int):
+        self.path = path
+        self.threshold = threshold
+        self.max_entries = max_entries
+        self.hits = 0
+        self.misses = 0
+        self._lock = threading.Lock()
+        path.parent.mkdir(parents=True, exist_ok=True)
+        self._conn = sqlite3.connect(path.as_posix(), timeout=30, check_same_thread=False)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute(
+            "CREATE TABLE IF NOT EXISTS answers ("
+            " id INTEGER PRIMARY KEY, key TEXT NOT NULL, question TEXT NOT NULL,"
+            " embedding BLOB NOT NULL, payload TEXT NOT NULL, last_used REAL NOT NULL)"
+        )
+        self._conn.execute("CREATE INDEX IF NOT EXISTS answers_key ON answers(key)")
+        self._conn.execute("CREATE INDEX IF NOT EXISTS answers_last_used ON answers(last_used)")
+        self._conn.commit()
+
+    @staticmethod
+    def _unit(embedding: Sequence[float]) -> np.ndarray:
+        vector = np.asarray(embedding, dtype=np.float32)
+        norm = float(np.linalg.norm(vector))
+        return vector / norm if norm else vector
+
+    def lookup(self, key: str, embedding: Sequence[float]) -> Optional[Dict[str, Any]]:
+        query = self._unit(embedding)
+        with self._lock:
+            rows = self._conn.execute(
+                "SELECT id, question, embedding, payload FROM answers WHERE key = ?", (key,)
+            ).fetchall()
+            if rows:
+                matrix = np.stack([np.frombuffer(row[2], dtype=np.float32) for row in rows])
+                similarities = matrix @ query
+                best = int(np.argmax(similarities))
+                if float(similarities[best]) >= self.threshold:
+                    row_id, question, _, payload = rows[best]
+                    self._conn.execute(
+                        "UPDATE answers SET last_used = ? WHERE id = ?", (time.time(), row_id)
+                    )
+                    self._conn.commit()
+                    self.hits += 1
+                    result = json.loads(payload)
+                    result["cached_question"] = question
+                    result["similarity"] = float(similarities[best])
+                    return result
+            self.misses += 1
+            return None
+
+    def store(
+        self, key: str, question: str, embedding: Sequence[float], payload: Dict[str, Any]
+    ) -> None:
+        with self._lock:
+            self._conn.execute(
+                "INSERT INTO answers (key, question, embedding, payload, last_used)"
+                " VALUES (?, ?, ?, ?, ?)",
+                (key, question, self._unit(embedding).tobytes(), json.dumps(payload), time.time()),
+            )
+            overflow = (
+                self._conn.execute("SELECT COUNT(*) FROM answers").fetchone()[0] - self.max_entries
+            )
+            if overflow > 0:
+                self._conn.execute(
+                    "DELETE FROM answers WHERE id IN"
+                    " (SELECT id FROM answers ORDER BY last_used LIMIT ?)",
+                    (overflow,),
+                )
+            self._conn.commit()
+
+    def stats(self) -> Dict[str, float]:
+        lookups = self.hits + self.misses
+        return {
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_rate": self.hits / lookups if lookups else 0.0,
+        }
+
+
+_caches: Dict[Path, AnswerCache] = {}
+_caches_lock = threading.Lock()
+
+
+def get_answer_cache(settings: Optional[Settings] = None) -> Optional[AnswerCache]:
+    settings = settings or get_settings()
+    if not settings.answer_cache:
+        return None
+    path = settings.embeddings_path / CACHE_FILENAME
+    with _caches_lock:
+        if path not in _caches:
+            _caches[path] = AnswerCache(
+                path,
+                threshold=settings.answer_cache_threshold,
+                max_entries=settings.answer_cache_max_entries,
+            )
+        return _caches[path]
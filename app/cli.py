@@ -1,14 +1,25 @@
 from __future__ import annotations
 
+import json
 import subprocess
+import sys
 from pathlib import Path
-from typing import Iterable, Optional
+from typing import Iterable, Iterator, List, Optional
+from urllib.parse import urlsplit
 
 import typer
 
 from app.config import get_settings
 from app.llm import get_chat_llm
-from app.query_engine import answer_with_context
+from app.query_engine import (
+    answer_with_context,
+    answer_with_context_stream,
+    cache_stats,
+    iter_answers,
+    set_nprobe,
+    set_retrieval_mode,
+    warmup,
+)
 from ingest_books import SOURCE_DIRS, ingest_all
 
 cli = typer.Typer(help="JosefGPT Local command line interface.")
@@ -21,16 +32,58 @@ def ingest(
         "--source-dir",
         "-s",
         help="Override source directories (can be passed multiple times).",
-    )
+    ),
+    force: bool = typer.Option(
+        False,
+        "--force",
+        "-f",
+        help="Re-ingest every file, ignoring the ingest manifest.",
+    ),
+    workers: Optional[int] = typer.Option(
+        None,
+        "--workers",
+        "-w",
+        help="Extraction/splitting worker processes (defaults to INGEST_WORKERS).",
+    ),
+    embed_batch_size: Optional[int] = typer.Option(
+        None,
+        "--embed-batch-size",
+        help="Chunks per cross-file embedding batch (defaults to EMBED_BATCH_SIZE).",
+    ),
 ):
     """Ingest knowledge sources into the local ChromaDB store."""
     directories: Iterable[Path] = source_dir or SOURCE_DIRS
     typer.echo("📥 Starting ingestion...")
-    result = ingest_all(directories)
+    result = ingest_all(
+        directories,
+        force=force,
+        workers=workers,
+        embed_batch_size=embed_batch_size,
+    )
     typer.echo(
         f"🏁 Done. {result['chunks']} chunks saved from {result['files']} files "
         f"(scanned {result['scanned']} potential files)."
     )
+    typer.echo(
+        f"📋 Skipped {result['skipped']} unchanged, updated {result['updated']}, "
+        f"removed {result['removed']}."
+    )
+
+
+def _format_cache_stats(stats: dict) -> str:
+    parts = []
+    for name in ("retrieval", "embeddings", "answers"):
+        counters = stats.get(name)
+        if counters is None:
+            continue
+        lookups = counters["hits"] + counters["misses"]
+        parts.append(f"{name} {counters['hits']}/{lookups} hits ({counters['hit_rate']:.0%})")
+    return f"[cache: {' | '.join(parts)}]"
+
+
+def _format_timings(timings: dict) -> str:
+    stages = " | ".join(f"{stage} {ms:.1f}" for stage, ms in timings["stages"].items())
+    return f"[timings ms: total {timings['total_ms']:.1f}" + (f" | {stages}]" if stages else "]")
 
 
 @cli.command()
@@ -58,10 +111,42 @@ def chat(
         "--show-sources/--hide-sources",
         help="Toggle printing supporting source summaries.",
     ),
+    show_cache_stats: bool = typer.Option(
+        False,
+        "--cache-stats",
+        help="Print query cache hit rates after each answer.",
+    ),
+    stream: bool = typer.Option(
+        True,
+        "--stream/--no-stream",
+        help="Print the answer token by token as it is generated.",
+    ),
+    nprobe: Optional[int] = typer.Option(
+        None,
+        "--nprobe",
+        help="IVF lists scanned per query (VECTOR_STORE=numpy with ANN_INDEX=ivf).",
+    ),
+    retrieval: Optional[str] = typer.Option(
+        None,
+        "--retrieval",
+        help="Retrieval mode: dense, hybrid (BM25 + vectors), bm25 or mmr (diversified dense).",
+    ),
+    rerank: Optional[bool] = typer.Option(
+        None,
+        "--rerank/--no-rerank",
+        help="Re-rank RERANK_CANDIDATES retrieved chunks with the cross-encoder (default: RERANK).",
+    ),
+    timings: bool = typer.Option(
+        False,
+        "--timings",
+        help="Print the per-stage latency breakdown (encode, retrieve, rerank, llm, ...).",
+    ),
 ):
     """Interactive CLI chat that mirrors the Streamlit experience."""
     settings = get_settings()
     llm = get_chat_llm()
+    typer.echo("⏳ Loading encoder and knowledge base...")
+    warmup(rerank=rerank)
     typer.echo("🧠 JosefGPT (type 'exit' or Ctrl+C to quit)")
     typer.echo(
         f"Defaults — k={settings.top_k}, temp={settings.temperature}, "
@@ -70,7 +155,16 @@ def chat(
     typer.echo(f"LLM mode: {llm.mode} ({llm.model_name})")
     if llm.mode == "offline":
         typer.echo("⚠️ Offline mode active — responses use local heuristics.")
-    if top_k is not None or temperature is not None or max_tokens is not None:
+    if nprobe is not None and not set_nprobe(nprobe):
+        typer.echo("⚠️ --nprobe ignored: the configured vector store has no IVF index.")
+        nprobe = None
+    if retrieval is not None:
+        try:
+            set_retrieval_mode(retrieval)
+        except ValueError as exc:
+            raise typer.BadParameter(str(exc), param_hint="--retrieval") from exc
+    overrides = (top_k, temperature, max_tokens, nprobe, retrieval, rerank)
+    if any(value is not None for value in overrides):
         typer.echo(
             "Overrides applied — "
             + ", ".join(
@@ -79,6 +173,9 @@ def chat(
                     f"k={top_k}" if top_k is not None else "",
                     f"temp={temperature}" if temperature is not None else "",
                     f"max_tokens={max_tokens}" if max_tokens is not None else "",
+                    f"nprobe={nprobe}" if nprobe is not None else "",
+                    f"retrieval={retrieval}" if retrieval is not None else "",
+                    f"rerank={'on' if rerank else 'off'}" if rerank is not None else "",
                 ]
                 if bit
             )
@@ -90,14 +187,31 @@ def chat(
                 continue
             if question.lower() in {"exit", "quit"}:
                 break
-            typer.echo("🤖 JosefGPT is thinking...")
-            result = answer_with_context(
-                question,
-                top_k=top_k,
-                temperature=temperature,
-                max_tokens=max_tokens,
-            )
-            typer.echo(f"🤖 JosefGPT: {result['answer']}\n")
+            if stream:
+                typer.echo("🤖 JosefGPT: ", nl=False)
+                result = {}
+                for event in answer_with_context_stream(
+                    question,
+                    top_k=top_k,
+                    temperature=temperature,
+                    max_tokens=max_tokens,
+                    rerank=rerank,
+                ):
+                    if event["type"] == "token":
+                        typer.echo(event["text"], nl=False)
+                    elif event["type"] == "done":
+                        result = event["result"]
+                typer.echo("\n")
+            else:
+                typer.echo("🤖 JosefGPT is thinking...")
+                result = answer_with_context(
+                    question,
+                    top_k=top_k,
+                    temperature=temperature,
+                    max_tokens=max_tokens,
+                    rerank=rerank,
+                )
+                typer.echo(f"🤖 JosefGPT: {result['answer']}\n")
             if show_sources:
                 sources = result.get("sources") or []
                 if sources:
@@ -120,11 +234,144 @@ def chat(
                 typer.echo(
                     f"[mode: {llm_result.get('mode')} | model: {llm_result.get('model')}]"
                 )
+            rerank_info = result.get("rerank")
+            if rerank_info:
+                fallback = rerank_info["fallback"]
+                typer.echo(
+                    f"[rerank: {rerank_info['candidates']} candidates, "
+                    f"{rerank_info['cached']} cached, {rerank_info['ms']:.0f} ms"
+                    + (f" | fell back to retrieval order ({fallback})" if fallback else "")
+                    + "]"
+                )
+            answer_cache = (result.get("cache") or {}).get("answer")
+            if answer_cache == "hit":
+                typer.echo(
+                    f"[answer cache hit | similarity {result['cache']['similarity']:.2f}]"
+                )
+            if timings and result.get("timings"):
+                typer.echo(_format_timings(result["timings"]))
+            if show_cache_stats:
+                typer.echo(_format_cache_stats(cache_stats()))
             typer.echo("")
     except (EOFError, KeyboardInterrupt):
         typer.echo("\n👋 Goodbye!")
 
 
+def _read_questions(path: Path) -> Iterator[dict]:
+    with path.open(encoding="utf-8") as handle:
+        for line in handle:
+            line = line.strip()
+            if not line:
+                continue
+            if path.suffix.lower() in {".jsonl", ".json"}:
+                record = json.loads(line)
+                yield record if isinstance(record, dict) else {"question": str(record)}
+            else:
+                yield {"question": line}
+
+
+@cli.command()
+def ask(
+    questions: Optional[List[str]] = typer.Argument(
+        None, help="Questions to answer (ignored when --file is given)."
+    ),
+    file: Optional[Path] = typer.Option(
+        None,
+        "--file",
+        "-f",
+        help="JSONL file with a 'question' field per line (or a plain text file, one per line).",
+    ),
+    out: Optional[Path] = typer.Option(
+        None,
+        "--out",
+        "-o",
+        help="Write JSONL answers here instead of stdout.",
+    ),
+    top_k: Optional[int] = typer.Option(None, "--top-k", "-k", help="Override retrieved chunks."),
+    temperature: Optional[float] = typer.Option(
+        None, "--temperature", "-t", help="Override completion temperature."
+    ),
+    max_tokens: Optional[int] = typer.Option(
+        None, "--max-tokens", "-m", help="Override maximum completion tokens."
+    ),
+    concurrency: Optional[int] = typer.Option(
+        None,
+        "--concurrency",
+        "-c",
+        help="Concurrent LLM calls (defaults to ANSWER_CONCURRENCY).",
+    ),
+):
+    """Answer many questions in bulk, streaming JSONL results as they complete."""
+    records = list(_read_questions(file)) if file else [{"question": q} for q in questions or []]
+    if not records:
+        typer.echo("⚠️ No questions given. Pass questions or --file questions.jsonl.", err=True)
+        raise typer.Exit(code=1)
+    warmup()
+    sink = out.open("w", encoding="utf-8") if out else sys.stdout
+    failures = 0
+    try:
+        results = iter_answers(
+            (str(record.get("question", "")) for record in records),
+            top_k=top_k,
+            temperature=temperature,
+            max_tokens=max_tokens,
+            concurrency=concurrency,
+        )
+        with typer.progressbar(length=len(records), label="Answering", file=sys.stderr) as bar:
+            for index, result in results:
+                record = records[index]
+                row = {key: value for key, value in record.items() if key != "question"}
+                row.update(
+                    {
+                        "index": index,
+                        "question": result.get("question"),
+                        "answer": result.get("answer"),
+                        "sources": [source["source"] for source in result.get("sources") or []],
+                        "llm": result.get("llm"),
+                    }
+                )
+                if "error" in result:
+                    failures += 1
+                    row["error"] = result["error"]
+                sink.write(json.dumps(row, ensure_ascii=False) + "\n")
+                sink.flush()
+                bar.update(1)
+    finally:
+        if out:
+            sink.close()
+    typer.echo(f"🏁 Answered {len(records) - failures}/{len(records)} questions.", err=True)
+
+
+@cli.command("embed-server")
+def embed_server(
+    host: str = typer.Option("127.0.0.1", "--host", help="Interface to bind (keep it local)."),
+    port: Optional[int] = typer.Option(
+        None, "--port", help="Port (defaults to the one in EMBEDDING_SERVER_URL, else 8765)."
+    ),
+    max_batch: Optional[int] = typer.Option(
+        None, "--max-batch", help="Texts per shared forward pass (EMBEDDING_SERVER_MAX_BATCH)."
+    ),
+    max_wait_ms: Optional[float] = typer.Option(
+        None,
+        "--max-wait-ms",
+        help="How long to wait for more requests to join a batch (EMBEDDING_SERVER_MAX_WAIT_MS).",
+    ),
+):
+    """Load the local encoder once and serve micro-batched encodes to every process."""
+    from app.embedding_server import DEFAULT_PORT, serve as serve_embeddings
+
+    settings = get_settings()
+    if port is None:
+        url = settings.embedding_server_url
+        port = urlsplit(url if "://" in url else f"http://{url}").port if url else None
+    serve_embeddings(
+        host,
+        port or DEFAULT_PORT,
+        max_batch=max_batch or settings.embedding_server_max_batch,
+        max_wait_ms=settings.embedding_server_max_wait_ms if max_wait_ms is None else max_wait_ms,
+    )
+
+
 @cli.command()
 def serve():
     """Launch the Streamlit web app."""
@@ -46,9 +46,59 @@ class Settings:
     top_k: int = _int(os.getenv("TOP_K"), 6)
     max_tokens: int = _int(os.getenv("MAX_TOKENS"), 900)
     temperature: float = _float(os.getenv("TEMPERATURE"), 0.3)
+    answer_concurrency: int = _int(os.getenv("ANSWER_CONCURRENCY"), 4)
+    ask_backend: str = os.getenv("ASK_BACKEND", "local")
+    server_workers: int = _int(os.getenv("SERVER_WORKERS"), 8)
+    server_max_pending: int = _int(os.getenv("SERVER_MAX_PENDING"), 64)
     use_openai_embeddings: bool = _bool(os.getenv("USE_OPENAI_EMBEDDINGS"), False)
     embedding_model: str = os.getenv("EMBEDDING_MODEL", "text-embedding-3-large")
+    local_encoder_model: str = os.getenv("LOCAL_ENCODER_MODEL", "all-MiniLM-L6-v2")
+    encoder_backend: str = os.getenv("ENCODER_BACKEND", "torch")
+    onnx_model_dir: str = os.getenv("ONNX_MODEL_DIR", "")
+    openai_embed_max_items: int = _int(os.getenv("OPENAI_EMBED_MAX_ITEMS"), 2048)
+    openai_embed_max_tokens: int = _int(os.getenv("OPENAI_EMBED_MAX_TOKENS"), 250_000)
+    openai_embed_concurrency: int = _int(os.getenv("OPENAI_EMBED_CONCURRENCY"), 4)
     embeddings_path: Path = Path(os.getenv("EMBEDDINGS_PATH", "embeddings"))
+    vector_store: str = os.getenv("VECTOR_STORE", "chroma")
+    vector_dtype: str = os.getenv("VECTOR_DTYPE", "float32")
+    vector_dims: int = _int(os.getenv("VECTOR_DIMS"), 0)
+    vector_rescore: int = _int(os.getenv("VECTOR_RESCORE"), 0)
+    ann_index: str = os.getenv("ANN_INDEX", "none")
+    ivf_nlist: int = _int(os.getenv("IVF_NLIST"), 0)
+    ivf_nprobe: int = _int(os.getenv("IVF_NPROBE"), 8)
+    retrieval_mode: str = os.getenv("RETRIEVAL_MODE", "dense")
+    lexical_index: bool = _bool(os.getenv("LEXICAL_INDEX"), True)
+    hybrid_candidates: int = _int(os.getenv("HYBRID_CANDIDATES"), 30)
+    rrf_k: int = _int(os.getenv("RRF_K"), 60)
+    mmr_lambda: float = _float(os.getenv("MMR_LAMBDA"), 0.5)
+    mmr_candidates: int = _int(os.getenv("MMR_CANDIDATES"), 40)
+    mmr_per_source: int = _int(os.getenv("MMR_PER_SOURCE"), 2)
+    rerank: bool = _bool(os.getenv("RERANK"), False)
+    rerank_model: str = os.getenv("RERANK_MODEL", "cross-encoder/ms-marco-MiniLM-L-6-v2")
+    rerank_candidates: int = _int(os.getenv("RERANK_CANDIDATES"), 50)
+    rerank_budget_ms: float = _float(os.getenv("RERANK_BUDGET_MS"), 300.0)
+    rerank_cache_size: int = _int(os.getenv("RERANK_CACHE_SIZE"), 4096)
+    rerank_max_pending: int = _int(os.getenv("RERANK_MAX_PENDING"), 2)
+    context_packing: bool = _bool(os.getenv("CONTEXT_PACKING"), True)
+    context_token_budget: int = _int(os.getenv("CONTEXT_TOKEN_BUDGET"), 3000)
+    context_dedupe_threshold: float = _float(os.getenv("CONTEXT_DEDUPE_THRESHOLD"), 0.85)
+    embedding_cache: bool = _bool(os.getenv("EMBEDDING_CACHE"), True)
+    embedding_cache_max_mb: int = _int(os.getenv("EMBEDDING_CACHE_MAX_MB"), 1024)
+    query_cache: bool = _bool(os.getenv("QUERY_CACHE"), True)
+    query_cache_size: int = _int(os.getenv("QUERY_CACHE_SIZE"), 1024)
+    query_cache_ttl: float = _float(os.getenv("QUERY_CACHE_TTL"), 3600.0)
+    answer_cache: bool = _bool(os.getenv("ANSWER_CACHE"), False)
+    answer_cache_threshold: float = _float(os.getenv("ANSWER_CACHE_THRESHOLD"), 0.95)
+    answer_cache_max_entries: int = _int(os.getenv("ANSWER_CACHE_MAX_ENTRIES"), 10000)
+    query_encode_batching: bool = _bool(os.getenv("QUERY_ENCODE_BATCHING"), True)
+    query_encode_max_batch: int = _int(os.getenv("QUERY_ENCODE_MAX_BATCH"), 64)
+    query_encode_max_wait_ms: float = _float(os.getenv("QUERY_ENCODE_MAX_WAIT_MS"), 2.0)
+    embedding_server_url: str = os.getenv("EMBEDDING_SERVER_URL", "")
+    embedding_server_max_batch: int = _int(os.getenv("EMBEDDING_SERVER_MAX_BATCH"), 256)
+    embedding_server_max_wait_ms: float = _float(os.getenv("EMBEDDING_SERVER_MAX_WAIT_MS"), 5.0)
+    metrics_log: bool = _bool(os.getenv("METRICS_LOG"), False)
+    ingest_workers: int = _int(os.getenv("INGEST_WORKERS"), 1)
+    embed_batch_size: int = _int(os.getenv("EMBED_BATCH_SIZE"), 256)
     source_dirs: List[Path] = field(
         default_factory=lambda: _split_paths(
             os.getenv("SOURCE_DIRS"),
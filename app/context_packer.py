@@ -0,0 +1,137 @@
+from __future__ import annotations
+
+import re
+from typing import Any, Callable, Dict, List, Optional, Set, Tuple
+
+MIN_OVERLAP_CHARS = 20
+MIN_TRUNCATED_TOKENS = 48
+SHINGLE_WORDS = 3
+
+_WORD_RE = re.compile(r"\w+")
+
+
+def merge_overlap(left: str, right: str) -> str:
+    """Join two consecutive chunks, dropping the text ``right`` repeats from the end of ``left``."""
+    left = left.rstrip()
+    right = right.lstrip()
+    probe = right[:MIN_OVERLAP_CHARS]
+    if len(probe) == MIN_OVERLAP_CHARS:
+        pos = left.find(probe, max(0, len(left) - len(right)))
+        while pos != -1:
+            if right.startswith(left[pos:]):
+                return left[:pos] + right
+            pos = left.find(probe, pos + 1)
+    return f"{left}\n{right}"
+
+
+def _shingles(text: str) -> Set[Tuple[str, ...]]:
+    words = _WORD_RE.findall(text.lower())
+    if len(words) <= SHINGLE_WORDS:
+        return {tuple(words)}
+    return {
+        tuple(words[idx : idx + SHINGLE_WORDS]) for idx in range(len(words) - SHINGLE_WORDS + 1)
+    }
+
+
+def _truncate(text: str, budget: int, count_tokens: Callable[[str], int]) -> str:
+    """Longest word-boundary prefix of ``text`` that fits in ``budget`` tokens."""
+    low, high = 0, len(text)
+    while low < high:
+        mid = (low + high + 1) // 2
+        if count_tokens(text[:mid]) <= budget:
+            low = mid
+        else:
+            high = mid - 1
+    cut = text[:low]
+    space = cut.rfind(" ")
+    return (cut[:space] if space > 0 and low < len(text) else cut).rstrip() + " ..."
+
+
+def _blocks(contexts: List[Dict[str, Any]]) -> List[Dict[str, Any]]:
+    """Merge runs of consecutive chunks of one source; a block ranks by its best chunk."""
+    by_source: Dict[Any, List[Tuple[int, int, Dict[str, Any]]]] = {}
+    loose: List[Dict[str, Any]] = []
+    for rank, ctx in enumerate(contexts):
+        meta = ctx.get("metadata") or {}
+        source, chunk = meta.get("source"), meta.get("chunk")
+        if source is None or not isinstance(chunk, int):
+            loose.append({"rank": rank, "text": ctx.get("text") or "", "contexts": [ctx]})
+            continue
+        by_source.setdefault(source, []).append((chunk, rank, ctx))
+
+    blocks = loose
+    for items in by_source.values():
+        items.sort(key=lambda item: item[0])
+        current: Optional[Dict[str, Any]] = None
+        last_chunk = None
+        for chunk, rank, ctx in items:
+            if chunk == last_chunk:
+                continue  # the same chunk retrieved twice
+            if current is not None and chunk == last_chunk + 1:
+                current["text"] = merge_overlap(current["text"], ctx.get("text") or "")
+                current["rank"] = min(current["rank"], rank)
+                current["contexts"].append(ctx)
+            else:
+                current = {"rank": rank, "text": ctx.get("text") or "", "contexts": [ctx]}
+                blocks.append(current)
+            last_chunk = chunk
+    blocks.sort(key=lambda block: block["rank"])
+    return blocks
+
+
+def pack_contexts(
+    contexts: List[Dict[str, Any]],
+    *,
+    budget_tokens: int,
+    count_tokens: Callable[[str], int],
+    dedupe_threshold: float = 0.85,
+) -> Tuple[List[Dict[str, Any]], Dict[str, int]]:
+    """Merge, deduplicate and budget retrieved chunks for the prompt.
+
+    ``contexts`` are expected best first (the order every retrieval mode
+    returns). Returns ``(blocks, stats)``: each block has the prompt ``text``
+    and the ``contexts`` it covers, and ``stats`` counts tokens before and
+    after packing.
+    """
+    tokens_in = sum(count_tokens(ctx.get("text") or "") for ctx in contexts)
+    blocks = _blocks(contexts)
+    merged = len(contexts) - len(blocks)
+
+    kept: List[Dict[str, Any]] = []
+    kept_shingles: List[Set[Tuple[str, ...]]] = []
+    duplicates = 0
+    for block in blocks:
+        shingles = _shingles(block["text"])
+        if not block["text"].strip() or any(
+            len(shingles & other) >= dedupe_threshold * min(len(shingles), len(other))
+            for other in kept_shingles
+        ):
+            duplicates += 1
+            continue
+        kept.append(block)
+        kept_shingles.append(shingles)
+
+    packed: List[Dict[str, Any]] = []
+    remaining = budget_tokens if budget_tokens > 0 else None
+    dropped = 0
+    for block in kept:
+        tokens = count_tokens(block["text"])
+        if remaining is not None and tokens > remaining:
+            if remaining < MIN_TRUNCATED_TOKENS and packed:
+                dropped += 1
+                continue
+            # Leave room for the " ..." marker appended to the cut.
+            block["text"] = _truncate(block["text"], remaining - 2, count_tokens)
+            tokens = count_tokens(block["text"])
+        block["tokens"] = tokens
+        packed.append(block)
+        if remaining is not None:
+            remaining -= tokens
+    tokens_out = sum(block["tokens"] for block in packed)
+    return packed, {
+        "context_tokens": tokens_out,
+        "tokens_saved": max(0, tokens_in - tokens_out),
+        "merged_chunks": merged,
+        "duplicates_dropped": duplicates,
+        "over_budget_dropped": dropped,
+    }
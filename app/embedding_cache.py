@@ -0,0 +1,165 @@
+from __future__ import annotations
+
+import hashlib
+import sqlite3
+import threading
+import time
+from pathlib import Path
+from typing import Callable, Dict, List, Optional, Sequence
+
+import numpy as np
+
+from app.config import Settings, get_settings
+
+CACHE_FILENAME = "embedding_cache.sqlite3"
+EncodeFn = Callable[[List[str]], Sequence[Sequence[float]]]
+
+
+def normalize_text(text: str) -> str:
+    return " ".join(text.split())
+
+
+def text_hash(text: str) -> str:
+    return hashlib.sha1(normalize_text(text).encode("utf-8", errors="ignore")).hexdigest()
+
+
+class EmbeddingCache:
+    """SQLite-backed float32 vector cache keyed by (model, normalized text hash), LRU-evicted by size."""
+
+    def __init__(self, path: Path, max_bytes: int):
+        self.path = path
+        self.max_bytes = max_bytes
+        self.hits = 0
+        self.misses = 0
+        self._lock = threading.Lock()
+        path.parent.mkdir(parents=True, exist_ok=True)
+        self._conn = sqlite3.connect(path.as_posix(), timeout=30, check_same_thread=False)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute("PRAGMA synchronous=NORMAL")
+        self._conn.execute(
+            "CREATE TABLE IF NOT EXISTS embeddings ("
+            " model TEXT NOT NULL, hash TEXT NOT NULL, vector BLOB NOT NULL,"
+            " last_used REAL NOT NULL, PRIMARY KEY (model, hash)) WITHOUT ROWID"
+        )
+        self._conn.execute(
+            "CREATE INDEX IF NOT EXISTS embeddings_last_used ON embeddings(last_used)"
+        )
+        self._conn.commit()
+        self._size = self._conn.execute(
+            "SELECT COALESCE(SUM(LENGTH(vector)), 0) FROM embeddings"
+        ).fetchone()[0]
+
+    def get_many(self, model: str, hashes: Sequence[str]) -> Dict[str, List[float]]:
+        found: Dict[str, List[float]] = {}
+        unique = list(dict.fromkeys(hashes))
+        with self._lock:
+            for start in range(0, len(unique), 500):
+                part = unique[start : start + 500]
+                marks = ",".join("?" * len(part))
+                rows = self._conn.execute(
+                    f"SELECT hash, vector FROM embeddings WHERE model = ? AND hash IN ({marks})",
+                    [model, *part],
+                ).fetchall()
+                for digest, blob in rows:
+                    found[digest] = np.frombuffer(blob, dtype=np.float32).tolist()
+                if rows:
+                    self._conn.execute(
+                        f"UPDATE embeddings SET last_used = ? WHERE model = ? AND hash IN ({marks})",
+                        [time.time(), model, *part],
+                    )
+            self._conn.commit()
+        return found
+
+    def put_many(self, model: str, hashes: Sequence[str], vectors: Sequence[Sequence[float]]) -> None:
+        now = time.time()
+        rows = list(
+            {
+                digest: (model, digest, np.asarray(vector, dtype=np.float32).tobytes(), now)
+                for digest, vector in zip(hashes, vectors)
+            }.values()
+        )
+        if not rows:
+            return
+        with self._lock:
+            # INSERT OR REPLACE: rows already cached are replaced, not added to the size.
+            replaced = 0
+            for start in range(0, len(rows), 500):
+                part = [row[1] for row in rows[start : start + 500]]
+                marks = ",".join("?" * len(part))
+                replaced += self._conn.execute(
+                    "SELECT COALESCE(SUM(LENGTH(vector)), 0) FROM embeddings"
+                    f" WHERE model = ? AND hash IN ({marks})",
+                    [model, *part],
+                ).fetchone()[0]
+            self._conn.executemany(
+                "INSERT OR REPLACE INTO embeddings (model, hash, vector, last_used) VALUES (?, ?, ?, ?)",
+                rows,
+            )
+            self._size += sum(len(row[2]) for row in rows) - replaced
+            if self._size > self.max_bytes:
+                self._evict()
+            self._conn.commit()
+
+    def _evict(self) -> None:
+        target = int(self.max_bytes * 0.9)
+        victims = []
+        cursor = self._conn.execute(
+            "SELECT model, hash, LENGTH(vector) FROM embeddings ORDER BY last_used"
+        )
+        for model, digest, size in cursor:
+            if self._size <= target:
+                break
+            victims.append((model, digest))
+            self._size -= size
+        cursor.close()
+        self._conn.executemany("DELETE FROM embeddings WHERE model = ? AND hash = ?", victims)
+
+    def encode(self, model: str, texts: Sequence[str], encode_fn: EncodeFn) -> List[List[float]]:
+        """Return vectors for ``texts``, calling ``encode_fn`` only for uncached, distinct texts."""
+        hashes = [text_hash(text) for text in texts]
+        found = self.get_many(model, hashes)
+        missing: Dict[str, str] = {}
+        for digest, text in zip(hashes, texts):
+            if digest not in found and digest not in missing:
+                missing[digest] = text
+        hit_count = sum(1 for digest in hashes if digest in found)
+        self.hits += hit_count
+        self.misses += len(hashes) - hit_count
+        if missing:
+            vectors = [list(vector) for vector in encode_fn(list(missing.values()))]
+            self.put_many(model, list(missing), vectors)
+            found.update(zip(missing, vectors))
+        return [found[digest] for digest in hashes]
+
+    def stats(self) -> Dict[str, float]:
+        with self._lock:
+            entries = self._conn.execute("SELECT COUNT(*) FROM embeddings").fetchone()[0]
+        lookups = self.hits + self.misses
+        return {
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_rate": self.hits / lookups if lookups else 0.0,
+            "entries": entries,
+            "bytes": self._size,
+        }
+
+    def reset_stats(self) -> None:
+        self.hits = 0
+        self.misses = 0
+
+
+_caches: Dict[Path, EmbeddingCache] = {}
+_caches_lock = threading.Lock()
+
+
+def get_embedding_cache(settings: Optional[Settings] = None) -> Optional[EmbeddingCache]:
+    settings = settings or get_settings()
+    if not settings.embedding_cache:
+        return None
+    path = settings.embeddings_path / CACHE_FILENAME
+    with _caches_lock:
+        if path not in _caches:
+            _caches[path] = EmbeddingCache(
+                path, max_bytes=settings.embedding_cache_max_mb * 1024 * 1024
+            )
+        return _caches[path]
@@ -0,0 +1,222 @@
+from __future__ import annotations
+
+import http.client
+import json
+import threading
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Any, Callable, Dict, List, Optional
+from urllib.parse import urlsplit
+
+import numpy as np
+
+from app.config import get_settings
+from app.encoders import encoder_name, load_encoder
+from app.micro_batcher import MicroBatcher
+
+DEFAULT_PORT = 8765
+REQUEST_TIMEOUT = 60.0
+
+
+def batching_encoder(encoder: Any, *, max_batch: int = 256, max_wait_ms: float = 5.0):
+    """``encoder.encode`` behind a ``MicroBatcher``: concurrent requests share forward passes."""
+
+    def encode(texts: List[str]) -> np.ndarray:
+        vectors = encoder.encode(texts, batch_size=max_batch, show_progress_bar=False)
+        return np.asarray(vectors, dtype=np.float32)
+
+    return MicroBatcher(encode, max_batch=max_batch, max_wait_ms=max_wait_ms, name="embed_server")
+
+
+def make_server(
+    batcher: MicroBatcher, model_name: str, host: str = "127.0.0.1", port: int = DEFAULT_PORT
+) -> ThreadingHTTPServer:
+    """HTTP server for ``batcher``: ``POST /encode`` and ``GET /health``.
+
+    ``/encode`` takes ``{"texts": [...]}`` and answers with the vectors as raw
+    little-endian float32 rows; their shape is in ``X-Embedding-Shape``.
+    """
+
+    class Handler(BaseHTTPRequestHandler):
+        protocol_version = "HTTP/1.1"
+        # Headers and body go out in separate writes; do not let Nagle hold the body back.
+        disable_nagle_algorithm = True
+
+        def _reply(self, status: int, body: bytes, content_type: str, **headers: str) -> None:
+            self.send_response(status)
+            self.send_header("Content-Type", content_type)
+            self.send_header("Content-Length", str(len(body)))
+            for name, value in headers.items():
+                self.send_header(name.replace("_", "-"), value)
+            self.end_headers()
+            self.wfile.write(body)
+
+        def _json(self, status: int, payload: Dict[str, Any]) -> None:
+            self._reply(status, json.dumps(payload).encode("utf-8"), "application/json")
+
+        def do_GET(self) -> None:
+            if self.path != "/health":
+                self._json(404, {"error": "not found"})
+                return
+            self._json(200, {"status": "ok", "model": model_name, **batcher.stats()})
+
+        def do_POST(self) -> None:
+            if self.path != "/encode":
+                self._json(404, {"error": "not found"})
+                return
+            try:
+                length = int(self.headers.get("Content-Length") or 0)
+                texts = json.loads(self.rfile.read(length))["texts"]
+                if not isinstance(texts, list) or not texts:
+                    raise ValueError("texts must be a non-empty list of strings")
+                vectors = batcher([str(text) for text in texts])
+            except (KeyError, ValueError) as exc:
+                self._json(400, {"error": str(exc)})
+                return
+            except Exception as exc:  # pragma: no cover - defensive
+                self._json(500, {"error": str(exc)})
+                return
+            rows, dim = vectors.shape if vectors.ndim == 2 else (0, 0)
+            self._reply(
+                200,
+                vectors.astype("<f4").tobytes(),
+                "application/octet-stream",
+                X_Embedding_Shape=f"{rows},{dim}",
+                X_Embedding_Model=model_name,
+            )
+
+        def log_message(self, format: str, *args: Any) -> None:
+            pass
+
+    server = ThreadingHTTPServer((host, port), Handler)
+    server.daemon_threads = True
+    return server
+
+
+def serve(
+    host: str = "127.0.0.1",
+    port: int = DEFAULT_PORT,
+    *,
+    max_batch: int = 256,
+    max_wait_ms: float = 5.0,
+) -> None:
+    """Serve the configured local encoder (``LOCAL_ENCODER_MODEL`` on ``ENCODER_BACKEND``)."""
+    settings = get_settings()
+    model_name = encoder_name(settings)
+    batcher = batching_encoder(load_encoder(settings), max_batch=max_batch, max_wait_ms=max_wait_ms)
+    batcher(["warmup"])
+    server = make_server(batcher, model_name, host, port)
+    print(f"🧲 Embedding server for {model_name} on http://{host}:{server.server_port}")
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.server_close()
+
+
+class EmbeddingClient:
+    """Drop-in for ``SentenceTransformer.encode`` that asks a running embedding server.
+
+    One keep-alive connection per thread; a dropped connection is retried once.
+    If the server stays unreachable and ``fallback`` is given, it is called
+    once to load an in-process encoder that serves this and every later call.
+    """
+
+    def __init__(
+        self,
+        url: str,
+        timeout: float = REQUEST_TIMEOUT,
+        fallback: Optional[Callable[[], Any]] = None,
+    ):
+        parts = urlsplit(url if "://" in url else f"http://{url}")
+        self.url = f"http://{parts.hostname}:{parts.port or DEFAULT_PORT}"
+        self.host = parts.hostname or "127.0.0.1"
+        self.port = parts.port or DEFAULT_PORT
+        self.timeout = timeout
+        self.fallback = fallback
+        self._local = threading.local()
+        self._local_encoder: Any = None
+        self._fallback_lock = threading.Lock()
+
+    def _connection(self) -> http.client.HTTPConnection:
+        conn = getattr(self._local, "conn", None)
+        if conn is None:
+            conn = self._local.conn = http.client.HTTPConnection(
+                self.host, self.port, timeout=self.timeout
+            )
+        return conn
+
+    def _send(self, method: str, path: str, body: Optional[bytes]):
+        headers = {"Content-Type": "application/json"} if body is not None else {}
+        conn = self._connection()
+        try:
+            conn.request(method, path, body=body, headers=headers)
+            response = conn.getresponse()
+            return response, response.read()
+        except (http.client.HTTPException, OSError):
+            conn.close()
+            self._local.conn = None
+            raise
+
+    def _request(self, method: str, path: str, body: Optional[bytes] = None):
+        try:
+            return self._send(method, path, body)
+        except (http.client.HTTPException, ConnectionError):
+            # The server closes idle keep-alive connections; encodes are safe to repeat.
+            return self._send(method, path, body)
+
+    def health(self) -> Dict[str, Any]:
+        response, data = self._request("GET", "/health")
+        if response.status != 200:
+            raise RuntimeError(f"embedding server health check failed ({response.status})")
+        return json.loads(data)
+
+    def _fallback_encoder(self, exc: Exception) -> Any:
+        with self._fallback_lock:
+            if self._local_encoder is None:
+                print(f"⚠️ Embedding server at {self.url} went away ({exc}); encoding in-process.")
+                self._local_encoder = self.fallback()
+        return self._local_encoder
+
+    def encode(self, texts, **kwargs: Any) -> np.ndarray:
+        if self._local_encoder is not None:
+            return self._local_encoder.encode(texts, **kwargs)
+        if isinstance(texts, str):
+            return self.encode([texts], **kwargs)[0]
+        texts = list(texts)
+        if not texts:
+            return np.empty((0, 0), dtype=np.float32)
+        body = json.dumps({"texts": texts}).encode("utf-8")
+        try:
+            response, data = self._request("POST", "/encode", body)
+        except (OSError, http.client.HTTPException) as exc:
+            if self.fallback is None:
+                raise
+            return self._fallback_encoder(exc).encode(texts, **kwargs)
+        if response.status != 200:
+            raise RuntimeError(f"embedding server error {response.status}: {data[:200]!r}")
+        rows, dim = (
+            int(part) for part in response.getheader("X-Embedding-Shape", "0,0").split(",")
+        )
+        return np.frombuffer(data, dtype="<f4").reshape(rows, dim)
+
+
+def connect(
+    url: str, model_name: str, fallback: Optional[Callable[[], Any]] = None
+) -> Optional[EmbeddingClient]:
+    """Client for ``url`` if it serves ``model_name``; otherwise warn and return None.
+
+    ``fallback`` loads the in-process encoder the client switches to if the
+    server goes away later.
+    """
+    client = EmbeddingClient(url, fallback=fallback)
+    try:
+        served = client.health().get("model")
+    except (OSError, http.client.HTTPException, RuntimeError, ValueError) as exc:
+        problem = f"is unreachable ({exc})"
+    else:
+        if served == model_name:
+            return client
+        problem = f"serves {served}"
+    print(f"⚠️ Embedding server at {client.url} {problem}; loading {model_name} in-process.")
+    return None
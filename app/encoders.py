@@ -0,0 +1,290 @@
+from __future__ import annotations
+
+import inspect
+import json
+import os
+import warnings
+from pathlib import Path
+from typing import TYPE_CHECKING, Any, Dict, List, Optional, Tuple
+
+import numpy as np
+
+from app.config import Settings, get_settings
+
+if TYPE_CHECKING:  # torch is only imported for the torch backend and for exports
+    from sentence_transformers import SentenceTransformer
+
+ENCODER_BACKENDS = ("torch", "onnx", "onnx-int8")
+MODEL_FILENAME = "model.onnx"
+INT8_FILENAME = "model.int8.onnx"
+META_FILENAME = "encoder.json"
+REFERENCE_FILENAME = "reference.npy"
+MIN_AGREEMENT = 0.99
+INPUT_NAMES = ("input_ids", "attention_mask", "token_type_ids")
+LEGACY_POOLING_FLAGS = (
+    ("mean", "pooling_mode_mean_tokens"),
+    ("cls", "pooling_mode_cls_token"),
+    ("max", "pooling_mode_max_tokens"),
+    ("mean_sqrt_len_tokens", "pooling_mode_mean_sqrt_len_tokens"),
+    ("weightedmean", "pooling_mode_weightedmean_tokens"),
+    ("lasttoken", "pooling_mode_lasttoken"),
+)
+
+# Embedded with PyTorch at export time; every ONNX variant is checked against these vectors.
+CHECK_TEXTS = (
+    "How should I price a retainer for a long-term coaching client?",
+    "Negotiation",
+    "Brand is the promise you keep when nobody is watching.",
+    "Automate the follow-up sequence so no qualified lead waits more than a day for an answer, "
+    "then review the pipeline every Friday and drop the deals that have stopped moving.",
+    "What is the fastest way to scale a sales team without hurting margins?",
+    "Psychology of pricing: anchoring, decoys and the power of the middle option.",
+    "  Leading and trailing whitespace is stripped before tokenising.  ",
+    "Zákazník platí za výsledek, ne za hodiny.",
+)
+
+
+def encoder_name(settings: Optional[Settings] = None) -> str:
+    """Identity of the vectors the local encoder produces (cache keys, embedding server).
+
+    The fp32 ONNX export reproduces the PyTorch vectors, so it shares their name;
+    int8 weights shift them slightly and get their own.
+    """
+    settings = settings or get_settings()
+    name = settings.local_encoder_model
+    return f"{name}@int8" if settings.encoder_backend.strip().lower() == "onnx-int8" else name
+
+
+def onnx_model_dir(settings: Optional[Settings] = None) -> Path:
+    settings = settings or get_settings()
+    root = Path(settings.onnx_model_dir) if settings.onnx_model_dir else settings.embeddings_path
+    return root / "onnx" / settings.local_encoder_model.replace("/", "__")
+
+
+def cosine_agreement(reference: Any, candidate: Any) -> Dict[str, float]:
+    """Row-wise cosine similarity between two embeddings of the same texts."""
+    a = np.asarray(reference, dtype=np.float32)
+    b = np.asarray(candidate, dtype=np.float32)
+    if a.shape != b.shape:
+        raise ValueError(f"Cannot compare embeddings of shape {a.shape} and {b.shape}.")
+    a = a / np.clip(np.linalg.norm(a, axis=1, keepdims=True), 1e-12, None)
+    b = b / np.clip(np.linalg.norm(b, axis=1, keepdims=True), 1e-12, None)
+    cosines = (a * b).sum(axis=1)
+    return {"mean": float(cosines.mean()), "min": float(cosines.min())}
+
+
+class OnnxEncoder:
+    """Runs an exported sentence-transformers model with ONNX Runtime.
+
+    Reproduces ``SentenceTransformer.encode`` for transformer + pooling
+    (+ normalize) models such as MiniLM, with the ``tokenizers`` library doing
+    the tokenisation, so neither torch nor transformers is imported.
+    """
+
+    def __init__(self, model_dir: Path, *, quantized: bool = False):
+        import onnxruntime as ort
+        from tokenizers import Tokenizer
+
+        meta = json.loads((model_dir / META_FILENAME).read_text(encoding="utf-8"))
+        self.model_dir = model_dir
+        self.model_name = meta["model"]
+        self.quantized = quantized
+        self.dim = int(meta["dim"])
+        self.pooling = meta["pooling"]
+        self.normalize = bool(meta["normalize"])
+        self.tokenizer = Tokenizer.from_file(str(model_dir / "tokenizer.json"))
+        self.tokenizer.enable_truncation(int(meta["max_seq_length"]))
+        self.tokenizer.enable_padding(pad_id=int(meta["pad_id"]), pad_token=meta["pad_token"])
+        options = ort.SessionOptions()
+        options.graph_optimization_level = ort.GraphOptimizationLevel.ORT_ENABLE_ALL
+        self.session = ort.InferenceSession(
+            str(model_dir / (INT8_FILENAME if quantized else MODEL_FILENAME)),
+            options,
+            providers=["CPUExecutionProvider"],
+        )
+        self.input_names = [item.name for item in self.session.get_inputs()]
+
+    def encode(
+        self, sentences: Any, batch_size: int = 32, show_progress_bar: bool = False, **_: Any
+    ) -> np.ndarray:
+        if isinstance(sentences, str):
+            return self.encode([sentences], batch_size)[0]
+        texts = [str(text).strip() for text in sentences]
+        vectors = np.empty((len(texts), self.dim), dtype=np.float32)
+        # Like SentenceTransformer: batch similar lengths together so little is padding.
+        order = np.argsort([-len(text) for text in texts], kind="stable")
+        for start in range(0, len(texts), max(1, batch_size)):
+            rows = order[start : start + max(1, batch_size)]
+            vectors[rows] = self._embed([texts[row] for row in rows])
+        return vectors
+
+    def _embed(self, texts: List[str]) -> np.ndarray:
+        encodings = self.tokenizer.encode_batch(texts)
+        mask = np.array([item.attention_mask for item in encodings], dtype=np.int64)
+        feeds = {
+            "input_ids": np.array([item.ids for item in encodings], dtype=np.int64),
+            "attention_mask": mask,
+            "token_type_ids": np.array([item.type_ids for item in encodings], dtype=np.int64),
+        }
+        hidden = self.session.run(None, {name: feeds[name] for name in self.input_names})[0]
+        if self.pooling == "cls":
+            vectors = hidden[:, 0]
+        elif self.pooling == "max":
+            vectors = np.where(mask[..., None] > 0, hidden, -1e9).max(axis=1)
+        else:
+            weights = mask[..., None].astype(np.float32)
+            vectors = (hidden * weights).sum(axis=1) / np.clip(weights.sum(axis=1), 1e-9, None)
+        if self.normalize:
+            vectors = vectors / np.clip(np.linalg.norm(vectors, axis=1, keepdims=True), 1e-12, None)
+        return vectors.astype(np.float32, copy=False)
+
+    def agreement(self) -> Dict[str, float]:
+        """Cosine agreement with the PyTorch vectors of ``CHECK_TEXTS`` stored at export."""
+        reference = np.load(self.model_dir / REFERENCE_FILENAME)
+        return cosine_agreement(reference, self.encode(list(CHECK_TEXTS)))
+
+
+def _pipeline(model: "SentenceTransformer") -> Tuple[Any, str, bool]:
+    """The transformer module, pooling mode and normalize flag, or ValueError if unsupported."""
+    modules = list(model)
+    transformer, rest = modules[0], modules[1:]
+    if not hasattr(transformer, "auto_model") or not rest:
+        raise ValueError("only transformer + pooling models can be exported")
+    config = rest[0].get_config_dict() if hasattr(rest[0], "get_config_dict") else {}
+    pooling = config.get("pooling_mode")  # sentence-transformers >= 3
+    if pooling is None:  # 2.x keeps one flag per mode
+        modes = [mode for mode, flag in LEGACY_POOLING_FLAGS if config.get(flag)]
+        pooling = modes[0] if len(modes) == 1 else tuple(modes)
+    if pooling not in ("mean", "cls", "max"):
+        raise ValueError(f"pooling {pooling!r} is not supported by the ONNX encoder")
+    tail = [type(module).__name__ for module in rest[1:]]
+    if tail not in ([], ["Normalize"]):
+        raise ValueError(f"modules {tail} after pooling are not supported by the ONNX encoder")
+    return transformer, pooling, tail == ["Normalize"]
+
+
+def export_onnx(model_name: str, target: Path) -> Dict[str, Any]:
+    """Export ``model_name`` to ``target`` for ``OnnxEncoder``; needs torch and onnx."""
+    import torch
+    from sentence_transformers import SentenceTransformer
+
+    model = SentenceTransformer(model_name, device="cpu")
+    model.eval()
+    transformer, pooling, normalize = _pipeline(model)
+    tokenizer = transformer.tokenizer
+    target.mkdir(parents=True, exist_ok=True)
+    tokenizer.save_pretrained(str(target))
+    if not (target / "tokenizer.json").exists():
+        raise ValueError(f"{model_name} has no fast tokenizer to run without transformers")
+
+    sample = tokenizer(list(CHECK_TEXTS[:2]), padding=True, return_tensors="pt")
+    names = [name for name in INPUT_NAMES if name in sample]
+
+    class HiddenStates(torch.nn.Module):
+        def __init__(self, auto_model: Any):
+            super().__init__()
+            self.auto_model = auto_model
+
+        def forward(self, *inputs: Any) -> Any:
+            return self.auto_model(**dict(zip(names, inputs)))[0]
+
+    axes = {name: {0: "batch", 1: "sequence"} for name in names + ["last_hidden_state"]}
+    options: Dict[str, Any] = {}
+    if "dynamo" in inspect.signature(torch.onnx.export).parameters:
+        # The TorchScript exporter handles the dynamic axes without needing onnxscript.
+        options["dynamo"] = False
+    tmp = target / f"{MODEL_FILENAME}.tmp"
+    with torch.no_grad(), warnings.catch_warnings():
+        warnings.simplefilter("ignore")  # tracer chatter about shape checks baked into the graph
+        torch.onnx.export(
+            HiddenStates(transformer.auto_model).eval(),
+            tuple(sample[name] for name in names),
+            str(tmp),
+            input_names=names,
+            output_names=["last_hidden_state"],
+            dynamic_axes=axes,
+            opset_version=17,
+            **options,
+        )
+    os.replace(tmp, target / MODEL_FILENAME)
+    reference = model.encode(list(CHECK_TEXTS), convert_to_numpy=True, show_progress_bar=False)
+    np.save(target / REFERENCE_FILENAME, reference.astype(np.float32))
+    meta = {
+        "model": model_name,
+        "dim": int(reference.shape[1]),
+        "pooling": pooling,
+        "normalize": normalize,
+        "max_seq_length": int(model.max_seq_length),
+        "pad_id": int(tokenizer.pad_token_id or 0),
+        "pad_token": tokenizer.pad_token or "[PAD]",
+    }
+    tmp = target / f"{META_FILENAME}.tmp"
+    tmp.write_text(json.dumps(meta, indent=2), encoding="utf-8")
+    os.replace(tmp, target / META_FILENAME)
+    return meta
+
+
+def quantize_onnx(target: Path) -> None:
+    """Dynamic int8 quantisation of the exported weights; needs the onnx package."""
+    from onnxruntime.quantization import QuantType, quantize_dynamic
+
+    tmp = target / f"{INT8_FILENAME}.tmp"
+    quantize_dynamic(str(target / MODEL_FILENAME), str(tmp), weight_type=QuantType.QInt8)
+    os.replace(tmp, target / INT8_FILENAME)
+
+
+def load_onnx_encoder(model_name: str, target: Path, *, quantized: bool = False) -> OnnxEncoder:
+    """``OnnxEncoder`` for ``model_name``, exporting (and quantising) it on first use.
+
+    A fresh export or quantisation is checked against the PyTorch vectors and
+    reported with a warning when the agreement drops below ``MIN_AGREEMENT``.
+    """
+    fresh = False
+    if not (target / META_FILENAME).exists() or not (target / MODEL_FILENAME).exists():
+        print(f"🧲 Exporting {model_name} to ONNX in {target} ...")
+        export_onnx(model_name, target)
+        fresh = True
+    if quantized and not (target / INT8_FILENAME).exists():
+        quantize_onnx(target)
+        fresh = True
+    encoder = OnnxEncoder(target, quantized=quantized)
+    if fresh:
+        check = encoder.agreement()
+        variant = "onnx-int8" if quantized else "onnx"
+        print(
+            f"🔎 {model_name} ({variant}) agrees with PyTorch: "
+            f"mean cosine {check['mean']:.4f}, min {check['min']:.4f}"
+        )
+        if check["min"] < MIN_AGREEMENT:
+            print(f"⚠️ {variant} vectors drift from PyTorch; consider ENCODER_BACKEND=torch.")
+    return encoder
+
+
+def load_encoder(settings: Optional[Settings] = None) -> Any:
+    """The local encoder for ``ENCODER_BACKEND`` (``torch``, ``onnx`` or ``onnx-int8``).
+
+    Every backend offers the ``SentenceTransformer.encode`` API. If the ONNX
+    backend cannot be used (missing packages, unsupported model, a failed
+    export, quantisation or runtime session) it warns and loads the model
+    with PyTorch.
+    """
+    settings = settings or get_settings()
+    backend = settings.encoder_backend.strip().lower()
+    model_name = settings.local_encoder_model
+    if backend not in ENCODER_BACKENDS:
+        raise ValueError(
+            f"Unknown ENCODER_BACKEND {settings.encoder_backend!r} (use torch, onnx or onnx-int8)."
+        )
+    if backend != "torch":
+        try:
+            return load_onnx_encoder(
+                model_name, onnx_model_dir(settings), quantized=backend == "onnx-int8"
+            )
+        except Exception as exc:
+            print(
+                f"⚠️ {backend} encoder unavailable ({type(exc).__name__}: {exc}); "
+                f"loading {model_name} with PyTorch."
+            )
+    from sentence_transformers import SentenceTransformer
+
+    return SentenceTransformer(model_name)
@@ -0,0 +1,263 @@
+from __future__ import annotations
+
+import re
+import sqlite3
+import threading
+from collections import Counter
+from pathlib import Path
+from typing import Any, Dict, Iterable, List, Optional, Sequence, Tuple
+
+import numpy as np
+
+from app.config import Settings, get_settings
+from app.vector_store import store_path
+
+LEXICAL_DIRNAME = "lexical"
+DOCS_FILENAME = "docs.sqlite3"
+POSTINGS_FILENAME = "bm25.npz"
+BM25_K1 = 1.2
+BM25_B = 0.75
+POSTING_DTYPE = np.dtype([("term", "<i4"), ("tf", "<u2")])
+
+_TOKEN_RE = re.compile(r"\w+")
+STOPWORDS = frozenset(
+    "a an and are as at be but by for from has have how i if in into is it its of on or "
+    "so than that the their then there these they this to was we were what when which who "
+    "why will with you your".split()
+)
+
+
+def tokenize(text: str) -> List[str]:
+    """Lower-cased word tokens without stopwords; no stemming so titles and acronyms stay exact."""
+    return [
+        token
+        for token in _TOKEN_RE.findall(text.lower())
+        if len(token) > 1 and token not in STOPWORDS
+    ]
+
+
+class LexicalIndex:
+    """BM25 inverted index over the chunks of the vector store.
+
+    ``docs.sqlite3`` keeps the packed ``(term_id, tf)`` pairs of every chunk and
+    is updated by ingest as chunks are written or deleted. ``compile`` turns it
+    into ``bm25.npz``: a sorted vocabulary, per-term offsets into one postings
+    array of chunk positions, and the BM25 weight of every posting, so a query
+    is a few slices and a ``bincount``.
+    """
+
+    def __init__(self, path: Path, k1: float = BM25_K1, b: float = BM25_B):
+        self.path = path
+        self.k1 = k1
+        self.b = b
+        self.postings_path = path / POSTINGS_FILENAME
+        self._postings: Optional[Dict[str, Any]] = None
+        self._postings_mtime: Optional[int] = None
+        self._term_ids: Optional[Dict[str, int]] = None
+        self._lock = threading.RLock()
+        path.mkdir(parents=True, exist_ok=True)
+        self._conn = sqlite3.connect(
+            (path / DOCS_FILENAME).as_posix(), timeout=30, check_same_thread=False
+        )
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute("PRAGMA synchronous=NORMAL")
+        self._conn.execute(
+            "CREATE TABLE IF NOT EXISTS terms (term TEXT PRIMARY KEY, id INTEGER NOT NULL)"
+        )
+        self._conn.execute(
+            "CREATE TABLE IF NOT EXISTS docs ("
+            " id TEXT PRIMARY KEY, source TEXT, length INTEGER NOT NULL, terms BLOB NOT NULL)"
+        )
+        self._conn.execute("CREATE INDEX IF NOT EXISTS docs_source ON docs(source)")
+        self._conn.execute(
+            "CREATE TABLE IF NOT EXISTS info (key TEXT PRIMARY KEY, value TEXT NOT NULL)"
+        )
+        self._conn.commit()
+
+    @property
+    def version(self) -> int:
+        with self._lock:
+            row = self._conn.execute("SELECT value FROM info WHERE key = 'version'").fetchone()
+        return int(row[0]) if row else 0
+
+    def _bump(self) -> None:
+        self._conn.execute(
+            "INSERT INTO info (key, value) VALUES ('version', '1') ON CONFLICT(key)"
+            " DO UPDATE SET value = CAST(value AS INTEGER) + 1"
+        )
+
+    def count(self) -> int:
+        with self._lock:
+            return self._conn.execute("SELECT COUNT(*) FROM docs").fetchone()[0]
+
+    def _pack(self, counts: Counter, fresh: List[Tuple[str, int]]) -> bytes:
+        """``(term_id, tf)`` pairs of one chunk; unseen terms get ids appended to ``fresh``."""
+        term_ids = self._term_ids
+        for term in counts:
+            if term not in term_ids:
+                term_ids[term] = len(term_ids)
+                fresh.append((term, term_ids[term]))
+        packed = np.empty(len(counts), dtype=POSTING_DTYPE)
+        packed["term"] = [term_ids[term] for term in counts]
+        packed["tf"] = np.minimum(list(counts.values()), 65535)
+        return packed.tobytes()
+
+    def add(
+        self,
+        ids: Sequence[str],
+        documents: Sequence[str],
+        metadatas: Optional[Sequence[Dict[str, Any]]] = None,
+    ) -> None:
+        if not ids:
+            return
+        with self._lock:
+            if self._term_ids is None:
+                self._term_ids = dict(self._conn.execute("SELECT term, id FROM terms"))
+            fresh: List[Tuple[str, int]] = []
+            rows = []
+            for idx, (item_id, document) in enumerate(zip(ids, documents)):
+                counts = Counter(tokenize(document or ""))
+                source = (metadatas[idx] or {}).get("source") if metadatas else None
+                rows.append((item_id, source, sum(counts.values()), self._pack(counts, fresh)))
+            self._conn.executemany("INSERT INTO terms (term, id) VALUES (?, ?)", fresh)
+            self._conn.executemany(
+                "INSERT OR REPLACE INTO docs (id, source, length, terms) VALUES (?, ?, ?, ?)", rows
+            )
+            self._bump()
+            self._conn.commit()
+
+    def delete(self, ids: Optional[Iterable[str]] = None, source: Optional[str] = None) -> None:
+        with self._lock:
+            if source is not None:
+                self._conn.execute("DELETE FROM docs WHERE source = ?", (source,))
+            if ids is not None:
+                self._conn.executemany("DELETE FROM docs WHERE id = ?", [(i,) for i in ids])
+            self._bump()
+            self._conn.commit()
+
+    def compile(self, force: bool = False) -> Optional[Dict[str, int]]:
+        """Rebuild ``bm25.npz`` if the chunk table changed since the last compile."""
+        with self._lock:
+            version = self.version
+            current = self._load()
+            if current is not None and current["version"] == version and not force:
+                return None
+            vocab = sorted(self._conn.execute("SELECT term, id FROM terms"))
+            ids: List[str] = []
+            lengths: List[int] = []
+            blobs: List[bytes] = []
+            for item_id, length, blob in self._conn.execute(
+                "SELECT id, length, terms FROM docs ORDER BY rowid"
+            ):
+                ids.append(item_id)
+                lengths.append(length)
+                blobs.append(blob)
+
+        # Term ids are assigned in arrival order; postings are grouped by sorted term instead.
+        rank = np.zeros(len(vocab), dtype=np.int64)
+        rank[np.fromiter((term_id for _, term_id in vocab), dtype=np.int64)] = np.arange(len(vocab))
+        pairs = np.frombuffer(b"".join(blobs), dtype=POSTING_DTYPE)
+        per_doc = np.fromiter((len(blob) for blob in blobs), dtype=np.int64, count=len(blobs))
+        doc_arr = np.repeat(
+            np.arange(len(ids), dtype=np.int32), per_doc // POSTING_DTYPE.itemsize
+        )
+        term_arr = rank[pairs["term"]]
+        tf_arr = pairs["tf"].astype(np.float32)
+        doc_len = np.asarray(lengths, dtype=np.float32)
+        avgdl = max(float(doc_len.mean()), 1.0) if len(doc_len) else 1.0
+        df = np.bincount(term_arr, minlength=len(vocab)).astype(np.float32)
+        idf = np.log1p((len(ids) - df + 0.5) / (df + 0.5))
+        norm = self.k1 * (1.0 - self.b + self.b * doc_len[doc_arr] / avgdl)
+        weights = idf[term_arr] * tf_arr * (self.k1 + 1.0) / (tf_arr + norm)
+        order = np.argsort(term_arr, kind="stable")
+        offsets = np.searchsorted(term_arr[order], np.arange(len(vocab) + 1))
+
+        tmp_path = self.postings_path.with_suffix(".tmp")
+        with open(tmp_path, "wb") as handle:
+            np.savez(
+                handle,
+                version=np.int64(version),
+                terms=np.asarray([term for term, _ in vocab], dtype=str),
+                offsets=offsets.astype(np.int64),
+                docs=doc_arr[order],
+                weights=weights[order].astype(np.float32),
+                ids=np.frombuffer("\0".join(ids).encode("utf-8"), dtype=np.uint8),
+            )
+        tmp_path.replace(self.postings_path)
+        return {"documents": len(ids), "terms": int(np.count_nonzero(df))}
+
+    def _load(self) -> Optional[Dict[str, Any]]:
+        if not self.postings_path.exists():
+            return None
+        mtime = self.postings_path.stat().st_mtime_ns
+        if self._postings is None or mtime != self._postings_mtime:
+            with np.load(self.postings_path) as data:
+                blob = data["ids"].tobytes().decode("utf-8")
+                self._postings = {
+                    "version": int(data["version"]),
+                    "terms": data["terms"],
+                    "offsets": data["offsets"],
+                    "docs": data["docs"],
+                    "weights": data["weights"],
+                    "ids": blob.split("\0") if blob else [],
+                }
+            self._postings_mtime = mtime
+        return self._postings
+
+    @property
+    def compiled(self) -> bool:
+        with self._lock:
+            return self._load() is not None
+
+    def search(self, queries: Sequence[str], k: int) -> List[List[Tuple[str, float]]]:
+        """Top-``k`` ``(chunk_id, bm25_score)`` pairs per query, best first.
+
+        Queries read the last compiled ``bm25.npz`` and never compile: ingest
+        recompiles once it finishes, and hits it has deleted in the meantime
+        are dropped when they are hydrated.
+        """
+        with self._lock:
+            postings = self._load()
+        if postings is None:
+            return [[] for _ in queries]
+        terms = postings["terms"]
+        results: List[List[Tuple[str, float]]] = []
+        for query in queries:
+            tokens = np.asarray(sorted(set(tokenize(query))), dtype=str)
+            if not len(tokens) or not len(terms):
+                results.append([])
+                continue
+            slots = np.searchsorted(terms, tokens)
+            found = slots < len(terms)
+            found[found] = terms[slots[found]] == tokens[found]
+            known = slots[found]
+            if not len(known):
+                results.append([])
+                continue
+            spans = [slice(postings["offsets"][s], postings["offsets"][s + 1]) for s in known]
+            docs = np.concatenate([postings["docs"][span] for span in spans])
+            weights = np.concatenate([postings["weights"][span] for span in spans])
+            candidates, inverse = np.unique(docs, return_inverse=True)
+            scores = np.bincount(inverse, weights=weights)
+            top = min(k, len(candidates))
+            best = np.argpartition(-scores, top - 1)[:top]
+            best = best[np.argsort(-scores[best], kind="stable")]
+            results.append(
+                [(postings["ids"][candidates[idx]], float(scores[idx])) for idx in best]
+            )
+        return results
+
+
+_indexes: Dict[Path, LexicalIndex] = {}
+_indexes_lock = threading.Lock()
+
+
+def get_lexical_index(settings: Optional[Settings] = None) -> Optional[LexicalIndex]:
+    settings = settings or get_settings()
+    if not settings.lexical_index:
+        return None
+    path = store_path(settings) / LEXICAL_DIRNAME
+    with _indexes_lock:
+        if path not in _indexes:
+            _indexes[path] = LexicalIndex(path)
+        return _indexes[path]
@@ -1,7 +1,8 @@
 from __future__ import annotations
 
+import asyncio
 from functools import lru_cache
-from typing import List, Sequence
+from typing import Iterator, List, Sequence
 
 from app.config import get_settings
 
@@ -13,12 +14,40 @@ class BaseChatLLM:
     def generate(self, messages: Sequence[dict], *, temperature: float, max_tokens: int) -> str:
         raise NotImplementedError
 
+    def generate_stream(
+        self, messages: Sequence[dict], *, temperature: float, max_tokens: int
+    ) -> Iterator[str]:
+        """Yield the completion in pieces; the default yields it in one piece."""
+        yield self.generate(messages, temperature=temperature, max_tokens=max_tokens)
+
+    async def agenerate(
+        self, messages: Sequence[dict], *, temperature: float, max_tokens: int
+    ) -> str:
+        """Async completion; the default runs ``generate`` in a worker thread."""
+        return await asyncio.to_thread(
+            self.generate, messages, temperature=temperature, max_tokens=max_tokens
+        )
+
 
 class OfflineChatLLM(BaseChatLLM):
     mode = "offline"
     model_name = "rule-based-summariser"
 
     def generate(self, messages: Sequence[dict], *, temperature: float, max_tokens: int) -> str:
+        return "\n".join(self._compose(messages))
+
+    def generate_stream(
+        self, messages: Sequence[dict], *, temperature: float, max_tokens: int
+    ) -> Iterator[str]:
+        for idx, part in enumerate(self._compose(messages)):
+            yield part if idx == 0 else f"\n{part}"
+
+    async def agenerate(
+        self, messages: Sequence[dict], *, temperature: float, max_tokens: int
+    ) -> str:
+        return self.generate(messages, temperature=temperature, max_tokens=max_tokens)
+
+    def _compose(self, messages: Sequence[dict]) -> List[str]:
         user_content = ""
         system_content = ""
         for message in messages:
@@ -54,7 +83,7 @@ class OfflineChatLLM(BaseChatLLM):
         parts.append(
             "Guidance: leverage available context, run small experiments, and automate repeatable wins."
         )
-        return "\n".join(parts)
+        return parts
 
 
 class OpenAIChatLLM(BaseChatLLM):
@@ -65,6 +94,7 @@ class OpenAIChatLLM(BaseChatLLM):
 
         self.model_name = model_name
         self._client = OpenAI()
+        self._async_client = None
 
     def generate(self, messages: Sequence[dict], *, temperature: float, max_tokens: int) -> str:
         completion = self._client.chat.completions.create(
@@ -75,6 +105,47 @@ class OpenAIChatLLM(BaseChatLLM):
         )
         return completion.choices[0].message.content.strip()
 
+    def generate_stream(
+        self, messages: Sequence[dict], *, temperature: float, max_tokens: int
+    ) -> Iterator[str]:
+        stream = self._client.chat.completions.create(
+            model=self.model_name,
+            messages=list(messages),
+            temperature=temperature,
+            max_tokens=max_tokens,
+            stream=True,
+        )
+        started = False
+        try:
+            for chunk in stream:
+                if not chunk.choices:
+                    continue
+                piece = chunk.choices[0].delta.content or ""
+                if not started:
+                    piece = piece.lstrip()
+                    started = bool(piece)
+                if piece:
+                    yield piece
+        finally:
+            # Closing the generator early (client gone) also ends the HTTP response.
+            stream.close()
+
+    async def agenerate(
+        self, messages: Sequence[dict], *, temperature: float, max_tokens: int
+    ) -> str:
+        if self._async_client is None:
+            from openai import AsyncOpenAI
+
+            # One long-lived client so its HTTP connection pool is reused across requests.
+            self._async_client = AsyncOpenAI()
+        completion = await self._async_client.chat.completions.create(
+            model=self.model_name,
+            messages=list(messages),
+            temperature=temperature,
+            max_tokens=max_tokens,
+        )
+        return completion.choices[0].message.content.strip()
+
 
 @lru_cache(maxsize=1)
 def get_chat_llm() -> BaseChatLLM:
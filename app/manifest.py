@@ -0,0 +1,127 @@
+from __future__ import annotations
+
+import hashlib
+import json
+import os
+from dataclasses import asdict, dataclass, field
+from pathlib import Path
+from typing import Dict, Iterable, List, Optional
+
+MANIFEST_VERSION = 1
+GENERATION_FILENAME = "generation"
+
+
+def hash_file(path: Path, block_size: int = 1 << 20) -> str:
+    digest = hashlib.sha256()
+    with path.open("rb") as handle:
+        for block in iter(lambda: handle.read(block_size), b""):
+            digest.update(block)
+    return digest.hexdigest()
+
+
+def chunk_hash(text: str) -> str:
+    return hashlib.sha1(text.encode("utf-8", errors="ignore")).hexdigest()
+
+
+def read_generation(embeddings_path: Path) -> int:
+    """Collection generation, bumped by every ingest run that changes the store."""
+    try:
+        return int((embeddings_path / GENERATION_FILENAME).read_text(encoding="utf-8").strip())
+    except (OSError, ValueError):
+        return 0
+
+
+def bump_generation(embeddings_path: Path) -> int:
+    generation = read_generation(embeddings_path) + 1
+    embeddings_path.mkdir(parents=True, exist_ok=True)
+    target = embeddings_path / GENERATION_FILENAME
+    tmp_path = target.with_suffix(".tmp")
+    tmp_path.write_text(str(generation), encoding="utf-8")
+    os.replace(tmp_path, target)
+    return generation
+
+
+@dataclass
+class ManifestEntry:
+    path: str
+    base: str
+    size: int
+    mtime_ns: int
+    sha256: str
+    chunks: int
+    embedding_model: str
+    chunk_hashes: List[str] = field(default_factory=list)
+
+    def is_fresh(self, stat: os.stat_result, embedding_model: str) -> bool:
+        return (
+            self.size == stat.st_size
+            and self.mtime_ns == stat.st_mtime_ns
+            and self.embedding_model == embedding_model
+        )
+
+    def matches(self, sha256: str, embedding_model: str) -> bool:
+        return self.sha256 == sha256 and self.embedding_model == embedding_model
+
+
+class IngestManifest:
+    """Per-source record of what is currently stored in the vector collection."""
+
+    def __init__(self, path: Path, entries: Optional[Dict[str, ManifestEntry]] = None):
+        self.path = path
+        self.entries: Dict[str, ManifestEntry] = entries or {}
+        self.dirty = False
+
+    @classmethod
+    def load(cls, path: Path) -> "IngestManifest":
+        if not path.exists():
+            return cls(path)
+        try:
+            payload = json.loads(path.read_text(encoding="utf-8"))
+        except (OSError, ValueError):
+            print(f"⚠️ {path.name}: unreadable manifest, starting from scratch.")
+            return cls(path)
+        if payload.get("version") != MANIFEST_VERSION:
+            return cls(path)
+        entries = {
+            key: ManifestEntry(**value) for key, value in (payload.get("sources") or {}).items()
+        }
+        return cls(path, entries)
+
+    def save(self) -> None:
+        if not self.dirty:
+            return
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        payload = {
+            "version": MANIFEST_VERSION,
+            "sources": {key: asdict(entry) for key, entry in sorted(self.entries.items())},
+        }
+        tmp_path = self.path.with_suffix(".tmp")
+        tmp_path.write_text(json.dumps(payload, indent=1), encoding="utf-8")
+        os.replace(tmp_path, self.path)
+        self.dirty = False
+
+    def get(self, source: str) -> Optional[ManifestEntry]:
+        return self.entries.get(source)
+
+    def record(self, source: str, entry: ManifestEntry) -> None:
+        self.entries[source] = entry
+        self.dirty = True
+
+    def touch(self, source: str, stat: os.stat_result) -> None:
+        entry = self.entries[source]
+        entry.size = stat.st_size
+        entry.mtime_ns = stat.st_mtime_ns
+        self.dirty = True
+
+    def remove(self, source: str) -> None:
+        if self.entries.pop(source, None) is not None:
+            self.dirty = True
+
+    def stale_sources(self, directories: Iterable[Path], present: Iterable[str]) -> List[str]:
+        bases = {Path(directory).as_posix() for directory in directories}
+        seen = set(present)
+        return [
+            source
+            for source, entry in self.entries.items()
+            if entry.base in bases and source not in seen
+        ]
@@ -0,0 +1,192 @@
+from __future__ import annotations
+
+import bisect
+import contextvars
+import json
+import logging
+import sys
+import threading
+import time
+from contextlib import contextmanager
+from typing import Any, Dict, Iterator, List, Optional, Tuple
+
+from app.config import get_settings
+
+# Seconds; the last implicit bucket is +Inf. The tail covers whole-file ingest stages.
+LATENCY_BUCKETS = (0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+LATENCY_BUCKETS += (30.0, 60.0, 300.0)
+SIZE_BUCKETS = (1, 2, 4, 8, 16, 32, 64, 128, 256, 512, 1024)
+STAGE_METRIC = "josefgpt_stage_seconds"
+
+logger = logging.getLogger("josefgpt.timings")
+
+LabelKey = Tuple[Tuple[str, str], ...]
+
+
+class Histogram:
+    """Cumulative-bucket histogram per label set, rendered in Prometheus text format."""
+
+    def __init__(self, name: str, help_text: str, buckets=LATENCY_BUCKETS):
+        self.name = name
+        self.help_text = help_text
+        self.buckets = tuple(buckets)
+        self._series: Dict[LabelKey, List[float]] = {}
+        self._lock = threading.Lock()
+
+    def observe(self, value: float, **labels: str) -> None:
+        key = tuple(sorted(labels.items()))
+        slot = bisect.bisect_left(self.buckets, value)
+        with self._lock:
+            series = self._series.get(key)
+            if series is None:
+                # bucket counts, then +Inf count, then sum
+                series = self._series[key] = [0.0] * (len(self.buckets) + 2)
+            series[slot] += 1
+            series[-1] += value
+
+    def snapshot(self) -> Dict[LabelKey, Dict[str, Any]]:
+        with self._lock:
+            series = {key: list(values) for key, values in self._series.items()}
+        out: Dict[LabelKey, Dict[str, Any]] = {}
+        for key, values in series.items():
+            counts = values[:-1]
+            out[key] = {"count": int(sum(counts)), "sum": values[-1], "counts": counts}
+        return out
+
+    def render(self) -> List[str]:
+        lines = [f"# HELP {self.name} {self.help_text}", f"# TYPE {self.name} histogram"]
+        for key, data in sorted(self.snapshot().items()):
+            labels = ",".join(f'{name}="{value}"' for name, value in key)
+            cumulative = 0
+            for bound, count in zip(list(self.buckets) + ["+Inf"], data["counts"]):
+                cumulative += int(count)
+                sep = "," if labels else ""
+                lines.append(f'{self.name}_bucket{{{labels}{sep}le="{bound}"}} {cumulative}')
+            suffix = f"{{{labels}}}" if labels else ""
+            lines.append(f"{self.name}_sum{suffix} {data['sum']:.6f}")
+            lines.append(f"{self.name}_count{suffix} {data['count']}")
+        return lines
+
+    def reset(self) -> None:
+        with self._lock:
+            self._series.clear()
+
+
+stage_seconds = Histogram(STAGE_METRIC, "Latency of answer and ingest stages.")
+batch_items = Histogram("josefgpt_batch_items", "Items per micro-batch.", SIZE_BUCKETS)
+batch_requests = Histogram(
+    "josefgpt_batch_requests", "Caller requests merged into one micro-batch.", SIZE_BUCKETS
+)
+
+
+class Trace:
+    """Named stage durations of one operation (an answer, an ingest run, one ingested file).
+
+    A stage measured several times (e.g. one ``embed`` per batch) is summed, so
+    the histograms get one observation per stage per operation.
+    """
+
+    def __init__(self, op: str):
+        self.op = op
+        self.started = time.perf_counter()
+        self.stages: Dict[str, float] = {}
+        self.total_ms: Optional[float] = None
+
+    def add(self, stage: str, seconds: float) -> None:
+        self.stages[stage] = self.stages.get(stage, 0.0) + seconds * 1000
+
+    def as_dict(self) -> Dict[str, Any]:
+        total = self.total_ms
+        if total is None:
+            total = (time.perf_counter() - self.started) * 1000
+        stages = {stage: round(ms, 3) for stage, ms in self.stages.items()}
+        return {"total_ms": round(total, 3), "stages": stages}
+
+
+_current: contextvars.ContextVar[Optional[Trace]] = contextvars.ContextVar(
+    "josefgpt_trace", default=None
+)
+
+
+def record(stage: str, seconds: float, trace: Optional[Trace] = None) -> None:
+    """Add a measured stage to ``trace`` (default: the active one).
+
+    Outside any trace the duration goes straight to the histogram as ``op="untraced"``.
+    """
+    trace = trace or _current.get()
+    if trace is not None:
+        trace.add(stage, seconds)
+    else:
+        stage_seconds.observe(seconds, op="untraced", stage=stage)
+
+
+@contextmanager
+def span(stage: str, trace: Optional[Trace] = None) -> Iterator[None]:
+    """Time a block as ``stage`` of ``trace`` (default: the active one). Spans may nest."""
+    started = time.perf_counter()
+    try:
+        yield
+    finally:
+        record(stage, time.perf_counter() - started, trace)
+
+
+@contextmanager
+def activate(current: Trace) -> Iterator[Trace]:
+    """Make ``current`` the trace that spans in this block (and this context) report to."""
+    token = _current.set(current)
+    try:
+        yield current
+    finally:
+        _current.reset(token)
+
+
+@contextmanager
+def trace(op: str, **fields: Any) -> Iterator[Trace]:
+    """Collect the spans of one operation, then ``finish`` it."""
+    current = Trace(op)
+    try:
+        with activate(current):
+            yield current
+    finally:
+        finish(current, **fields)
+
+
+def finish(current: Trace, **fields: Any) -> Dict[str, Any]:
+    """Close ``current``: observe its stages and total, log it as one JSON line."""
+    seconds = time.perf_counter() - current.started
+    current.total_ms = seconds * 1000
+    for stage, ms in current.stages.items():
+        stage_seconds.observe(ms / 1000, op=current.op, stage=stage)
+    stage_seconds.observe(seconds, op=current.op, stage="total")
+    timings = current.as_dict()
+    log_json({"event": "timings", "op": current.op, **fields, **timings})
+    return timings
+
+
+_log_configured = False
+_log_lock = threading.Lock()
+
+
+def log_json(payload: Dict[str, Any]) -> None:
+    """Emit one JSON line on the ``josefgpt.timings`` logger (stderr when METRICS_LOG=true)."""
+    global _log_configured
+    if not _log_configured:
+        with _log_lock:
+            if not _log_configured and get_settings().metrics_log and not logger.handlers:
+                handler = logging.StreamHandler(sys.stderr)
+                handler.setFormatter(logging.Formatter("%(message)s"))
+                logger.addHandler(handler)
+                logger.setLevel(logging.INFO)
+                logger.propagate = False
+            _log_configured = True
+    if logger.isEnabledFor(logging.INFO):
+        logger.info(json.dumps(payload, default=str))
+
+
+def render_prometheus() -> str:
+    """All histograms in the Prometheus text exposition format (version 0.0.4)."""
+    lines: List[str] = []
+    for histogram in (stage_seconds, batch_items, batch_requests):
+        lines.extend(histogram.render())
+    return "\n".join(lines) + "\n"
+
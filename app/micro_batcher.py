@@ -0,0 +1,117 @@
+from __future__ import annotations
+
+import os
+import queue
+import threading
+import time
+from concurrent.futures import Future
+from typing import Any, Callable, Dict, Generic, List, Optional, Sequence, Tuple, TypeVar
+
+from app import metrics
+
+T = TypeVar("T")
+R = TypeVar("R")
+
+
+class MicroBatcher(Generic[T, R]):
+    """Merge concurrent calls of a batch function into shared calls.
+
+    ``batcher(items)`` queues ``items`` and blocks until a worker thread has
+    run ``fn`` over them together with whatever other callers queued: the
+    worker takes everything already waiting and, when callers are arriving
+    concurrently (this or the previous batch merged several), keeps
+    collecting for up to ``max_wait_ms`` or until ``max_batch`` items are
+    gathered. A lone caller is therefore not delayed. ``fn`` must return one
+    result per item, in order; a single call larger than ``max_batch`` runs
+    on its own.
+    """
+
+    def __init__(
+        self,
+        fn: Callable[[List[T]], Sequence[R]],
+        *,
+        max_batch: int = 64,
+        max_wait_ms: float = 2.0,
+        name: str = "batcher",
+    ):
+        self.fn = fn
+        self.max_batch = max(1, max_batch)
+        self.max_wait = max(0.0, max_wait_ms) / 1000
+        self.name = name
+        self._queue: "queue.Queue[Tuple[List[T], Future]]" = queue.Queue()
+        self._stats = {"requests": 0, "batches": 0, "items": 0, "max_items": 0}
+        self._lock = threading.Lock()
+        self._thread: Optional[threading.Thread] = None
+        self._pid = 0
+        self._concurrent = False
+
+    def __call__(self, items: Sequence[T]) -> List[R]:
+        return self.submit(items).result()
+
+    def submit(self, items: Sequence[T]) -> Future:
+        future: Future = Future()
+        items = list(items)
+        if not items:
+            future.set_result([])
+            return future
+        self._ensure_worker()
+        self._queue.put((items, future))
+        return future
+
+    def _ensure_worker(self) -> None:
+        # Started lazily, and again in a forked child, which inherits no threads.
+        if self._thread is not None and self._pid == os.getpid():
+            return
+        with self._lock:
+            if self._thread is None or self._pid != os.getpid():
+                self._pid = os.getpid()
+                self._thread = threading.Thread(
+                    target=self._run, name=f"{self.name}-batcher", daemon=True
+                )
+                self._thread.start()
+
+    def _collect(self) -> List[Tuple[List[T], Future]]:
+        jobs = [self._queue.get()]
+        size = len(jobs[0][0])
+        deadline = time.perf_counter() + self.max_wait
+        while size < self.max_batch:
+            remaining = deadline - time.perf_counter()
+            linger = remaining > 0 and (self._concurrent or len(jobs) > 1)
+            try:
+                job = self._queue.get(linger, max(remaining, 0.0))
+            except queue.Empty:
+                break
+            jobs.append(job)
+            size += len(job[0])
+        self._concurrent = len(jobs) > 1
+        return jobs
+
+    def _run(self) -> None:
+        while True:
+            jobs = self._collect()
+            items = [item for job_items, _ in jobs for item in job_items]
+            try:
+                results = self.fn(items)
+            except Exception as exc:
+                for _, future in jobs:
+                    future.set_exception(exc)
+                continue
+            with self._lock:
+                self._stats["requests"] += len(jobs)
+                self._stats["batches"] += 1
+                self._stats["items"] += len(items)
+                self._stats["max_items"] = max(self._stats["max_items"], len(items))
+            metrics.batch_items.observe(len(items), batcher=self.name)
+            metrics.batch_requests.observe(len(jobs), batcher=self.name)
+            start = 0
+            for job_items, future in jobs:
+                future.set_result(results[start : start + len(job_items)])
+                start += len(job_items)
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            stats: Dict[str, Any] = dict(self._stats)
+        batches = stats["batches"]
+        stats["requests_per_batch"] = stats["requests"] / batches if batches else 0.0
+        stats["items_per_batch"] = stats["items"] / batches if batches else 0.0
+        return stats
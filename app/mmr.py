@@ -0,0 +1,60 @@
+from __future__ import annotations
+
+from typing import Any, List, Optional, Sequence
+
+import numpy as np
+
+
+def _unit(matrix: np.ndarray) -> np.ndarray:
+    norms = np.linalg.norm(matrix, axis=-1, keepdims=True)
+    norms[norms == 0] = 1.0
+    return matrix / norms
+
+
+def mmr_select(
+    query: Sequence[float],
+    candidates: Any,
+    k: int,
+    *,
+    lambda_: float = 0.5,
+    sources: Optional[Sequence[Any]] = None,
+    per_source: int = 0,
+) -> List[int]:
+    """Indices of ``k`` candidates chosen by maximal marginal relevance.
+
+    Each step picks the candidate maximizing
+    ``lambda_ * sim(query, c) - (1 - lambda_) * max sim(c, already picked)``;
+    ``lambda_=1`` is plain relevance order. With ``per_source > 0`` a source
+    stops contributing once it has that many picks; if the caps leave fewer
+    than ``k`` candidates the rest are filled by MMR score without caps.
+    """
+    matrix = np.asarray(candidates, dtype=np.float32)
+    if matrix.ndim != 2 or not len(matrix):
+        return []
+    matrix = _unit(matrix)
+    # Stores with VECTOR_DIMS return Matryoshka-truncated vectors: compare on their dimensions.
+    relevance = matrix @ _unit(np.asarray(query, dtype=np.float32)[: matrix.shape[1]])
+    similarity = matrix @ matrix.T
+    k = min(k, len(matrix))
+    redundancy = np.zeros(len(matrix), dtype=np.float32)
+    available = np.ones(len(matrix), dtype=bool)
+    capped = np.zeros(len(matrix), dtype=bool)
+    if per_source > 0 and sources is not None:
+        _, codes = np.unique(np.asarray([str(source) for source in sources]), return_inverse=True)
+        picks_per_source = np.zeros(codes.max() + 1, dtype=np.int64)
+    else:
+        codes = None
+    selected: List[int] = []
+    while len(selected) < k:
+        scores = lambda_ * relevance - (1.0 - lambda_) * redundancy
+        open_slots = available & ~capped
+        pool = open_slots if open_slots.any() else available
+        best = int(np.argmax(np.where(pool, scores, -np.inf)))
+        selected.append(best)
+        available[best] = False
+        redundancy = np.maximum(redundancy, similarity[best])
+        if codes is not None:
+            picks_per_source[codes[best]] += 1
+            if picks_per_source[codes[best]] >= per_source:
+                capped |= codes == codes[best]
+    return selected
@@ -0,0 +1,108 @@
+from __future__ import annotations
+
+import random
+import time
+from concurrent.futures import ThreadPoolExecutor
+from typing import List, Optional, Sequence, Tuple
+
+from app.tokens import token_counter
+
+# OpenAI rejects embedding requests above 2048 inputs or ~300k tokens.
+DEFAULT_MAX_ITEMS = 2048
+DEFAULT_MAX_TOKENS = 250_000
+MAX_INPUT_TOKENS = 8191
+
+
+def _retry_after(exc: Exception) -> Optional[float]:
+    response = getattr(exc, "response", None)
+    headers = getattr(response, "headers", None) or {}
+    value = headers.get("retry-after")
+    try:
+        return float(value) if value is not None else None
+    except ValueError:
+        return None
+
+
+class OpenAIEmbeddingBatcher:
+    """Pack many chunks into token- and item-bounded requests and run them concurrently."""
+
+    def __init__(
+        self,
+        client,
+        model: str,
+        *,
+        max_items: int = DEFAULT_MAX_ITEMS,
+        max_tokens: int = DEFAULT_MAX_TOKENS,
+        concurrency: int = 4,
+        max_retries: int = 6,
+        backoff: float = 1.0,
+    ):
+        self.client = client
+        self.model = model
+        self.max_items = max(1, max_items)
+        self.max_tokens = max(1, max_tokens)
+        self.concurrency = max(1, concurrency)
+        self.max_retries = max_retries
+        self.backoff = backoff
+        self.count_tokens = token_counter(model)
+        self.requests = 0
+        self.retries = 0
+
+    def plan(self, texts: Sequence[str]) -> List[Tuple[int, int]]:
+        """Split ``texts`` into contiguous ``(start, stop)`` request ranges."""
+        batches: List[Tuple[int, int]] = []
+        start = 0
+        tokens = 0
+        for idx, text in enumerate(texts):
+            cost = min(self.count_tokens(text), MAX_INPUT_TOKENS)
+            if idx > start and (idx - start >= self.max_items or tokens + cost > self.max_tokens):
+                batches.append((start, idx))
+                start, tokens = idx, 0
+            tokens += cost
+        if start < len(texts):
+            batches.append((start, len(texts)))
+        return batches
+
+    def _request(self, texts: Sequence[str]) -> List[List[float]]:
+        from openai import APIConnectionError, APIStatusError, APITimeoutError, RateLimitError
+
+        attempt = 0
+        while True:
+            try:
+                self.requests += 1
+                resp = self.client.embeddings.create(model=self.model, input=list(texts))
+                ordered = sorted(resp.data, key=lambda item: item.index)
+                return [item.embedding for item in ordered]
+            except (RateLimitError, APIConnectionError, APITimeoutError, APIStatusError) as exc:
+                status = getattr(exc, "status_code", None)
+                retryable = isinstance(exc, (RateLimitError, APIConnectionError)) or (
+                    status is not None and status >= 500
+                )
+                if not retryable or attempt >= self.max_retries:
+                    raise
+                delay = _retry_after(exc)
+                if delay is None:
+                    delay = self.backoff * (2**attempt) * (0.5 + random.random())
+                attempt += 1
+                self.retries += 1
+                time.sleep(delay)
+
+    def embed(self, texts: Sequence[str]) -> List[List[float]]:
+        if not texts:
+            return []
+        batches = self.plan(texts)
+        if len(batches) == 1 or self.concurrency == 1:
+            results = [self._request(texts[start:stop]) for start, stop in batches]
+        else:
+            with ThreadPoolExecutor(max_workers=min(self.concurrency, len(batches))) as pool:
+                results = list(
+                    pool.map(lambda bounds: self._request(texts[bounds[0] : bounds[1]]), batches)
+                )
+        vectors: List[List[float]] = []
+        for (start, stop), batch_vectors in zip(batches, results):
+            if len(batch_vectors) != stop - start:
+                raise RuntimeError(
+                    f"Embedding response returned {len(batch_vectors)} vectors for {stop - start} inputs."
+                )
+            vectors.extend(batch_vectors)
+        return vectors
@@ -1,10 +1,29 @@
-from typing import Any, Dict, List, Optional
-
-import chromadb
-from sentence_transformers import SentenceTransformer
+import asyncio
+import contextvars
+import threading
+import time
+from concurrent.futures import FIRST_COMPLETED, Executor, Future, ThreadPoolExecutor, wait
+from typing import TYPE_CHECKING, Any, Dict, Iterable, Iterator, List, Optional, Tuple
 
+from app import metrics
+from app.answer_cache import answer_key, get_answer_cache
 from app.config import get_settings
-from app.llm import get_chat_llm
+from app.context_packer import pack_contexts
+from app.embedding_cache import get_embedding_cache
+from app.embedding_server import connect as connect_embedding_server
+from app.encoders import encoder_name, load_encoder
+from app.lexical_index import get_lexical_index
+from app.llm import BaseChatLLM, get_chat_llm
+from app.manifest import read_generation
+from app.micro_batcher import MicroBatcher
+from app.mmr import mmr_select
+from app.reranker import get_reranker
+from app.tokens import token_counter
+from app.ttl_cache import TTLCache
+from app.vector_store import open_collection
+
+if TYPE_CHECKING:  # heavy imports are deferred until first use
+    from sentence_transformers import SentenceTransformer
 
 settings = get_settings()
 
@@ -13,10 +32,34 @@ DEFAULT_TOP_K = settings.top_k
 DEFAULT_MAX_TOKENS = settings.max_tokens
 DEFAULT_TEMPERATURE = settings.temperature
 
-encoder = SentenceTransformer("all-MiniLM-L6-v2")
-db = chromadb.PersistentClient(path=settings.embeddings_path.as_posix())
-collection = db.get_or_create_collection("josef_knowledge")
-llm = get_chat_llm()
+QUERY_ENCODER_MODEL = encoder_name(settings)
+RETRIEVE_BATCH_SIZE = 256
+RETRIEVAL_MODES = ("dense", "hybrid", "bm25", "mmr")
+
+# Populated lazily by the get_* accessors (or directly, e.g. by tests).
+encoder: Optional["SentenceTransformer"] = None
+collection: Any = None
+llm: Optional[BaseChatLLM] = None
+_load_lock = threading.Lock()
+
+# In-process caches for repeated questions. Retrieval entries are keyed by the
+# collection generation that ingest_all bumps, so new ingests invalidate them.
+_memo_size = settings.query_cache_size if settings.query_cache else 0
+_embedding_memo = TTLCache(_memo_size, settings.query_cache_ttl)
+_retrieval_memo = TTLCache(_memo_size, settings.query_cache_ttl)
+_memo_generation = -1
+# Concurrent callers (server threads, UI sessions) share one forward pass per micro-batch.
+_encode_batcher = (
+    MicroBatcher(
+        lambda questions: _encode_direct(questions),
+        max_batch=settings.query_encode_max_batch,
+        max_wait_ms=settings.query_encode_max_wait_ms,
+        name="query_encode",
+    )
+    if settings.query_encode_batching
+    else None
+)
+retrieval_mode = settings.retrieval_mode.strip().lower()
 
 SYSTEM_PROMPT = (
     "You are Josef's elite business coach. "
@@ -24,27 +67,124 @@ SYSTEM_PROMPT = (
 )
 
 
+def get_encoder() -> "SentenceTransformer":
+    global encoder
+    if encoder is None:
+        with _load_lock:
+            if encoder is None and settings.embedding_server_url:
+                encoder = connect_embedding_server(
+                    settings.embedding_server_url,
+                    QUERY_ENCODER_MODEL,
+                    fallback=lambda: load_encoder(settings),
+                )
+            if encoder is None:
+                encoder = load_encoder(settings)
+    return encoder
+
+
+def get_collection():
+    global collection
+    if collection is None:
+        with _load_lock:
+            if collection is None:
+                collection = open_collection(settings)
+    return collection
+
+
+def get_llm() -> BaseChatLLM:
+    global llm
+    if llm is None:
+        with _load_lock:
+            if llm is None:
+                llm = get_chat_llm()
+    return llm
+
+
+def warmup(rerank: Optional[bool] = None) -> Dict[str, Any]:
+    """Load the encoder, collection, LLM (and reranker, if enabled) and run a throwaway encode."""
+    get_encoder().encode(["warmup"])
+    get_collection()
+    chat_llm = get_llm()
+    info: Dict[str, Any] = {"llm": {"mode": chat_llm.mode, "model": chat_llm.model_name}}
+    if settings.rerank if rerank is None else rerank:
+        reranker = get_reranker(settings)
+        reranker.model.predict([("warmup", "warmup")], show_progress_bar=False)
+        info["reranker"] = reranker.model_name
+    return info
+
+
+def set_nprobe(nprobe: int) -> bool:
+    """Override how many IVF lists the numpy store scans; False if the store has no IVF knob."""
+    store = get_collection()
+    if getattr(store, "index", None) is None:
+        return False
+    store.nprobe = max(1, int(nprobe))
+    _retrieval_memo.clear()
+    return True
+
+
+def set_retrieval_mode(mode: str) -> None:
+    """Switch retrieval between ``dense``, ``hybrid`` (BM25 + vectors), ``bm25`` and ``mmr``."""
+    global retrieval_mode
+    mode = mode.strip().lower()
+    if mode not in RETRIEVAL_MODES:
+        raise ValueError(f"Unknown retrieval mode {mode!r} (use {', '.join(RETRIEVAL_MODES)}).")
+    retrieval_mode = mode
+
+
 def _distance_to_score(distance: Any) -> Optional[float]:
     if isinstance(distance, (int, float)):
         return max(0.0, min(1.0, 1.0 - float(distance)))
     return None
 
 
-def retrieve_context(question: str, top_k: int = DEFAULT_TOP_K) -> List[Dict[str, Any]]:
-    q_emb = encoder.encode([question])[0].tolist()
-    try:
-        res = collection.query(
-            query_embeddings=[q_emb],
-            n_results=top_k,
-            include=["documents", "metadatas", "distances"],
-        )
-    except Exception:
-        return []
+def _encode_direct(questions: List[str]) -> List[List[float]]:
+    return [row.tolist() for row in get_encoder().encode(questions)]
+
+
+def _encode_questions(questions: List[str]) -> List[List[float]]:
+    if _encode_batcher is None:
+        return _encode_direct(questions)
+    return _encode_batcher(questions)
+
+
+def _normalize_question(question: str) -> str:
+    return " ".join(question.lower().split())
+
+
+def _encode_with_disk_cache(questions: List[str]) -> List[List[float]]:
+    cache = get_embedding_cache(settings)
+    if cache is None:
+        return _encode_questions(questions)
+    return cache.encode(f"local:{QUERY_ENCODER_MODEL}", questions, _encode_questions)
+
+
+def encode_questions(questions: List[str]) -> List[List[float]]:
+    keys = [_normalize_question(question) for question in questions]
+    vectors: List[Optional[List[float]]] = [_embedding_memo.get(key) for key in keys]
+    missing = [idx for idx, vector in enumerate(vectors) if vector is None]
+    if missing:
+        with metrics.span("encode"):
+            fresh = _encode_with_disk_cache([questions[idx] for idx in missing])
+        for idx, vector in zip(missing, fresh):
+            vectors[idx] = vector
+            _embedding_memo.put(keys[idx], vector)
+    return vectors  # type: ignore[return-value]
+
+
+def encode_question(question: str) -> List[float]:
+    return encode_questions([question])[0]
 
-    docs = (res.get("documents") or [[]])[0]
-    metas = (res.get("metadatas") or [[]])[0]
-    ids = (res.get("ids") or [[]])[0]
-    distances = (res.get("distances") or [[]])[0]
+
+def _contexts_from_result(res: Dict[str, Any], row: int) -> List[Dict[str, Any]]:
+    def column(name: str) -> List[Any]:
+        values = res.get(name) or []
+        return values[row] if row < len(values) and values[row] is not None else []
+
+    docs = column("documents")
+    metas = column("metadatas")
+    ids = column("ids")
+    distances = column("distances")
 
     contexts: List[Dict[str, Any]] = []
     for idx, doc in enumerate(docs):
@@ -64,6 +204,166 @@ def retrieve_context(question: str, top_k: int = DEFAULT_TOP_K) -> List[Dict[str
     return contexts
 
 
+def _query_collection(embeddings: List[List[float]], top_k: int) -> List[List[Dict[str, Any]]]:
+    try:
+        with metrics.span("vector_query"):
+            res = get_collection().query(
+                query_embeddings=embeddings,
+                n_results=top_k,
+                include=["documents", "metadatas", "distances"],
+            )
+    except Exception:
+        return [[] for _ in embeddings]
+    return [_contexts_from_result(res, row) for row in range(len(embeddings))]
+
+
+def _query_diverse(embeddings: List[List[float]], top_k: int) -> List[List[Dict[str, Any]]]:
+    """Over-fetch candidates with their stored vectors and keep an MMR-diverse ``top_k``."""
+    try:
+        with metrics.span("vector_query"):
+            res = get_collection().query(
+                query_embeddings=embeddings,
+                n_results=max(top_k, settings.mmr_candidates),
+                include=["documents", "metadatas", "distances", "embeddings"],
+            )
+    except Exception:
+        return [[] for _ in embeddings]
+    stored = res.get("embeddings")
+    results: List[List[Dict[str, Any]]] = []
+    with metrics.span("mmr"):
+        for row, query in enumerate(embeddings):
+            contexts = _contexts_from_result(res, row)
+            vectors = stored[row] if stored is not None and row < len(stored) else None
+            if vectors is None or len(vectors) != len(contexts):
+                results.append(contexts[:top_k])
+                continue
+            picked = mmr_select(
+                query,
+                vectors,
+                top_k,
+                lambda_=settings.mmr_lambda,
+                sources=[ctx["metadata"].get("source") for ctx in contexts],
+                per_source=settings.mmr_per_source,
+            )
+            results.append([contexts[idx] for idx in picked])
+    return results
+
+
+def _hydrate(contexts_per_query: List[List[Dict[str, Any]]]) -> None:
+    """Fill in text and metadata of BM25-only hits with one ``collection.get``."""
+    wanted = {
+        ctx["id"] for contexts in contexts_per_query for ctx in contexts if ctx["text"] is None
+    }
+    if not wanted:
+        return
+    try:
+        res = get_collection().get(ids=list(wanted), include=["documents", "metadatas"])
+    except Exception:  # pragma: no cover - defensive
+        res = {}
+    metas = res.get("metadatas") or []
+    found = {
+        item_id: (doc, metas[idx] if idx < len(metas) else {})
+        for idx, (item_id, doc) in enumerate(zip(res.get("ids") or [], res.get("documents") or []))
+    }
+    for contexts in contexts_per_query:
+        # Hits the store no longer holds (the BM25 index lags a concurrent ingest) are dropped.
+        contexts[:] = [ctx for ctx in contexts if ctx["text"] is not None or ctx["id"] in found]
+        for ctx in contexts:
+            if ctx["text"] is None:
+                ctx["text"], metadata = found[ctx["id"]]
+                ctx["metadata"] = metadata or {}
+
+
+def _fuse(
+    dense: List[Dict[str, Any]], lexical: List[Tuple[str, float]], top_k: int
+) -> List[Dict[str, Any]]:
+    """Reciprocal rank fusion: each list adds ``1 / (RRF_K + rank)`` to the chunks it returned."""
+    rrf_k = settings.rrf_k
+    fused: Dict[str, Dict[str, Any]] = {}
+    for rank, ctx in enumerate(dense, start=1):
+        key = ctx.get("id") or ctx.get("text")
+        fused[key] = dict(ctx, fusion=1.0 / (rrf_k + rank))
+    for rank, (item_id, score) in enumerate(lexical, start=1):
+        entry = fused.setdefault(
+            item_id, {"id": item_id, "text": None, "metadata": {}, "fusion": 0.0}
+        )
+        entry["bm25"] = score
+        entry["fusion"] += 1.0 / (rrf_k + rank)
+    ranked = sorted(fused.values(), key=lambda ctx: -ctx["fusion"])
+    return ranked[:top_k]
+
+
+def _search(questions: List[str], top_k: int, mode: str) -> List[List[Dict[str, Any]]]:
+    if mode == "mmr":
+        return _query_diverse(encode_questions(questions), top_k)
+    lexical = get_lexical_index(settings) if mode != "dense" else None
+    if lexical is None or not lexical.compiled:
+        return _query_collection(encode_questions(questions), top_k)
+    if mode == "bm25":
+        with metrics.span("bm25"):
+            hits_per_query = lexical.search(questions, top_k)
+        results = [_fuse([], hits, top_k) for hits in hits_per_query]
+    else:
+        # Both rankers see a deeper candidate list than top_k so fusion can promote across them.
+        depth = max(top_k, settings.hybrid_candidates)
+        dense = _query_collection(encode_questions(questions), depth)
+        with metrics.span("bm25"):
+            sparse = lexical.search(questions, depth)
+        results = [_fuse(ctx, hits, top_k) for ctx, hits in zip(dense, sparse)]
+    with metrics.span("hydrate"):
+        _hydrate(results)
+    return results
+
+
+def _sync_generation() -> int:
+    global _memo_generation
+    generation = read_generation(settings.embeddings_path)
+    if generation != _memo_generation:
+        _retrieval_memo.clear()
+        _memo_generation = generation
+    return generation
+
+
+def retrieve_context(question: str, top_k: int = DEFAULT_TOP_K) -> List[Dict[str, Any]]:
+    return retrieve_many([question], top_k)[0]
+
+
+def retrieve_many(questions: List[str], top_k: int = DEFAULT_TOP_K) -> List[List[Dict[str, Any]]]:
+    """Retrieve contexts for many questions with one encode pass and one collection query."""
+    if not questions:
+        return []
+    generation = _sync_generation()
+    mode = retrieval_mode
+    keys = [(generation, mode, _normalize_question(question), top_k) for question in questions]
+    results: List[Optional[List[Dict[str, Any]]]] = [_retrieval_memo.get(key) for key in keys]
+    missing = [idx for idx, contexts in enumerate(results) if contexts is None]
+    if missing:
+        with metrics.span("retrieve"):
+            fresh = _search([questions[idx] for idx in missing], top_k, mode)
+        for idx, contexts in zip(missing, fresh):
+            results[idx] = contexts
+            if contexts:
+                _retrieval_memo.put(keys[idx], contexts)
+    return [[dict(ctx) for ctx in contexts or []] for contexts in results]
+
+
+def cache_stats() -> Dict[str, Any]:
+    """Hit/miss counters of the question embedding, retrieval and answer caches."""
+    stats: Dict[str, Any] = {
+        "generation": _memo_generation,
+        "embeddings": _embedding_memo.stats(),
+        "retrieval": _retrieval_memo.stats(),
+    }
+    answer_cache = get_answer_cache(settings)
+    if answer_cache is not None:
+        stats["answers"] = answer_cache.stats()
+    if settings.rerank:
+        stats["rerank"] = get_reranker(settings).stats()
+    if _encode_batcher is not None:
+        stats["encode_batching"] = _encode_batcher.stats()
+    return stats
+
+
 def _format_prompt_context(contexts: List[Dict[str, Any]]) -> str:
     if not contexts:
         return "No relevant context was retrieved from the knowledge base."
@@ -102,49 +402,326 @@ def build_user_prompt(question: str, contexts: List[Dict[str, Any]]) -> str:
     return f"Context:\n{ctx}\n\nQuestion: {question}"
 
 
+def _resolve_config(
+    top_k: Optional[int],
+    temperature: Optional[float],
+    max_tokens: Optional[int],
+    rerank: Optional[bool] = None,
+) -> Dict[str, Any]:
+    return {
+        "top_k": DEFAULT_TOP_K if top_k is None else int(top_k),
+        "temperature": DEFAULT_TEMPERATURE if temperature is None else float(temperature),
+        "max_tokens": DEFAULT_MAX_TOKENS if max_tokens is None else int(max_tokens),
+        "retrieval": retrieval_mode,
+        "rerank": settings.rerank if rerank is None else bool(rerank),
+    }
+
+
+def _rerank_depth(config: Dict[str, Any]) -> int:
+    """How many candidates to retrieve: ``top_k``, or the rerank pool when reranking."""
+    return max(config["top_k"], settings.rerank_candidates) if config["rerank"] else config["top_k"]
+
+
+def _rerank(
+    question: str, candidates: List[Dict[str, Any]], config: Dict[str, Any]
+) -> Tuple[List[Dict[str, Any]], Optional[Dict[str, Any]]]:
+    if not config["rerank"]:
+        return candidates, None
+    with metrics.span("rerank"):
+        return get_reranker(settings).rerank(question, candidates, config["top_k"])
+
+
+def _retrieve_for_answer(
+    question: str, config: Dict[str, Any]
+) -> Tuple[List[Dict[str, Any]], Optional[Dict[str, Any]]]:
+    return _rerank(question, retrieve_context(question, _rerank_depth(config)), config)
+
+
+class _AnswerDraft:
+    """Prompt, answer-cache lookup and result assembly shared by blocking and streaming answers."""
+
+    def __init__(
+        self,
+        question: str,
+        contexts: List[Dict[str, Any]],
+        config: Dict[str, Any],
+        rerank: Optional[Dict[str, Any]] = None,
+    ):
+        self.question = question
+        self.contexts = contexts
+        self.config = config
+        self.rerank = rerank
+        self.chat_llm = get_llm()
+        self.model = getattr(self.chat_llm, "model_name", OPENAI_MODEL)
+        prompt_contexts = contexts
+        if settings.context_packing:
+            with metrics.span("pack"):
+                prompt_contexts, packing = pack_contexts(
+                    contexts,
+                    budget_tokens=settings.context_token_budget,
+                    count_tokens=token_counter(self.model),
+                    dedupe_threshold=settings.context_dedupe_threshold,
+                )
+            self.config = dict(config, packing=packing)
+        self.user_prompt = build_user_prompt(question, prompt_contexts)
+        self.messages = [
+            {"role": "system", "content": SYSTEM_PROMPT},
+            {"role": "user", "content": self.user_prompt},
+        ]
+        self.sources = _summarise_sources(contexts)
+        self.cache_info: Dict[str, Any] = {}
+        self.cached_answer: Optional[str] = None
+        # Offline answers are free and echo the question, so they are never cached.
+        self._answer_cache = (
+            get_answer_cache(settings) if self.chat_llm.mode != "offline" else None
+        )
+        if self._answer_cache is not None:
+            self._key = answer_key(self.model, config, contexts)
+            self._q_emb = encode_question(question)
+            with metrics.span("answer_cache"):
+                cached = self._answer_cache.lookup(self._key, self._q_emb)
+            self.cache_info["answer"] = "hit" if cached else "miss"
+            if cached is not None:
+                self.cached_answer = cached["raw_answer"]
+                self.cache_info["similarity"] = cached["similarity"]
+                self.cache_info["cached_question"] = cached["cached_question"]
+
+    def store(self, raw_answer: str) -> None:
+        if self._answer_cache is not None and self.cached_answer is None:
+            self._answer_cache.store(
+                self._key, self.question, self._q_emb, {"raw_answer": raw_answer}
+            )
+
+    def sources_suffix(self, raw_answer: str) -> str:
+        if "Sources" in raw_answer or not self.sources:
+            return ""
+        sources_text = "\n".join(summary["source"] for summary in self.sources[:5])
+        return f"\n\nSources:\n{sources_text}"
+
+    def result(self, raw_answer: str) -> Dict[str, Any]:
+        result = {
+            "question": self.question,
+            "answer": raw_answer + self.sources_suffix(raw_answer),
+            "raw_answer": raw_answer,
+            "sources": self.sources,
+            "contexts": self.contexts,
+            "prompt": self.user_prompt,
+            "config": dict(self.config),
+            "llm": {"mode": self.chat_llm.mode, "model": self.model},
+        }
+        if self.cache_info:
+            result["cache"] = self.cache_info
+        if self.rerank is not None:
+            result["rerank"] = self.rerank
+        return result
+
+
+def _complete_answer(
+    question: str,
+    contexts: List[Dict[str, Any]],
+    config: Dict[str, Any],
+    rerank: Optional[Dict[str, Any]] = None,
+) -> Dict[str, Any]:
+    draft = _AnswerDraft(question, contexts, config, rerank)
+    raw_answer = draft.cached_answer
+    if raw_answer is None:
+        with metrics.span("llm"):
+            raw_answer = draft.chat_llm.generate(
+                draft.messages,
+                temperature=config["temperature"],
+                max_tokens=config["max_tokens"],
+            )
+        draft.store(raw_answer)
+    return draft.result(raw_answer)
+
+
+def _complete_traced(
+    trace: metrics.Trace,
+    question: str,
+    contexts: List[Dict[str, Any]],
+    config: Dict[str, Any],
+    rerank: Optional[Dict[str, Any]] = None,
+) -> Dict[str, Any]:
+    """``_complete_answer`` under ``trace``, which is finished and attached as ``timings``."""
+    try:
+        with metrics.activate(trace):
+            result = _complete_answer(question, contexts, config, rerank)
+    finally:
+        timings = metrics.finish(trace, retrieval=config["retrieval"])
+    result["timings"] = timings
+    return result
+
+
 def answer_with_context(
     question: str,
     *,
     top_k: Optional[int] = None,
     temperature: Optional[float] = None,
     max_tokens: Optional[int] = None,
+    rerank: Optional[bool] = None,
 ) -> Dict[str, Any]:
-    effective_top_k = DEFAULT_TOP_K if top_k is None else int(top_k)
-    effective_temperature = (
-        DEFAULT_TEMPERATURE if temperature is None else float(temperature)
-    )
-    effective_max_tokens = DEFAULT_MAX_TOKENS if max_tokens is None else int(max_tokens)
+    config = _resolve_config(top_k, temperature, max_tokens, rerank)
+    trace = metrics.Trace("answer")
+    with metrics.activate(trace):
+        contexts, rerank_info = _retrieve_for_answer(question, config)
+    return _complete_traced(trace, question, contexts, config, rerank_info)
 
-    contexts = retrieve_context(question, effective_top_k)
-    user_prompt = build_user_prompt(question, contexts)
-    raw_answer = llm.generate(
-        [
-            {"role": "system", "content": SYSTEM_PROMPT},
-            {"role": "user", "content": user_prompt},
-        ],
-        temperature=effective_temperature,
-        max_tokens=effective_max_tokens,
-    )
-    source_summaries = _summarise_sources(contexts)
-    if "Sources" not in raw_answer and source_summaries:
-        sources_text = "\n".join(summary["source"] for summary in source_summaries[:5])
-        answer = f"{raw_answer}\n\nSources:\n{sources_text}"
+
+async def aanswer_with_context(
+    question: str,
+    *,
+    top_k: Optional[int] = None,
+    temperature: Optional[float] = None,
+    max_tokens: Optional[int] = None,
+    rerank: Optional[bool] = None,
+    executor: Optional[Executor] = None,
+) -> Dict[str, Any]:
+    """Async ``answer_with_context`` for servers.
+
+    Encoding, retrieval, reranking and answer-cache work runs on ``executor``
+    (the loop's default pool when omitted); the LLM call goes through
+    ``agenerate`` so an OpenAI request does not hold a worker thread while it
+    waits.
+    """
+    loop = asyncio.get_running_loop()
+    config = _resolve_config(top_k, temperature, max_tokens, rerank)
+
+    def run(fn, *args):
+        # Executor threads do not inherit the task's context; hand it the active trace.
+        return loop.run_in_executor(executor, contextvars.copy_context().run, fn, *args)
+
+    with metrics.trace("answer", retrieval=config["retrieval"]) as trace:
+        contexts, rerank_info = await run(_retrieve_for_answer, question, config)
+        draft = await run(_AnswerDraft, question, contexts, config, rerank_info)
+        raw_answer = draft.cached_answer
+        if raw_answer is None:
+            with metrics.span("llm"):
+                raw_answer = await draft.chat_llm.agenerate(
+                    draft.messages,
+                    temperature=config["temperature"],
+                    max_tokens=config["max_tokens"],
+                )
+            await run(draft.store, raw_answer)
+    result = draft.result(raw_answer)
+    result["timings"] = trace.as_dict()
+    return result
+
+
+def answer_with_context_stream(
+    question: str,
+    *,
+    top_k: Optional[int] = None,
+    temperature: Optional[float] = None,
+    max_tokens: Optional[int] = None,
+    rerank: Optional[bool] = None,
+) -> Iterator[Dict[str, Any]]:
+    """Streaming variant of ``answer_with_context``.
+
+    Yields a ``context`` event once retrieval finishes, ``token`` events as the
+    LLM produces text (their concatenation equals the final ``answer``), then a
+    ``done`` event carrying the same dict ``answer_with_context`` returns.
+    """
+    config = _resolve_config(top_k, temperature, max_tokens, rerank)
+    # The trace is only active around synchronous work: a generator must not
+    # leave it set in the consumer's context between yields.
+    trace = metrics.Trace("answer_stream")
+    with metrics.activate(trace):
+        contexts, rerank_info = _retrieve_for_answer(question, config)
+        draft = _AnswerDraft(question, contexts, config, rerank_info)
+    yield {"type": "context", "sources": draft.sources, "contexts": contexts}
+    if draft.cached_answer is not None:
+        raw_answer = draft.cached_answer
+        yield {"type": "token", "text": raw_answer}
     else:
-        answer = raw_answer
-    return {
-        "question": question,
-        "answer": answer,
-        "raw_answer": raw_answer,
-        "sources": source_summaries,
-        "contexts": contexts,
-        "prompt": user_prompt,
-        "config": {
-            "top_k": effective_top_k,
-            "temperature": effective_temperature,
-            "max_tokens": effective_max_tokens,
-        },
-        "llm": {"mode": llm.mode, "model": getattr(llm, "model_name", OPENAI_MODEL)},
-    }
+        pieces: List[str] = []
+        started = time.perf_counter()
+        for piece in draft.chat_llm.generate_stream(
+            draft.messages,
+            temperature=config["temperature"],
+            max_tokens=config["max_tokens"],
+        ):
+            if not pieces:
+                metrics.record("llm_first_token", time.perf_counter() - started, trace)
+            pieces.append(piece)
+            yield {"type": "token", "text": piece}
+        metrics.record("llm", time.perf_counter() - started, trace)
+        raw_answer = "".join(pieces)
+        draft.store(raw_answer)
+    suffix = draft.sources_suffix(raw_answer)
+    if suffix:
+        yield {"type": "token", "text": suffix}
+    result = draft.result(raw_answer)
+    result["timings"] = metrics.finish(trace, retrieval=config["retrieval"])
+    yield {"type": "done", "result": result}
+
+
+def iter_answers(
+    questions: Iterable[str],
+    *,
+    top_k: Optional[int] = None,
+    temperature: Optional[float] = None,
+    max_tokens: Optional[int] = None,
+    rerank: Optional[bool] = None,
+    concurrency: Optional[int] = None,
+    batch_size: int = RETRIEVE_BATCH_SIZE,
+) -> Iterator[Tuple[int, Dict[str, Any]]]:
+    """Yield ``(index, result)`` pairs as answers complete.
+
+    Questions are retrieved ``batch_size`` at a time (one batched encode and one
+    multi-embedding query per batch) while up to ``concurrency`` LLM calls run
+    in a thread pool. A failed LLM call yields a result with an ``error`` key.
+    """
+    config = _resolve_config(top_k, temperature, max_tokens, rerank)
+    workers = max(1, int(concurrency or settings.answer_concurrency))
+    batches = _batched(enumerate(questions), batch_size)
+    get_llm()
+    with ThreadPoolExecutor(max_workers=workers, thread_name_prefix="answer") as pool:
+        in_flight: Dict[Future, Tuple[int, str]] = {}
+
+        def collect(block: bool) -> Iterator[Tuple[int, Dict[str, Any]]]:
+            done, _ = wait(in_flight, timeout=None if block else 0, return_when=FIRST_COMPLETED)
+            for future in done:
+                index, question = in_flight.pop(future)
+                try:
+                    yield index, future.result()
+                except Exception as exc:
+                    yield index, {"question": question, "error": str(exc), "config": dict(config)}
+
+        for batch in batches:
+            with metrics.trace("answer_batch", questions=len(batch)):
+                candidates = retrieve_many(
+                    [question for _, question in batch], _rerank_depth(config)
+                )
+            for (index, question), ctx in zip(batch, candidates):
+                trace = metrics.Trace("answer")
+                with metrics.activate(trace):
+                    ctx, rerank_info = _rerank(question, ctx, config)
+                future = pool.submit(_complete_traced, trace, question, ctx, config, rerank_info)
+                in_flight[future] = (index, question)
+            while len(in_flight) > workers:
+                yield from collect(block=True)
+            yield from collect(block=False)
+        while in_flight:
+            yield from collect(block=True)
+
+
+def answer_many(questions: List[str], **kwargs: Any) -> List[Dict[str, Any]]:
+    """Answer ``questions`` concurrently and return results in input order."""
+    results: List[Optional[Dict[str, Any]]] = [None] * len(questions)
+    for index, result in iter_answers(questions, **kwargs):
+        results[index] = result
+    return results  # type: ignore[return-value]
+
+
+def _batched(items: Iterable[Any], size: int) -> Iterator[List[Any]]:
+    batch: List[Any] = []
+    for item in items:
+        batch.append(item)
+        if len(batch) >= size:
+            yield batch
+            batch = []
+    if batch:
+        yield batch
 
 
 def answer_with_gpt5(question: str) -> str:
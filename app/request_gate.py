@@ -0,0 +1,68 @@
+from __future__ import annotations
+
+import asyncio
+from typing import Any, Awaitable, Callable, Dict, Hashable
+
+
+class GateFull(Exception):
+    """Raised when a request arrives while ``max_pending`` requests are already running."""
+
+
+class RequestGate:
+    """Admission control plus coalescing of identical in-flight requests.
+
+    Callers that share a ``key`` with a request already running await that
+    request's result instead of starting their own; they do not count towards
+    ``max_pending``. Must be used from a single event loop.
+    """
+
+    def __init__(self, max_pending: int):
+        self.max_pending = max(1, max_pending)
+        self.pending = 0
+        self.coalesced = 0
+        self.rejected = 0
+        self._inflight: Dict[Hashable, asyncio.Future] = {}
+
+    @property
+    def full(self) -> bool:
+        return self.pending >= self.max_pending
+
+    def check(self) -> None:
+        if self.full:
+            self.rejected += 1
+            raise GateFull(f"{self.pending} requests already pending")
+
+    def acquire(self) -> None:
+        self.check()
+        self.pending += 1
+
+    def release(self) -> None:
+        self.pending -= 1
+
+    async def run(self, key: Hashable, factory: Callable[[], Awaitable[Any]]) -> Any:
+        inflight = self._inflight.get(key)
+        if inflight is not None:
+            self.coalesced += 1
+            # Shield so one follower disconnecting does not cancel the shared work.
+            return await asyncio.shield(inflight)
+        self.acquire()
+        task = asyncio.ensure_future(factory())
+        self._inflight[key] = task
+        task.add_done_callback(lambda _: self._finish(key, task))
+        return await asyncio.shield(task)
+
+    def _finish(self, key: Hashable, task: asyncio.Future) -> None:
+        if self._inflight.get(key) is task:
+            del self._inflight[key]
+        self.release()
+        if not task.cancelled():
+            task.exception()  # mark retrieved when every waiter has gone away
+
+    def stats(self) -> Dict[str, int]:
+        return {
+            "pending": self.pending,
+            "max_pending": self.max_pending,
+            "inflight_keys": len(self._inflight),
+            "coalesced": self.coalesced,
+            "rejected": self.rejected,
+        }
@@ -0,0 +1,145 @@
+from __future__ import annotations
+
+import threading
+import time
+from concurrent.futures import Future, ThreadPoolExecutor
+from concurrent.futures import TimeoutError as FuturesTimeout
+from typing import TYPE_CHECKING, Any, Dict, List, Optional, Sequence, Tuple
+
+from app.config import Settings, get_settings
+from app.embedding_cache import text_hash
+from app.ttl_cache import TTLCache
+
+if TYPE_CHECKING:  # torch is only imported when reranking is first used
+    from sentence_transformers import CrossEncoder
+
+
+class CrossEncoderReranker:
+    """Scores (question, chunk) pairs with a local cross-encoder.
+
+    Uncached pairs of one query go through a single batched ``predict`` on a
+    dedicated worker thread. If that does not finish within ``budget_ms`` the
+    caller gets the candidates in their original (vector) order: a pass that
+    already started completes in the background and fills the pair-score
+    cache, a queued one is cancelled. With a budget, at most ``max_pending``
+    passes are running or queued; further callers fall back at once instead
+    of waiting behind a backlog they cannot outlast.
+    """
+
+    def __init__(
+        self,
+        model_name: str,
+        *,
+        budget_ms: float = 0.0,
+        cache_size: int = 4096,
+        cache_ttl: float = 3600.0,
+        max_pending: int = 2,
+    ):
+        self.model_name = model_name
+        self.budget_ms = budget_ms
+        self.max_pending = max(1, max_pending)
+        self.fallbacks = 0
+        self._pending = 0
+        self._pending_lock = threading.Lock()
+        self._model: Optional["CrossEncoder"] = None
+        self._load_lock = threading.Lock()
+        self._scores = TTLCache(cache_size, cache_ttl)
+        self._pool = ThreadPoolExecutor(max_workers=1, thread_name_prefix="rerank")
+
+    @property
+    def model(self) -> "CrossEncoder":
+        if self._model is None:
+            with self._load_lock:
+                if self._model is None:
+                    from sentence_transformers import CrossEncoder
+
+                    self._model = CrossEncoder(self.model_name)
+        return self._model
+
+    def _predict(self, pairs: List[Tuple[str, str]], keys: List[Tuple[str, str]]) -> List[float]:
+        scores = self.model.predict(pairs, batch_size=max(1, len(pairs)), show_progress_bar=False)
+        scores = [float(score) for score in scores]
+        for key, score in zip(keys, scores):
+            self._scores.put(key, score)
+        return scores
+
+    def _release(self, _future: Future) -> None:
+        with self._pending_lock:
+            self._pending -= 1
+
+    def _submit(
+        self, pairs: List[Tuple[str, str]], keys: List[Tuple[str, str]], bounded: bool
+    ) -> Optional[Future]:
+        with self._pending_lock:
+            if bounded and self._pending >= self.max_pending:
+                return None
+            self._pending += 1
+        future = self._pool.submit(self._predict, pairs, keys)
+        future.add_done_callback(self._release)
+        return future
+
+    def rerank(
+        self,
+        question: str,
+        contexts: Sequence[Dict[str, Any]],
+        top_n: int,
+        budget_ms: Optional[float] = None,
+    ) -> Tuple[List[Dict[str, Any]], Dict[str, Any]]:
+        """Best ``top_n`` contexts by cross-encoder score, plus timing/cache info."""
+        started = time.perf_counter()
+        question_key = " ".join(question.lower().split())
+        keys = [(question_key, text_hash(ctx.get("text") or "")) for ctx in contexts]
+        scores: List[Optional[float]] = [self._scores.get(key) for key in keys]
+        missing = [idx for idx, score in enumerate(scores) if score is None]
+        info: Dict[str, Any] = {
+            "model": self.model_name,
+            "candidates": len(contexts),
+            "cached": len(contexts) - len(missing),
+            "fallback": False,
+        }
+        if missing:
+            budget = self.budget_ms if budget_ms is None else budget_ms
+            pairs = [(question, contexts[idx].get("text") or "") for idx in missing]
+            future = self._submit(pairs, [keys[idx] for idx in missing], bounded=budget > 0)
+            if future is None:
+                self.fallbacks += 1
+                info["fallback"] = "busy"
+            else:
+                try:
+                    fresh = future.result(timeout=budget / 1000 if budget > 0 else None)
+                except FuturesTimeout:
+                    future.cancel()  # only succeeds while still queued
+                    self.fallbacks += 1
+                    info["fallback"] = "budget"
+                except Exception as exc:  # pragma: no cover - defensive
+                    self.fallbacks += 1
+                    info["fallback"] = f"error: {exc}"
+                else:
+                    for idx, score in zip(missing, fresh):
+                        scores[idx] = score
+        info["ms"] = (time.perf_counter() - started) * 1000
+        if info["fallback"]:
+            return [dict(ctx) for ctx in contexts[:top_n]], info
+        order = sorted(range(len(contexts)), key=lambda idx: -scores[idx])[:top_n]
+        return [dict(contexts[idx], rerank_score=scores[idx]) for idx in order], info
+
+    def stats(self) -> Dict[str, Any]:
+        return {**self._scores.stats(), "fallbacks": self.fallbacks}
+
+
+_rerankers: Dict[str, CrossEncoderReranker] = {}
+_rerankers_lock = threading.Lock()
+
+
+def get_reranker(settings: Optional[Settings] = None) -> CrossEncoderReranker:
+    settings = settings or get_settings()
+    with _rerankers_lock:
+        if settings.rerank_model not in _rerankers:
+            _rerankers[settings.rerank_model] = CrossEncoderReranker(
+                settings.rerank_model,
+                budget_ms=settings.rerank_budget_ms,
+                cache_size=settings.rerank_cache_size,
+                cache_ttl=settings.query_cache_ttl,
+                max_pending=settings.rerank_max_pending,
+            )
+        return _rerankers[settings.rerank_model]
@@ -0,0 +1,19 @@
+from __future__ import annotations
+
+from functools import lru_cache
+from typing import Callable
+
+
+@lru_cache(maxsize=8)
+def token_counter(model: str) -> Callable[[str], int]:
+    """Token count function for ``model``: tiktoken when available, else ~4 chars per token."""
+    try:
+        import tiktoken  # optional; falls back to a character heuristic
+
+        try:
+            encoding = tiktoken.encoding_for_model(model)
+        except KeyError:
+            encoding = tiktoken.get_encoding("cl100k_base")
+        return lambda text: len(encoding.encode(text, disallowed_special=()))
+    except Exception:  # not installed, or the BPE file cannot be fetched offline
+        return lambda text: len(text) // 4 + 1
@@ -9,17 +9,33 @@ if __package__ is None or __package__ == "":
         sys.path.insert(0, str(project_root))
 
 import streamlit as st
+from app.config import get_settings
 from app.llm import get_chat_llm
 from app.query_engine import (
     DEFAULT_MAX_TOKENS,
     DEFAULT_TEMPERATURE,
     DEFAULT_TOP_K,
-    answer_with_context,
+    answer_with_context_stream,
+    cache_stats,
+    warmup,
 )
 
 st.set_page_config(page_title="JosefGPT Local", layout="wide")
 st.title("🧠 JosefGPT — Hybrid Reasoning Chat")
 
+
+@st.cache_resource(show_spinner="Loading encoder and knowledge base...")
+def _warm_engine():
+    # Runs once per server process; later sessions reuse the loaded models.
+    return warmup()
+
+
+@st.cache_resource(show_spinner="Loading re-ranking model...")
+def _warm_reranker():
+    return warmup(rerank=True)
+
+
+_warm_engine()
 llm = get_chat_llm()
 
 if "history" not in st.session_state:
@@ -33,6 +49,7 @@ settings_defaults = {
     "top_k": DEFAULT_TOP_K,
     "temperature": DEFAULT_TEMPERATURE,
     "max_tokens": DEFAULT_MAX_TOKENS,
+    "rerank": get_settings().rerank,
 }
 if "settings" not in st.session_state:
     st.session_state.settings = settings_defaults.copy()
@@ -65,25 +82,54 @@ with st.sidebar:
         step=50,
         help="Upper bound on generated token count.",
     )
+    rerank = st.checkbox(
+        "Re-rank with cross-encoder",
+        value=bool(st.session_state.settings.get("rerank", settings_defaults["rerank"])),
+        help=(
+            f"Retrieve {get_settings().rerank_candidates} candidates and keep the k best by "
+            "cross-encoder score (falls back to retrieval order if it exceeds the time budget)."
+        ),
+    )
+    if rerank:
+        _warm_reranker()
     if st.button("Reset to defaults"):
         st.session_state.settings = settings_defaults.copy()
         top_k = settings_defaults["top_k"]
         temperature = settings_defaults["temperature"]
         max_tokens = settings_defaults["max_tokens"]
+        rerank = settings_defaults["rerank"]
+    query_cache = cache_stats()
+    st.caption(
+        "Query cache hit rate — retrieval "
+        f"{query_cache['retrieval']['hit_rate']:.0%}, "
+        f"embeddings {query_cache['embeddings']['hit_rate']:.0%}"
+    )
 
 st.session_state.settings.update(
-    {"top_k": top_k, "temperature": temperature, "max_tokens": max_tokens}
+    {"top_k": top_k, "temperature": temperature, "max_tokens": max_tokens, "rerank": rerank}
 )
 user_input = st.text_area("💬 Your question", key="question_input", height=100)
 
 if st.button("Ask") and user_input.strip():
-    with st.spinner("Thinking..."):
-        result = answer_with_context(
+    with st.spinner("Retrieving context..."):
+        events = answer_with_context_stream(
             user_input,
             top_k=st.session_state.settings["top_k"],
             temperature=st.session_state.settings["temperature"],
             max_tokens=st.session_state.settings["max_tokens"],
+            rerank=st.session_state.settings["rerank"],
         )
+        next(events)  # context event: retrieval is done once it arrives
+    placeholder = st.empty()
+    streamed = ""
+    result = {}
+    for event in events:
+        if event["type"] == "token":
+            streamed += event["text"]
+            placeholder.markdown(f"**🤖 JosefGPT:** {streamed}▌")
+        elif event["type"] == "done":
+            result = event["result"]
+    placeholder.empty()
     entry = {
         "question": user_input,
         "answer": result.get("answer", ""),
@@ -91,6 +137,9 @@ if st.button("Ask") and user_input.strip():
         "contexts": result.get("contexts", []),
         "config": result.get("config"),
         "llm": result.get("llm"),
+        "cache": result.get("cache"),
+        "rerank": result.get("rerank"),
+        "timings": result.get("timings"),
     }
     st.session_state.history.append(entry)
     st.session_state.question_input = ""
@@ -107,8 +156,25 @@ for item in reversed(st.session_state.history):
         meta_bits.append(f"temp={config['temperature']:.2f}")
     if "max_tokens" in config:
         meta_bits.append(f"max_tokens={int(config['max_tokens'])}")
+    if config.get("packing"):
+        meta_bits.append(
+            f"context {config['packing']['context_tokens']} tokens "
+            f"({config['packing']['tokens_saved']} saved)"
+        )
     if llm_info:
         meta_bits.append(f"llm={llm_info.get('mode', '?')} ({llm_info.get('model', '?')})")
+    rerank_info = item.get("rerank")
+    if rerank_info:
+        meta_bits.append(
+            f"reranked {rerank_info['candidates']} in {rerank_info['ms']:.0f} ms"
+            if not rerank_info["fallback"]
+            else f"rerank skipped ({rerank_info['fallback']})"
+        )
+    if (item.get("cache") or {}).get("answer") == "hit":
+        meta_bits.append(f"cached answer (similarity {item['cache']['similarity']:.2f})")
+    timings = item.get("timings")
+    if timings:
+        meta_bits.append(f"{timings['total_ms']:.0f} ms")
     if meta_bits:
         st.caption(" • ".join(meta_bits))
     sources = item.get("sources") or []
@@ -0,0 +1,519 @@
+from __future__ import annotations
+
+import json
+import mmap
+import sqlite3
+import threading
+from pathlib import Path
+from typing import Any, Dict, Iterable, List, Optional, Protocol, Tuple
+
+import numpy as np
+
+from app.ann_index import IVFIndex
+from app.config import Settings, get_settings
+
+COLLECTION_NAME = "josef_knowledge"
+NUMPY_STORE_DIRNAME = "numpy_store"
+VECTOR_DTYPES = {"float32": np.float32, "float16": np.float16, "int8": np.int8}
+INT8_SCALE = 127.0
+SCAN_BLOCK_ROWS = 1 << 16
+
+
+class VectorStore(Protocol):
+    """The subset of Chroma's collection API used by ingest and retrieval."""
+
+    def upsert(self, ids, embeddings, documents=None, metadatas=None) -> None: ...
+
+    def delete(self, ids=None, where=None) -> None: ...
+
+    def get(self, ids=None, where=None, include=None) -> Dict[str, Any]: ...
+
+    def query(self, query_embeddings, n_results, include=None) -> Dict[str, Any]: ...
+
+    def count(self) -> int: ...
+
+
+def store_path(settings: Optional[Settings] = None) -> Path:
+    """Directory owned by the configured backend (Chroma keeps the embeddings root)."""
+    settings = settings or get_settings()
+    if settings.vector_store.strip().lower() == "numpy":
+        return settings.embeddings_path / NUMPY_STORE_DIRNAME
+    return settings.embeddings_path
+
+
+def open_collection(settings: Optional[Settings] = None) -> VectorStore:
+    settings = settings or get_settings()
+    backend = settings.vector_store.strip().lower()
+    if backend == "numpy":
+        return NumpyStore(
+            store_path(settings),
+            dtype=settings.vector_dtype,
+            dims=settings.vector_dims,
+            rescore=settings.vector_rescore,
+            ann_index=settings.ann_index,
+            nlist=settings.ivf_nlist,
+            nprobe=settings.ivf_nprobe,
+        )
+    if backend != "chroma":
+        raise ValueError(f"Unknown VECTOR_STORE {settings.vector_store!r} (use chroma or numpy).")
+    import chromadb
+
+    client = chromadb.PersistentClient(path=settings.embeddings_path.as_posix())
+    return client.get_or_create_collection(COLLECTION_NAME)
+
+
+def _id_batches(ids: Optional[Iterable[str]], size: int = 500) -> List[Optional[List[str]]]:
+    """Split ``ids`` into SQLite-sized IN lists; ``None`` means no id filter."""
+    if ids is None:
+        return [None]
+    ids = list(ids)
+    return [ids[start : start + size] for start in range(0, len(ids), size)]
+
+
+def _ranked(rows: np.ndarray, scores: np.ndarray) -> Tuple[np.ndarray, np.ndarray]:
+    order = np.argsort(-scores, axis=1, kind="stable")
+    rows = np.take_along_axis(rows, order, axis=1)
+    scores = np.take_along_axis(scores, order, axis=1)
+    rows[~np.isfinite(scores)] = -1
+    return rows, scores
+
+
+def _unit_rows(embeddings: Any) -> np.ndarray:
+    matrix = np.atleast_2d(np.asarray(embeddings, dtype=np.float32))
+    norms = np.linalg.norm(matrix, axis=1, keepdims=True)
+    norms[norms == 0] = 1.0
+    return matrix / norms
+
+
+def _map_random(path: Path, dtype: np.dtype, shape: Tuple[int, int]) -> np.ndarray:
+    """Read-only mapping for scattered row reads; readahead would page in the neighbours too."""
+    with open(path, "rb") as handle:
+        mapped = mmap.mmap(handle.fileno(), 0, access=mmap.ACCESS_READ)
+    if hasattr(mmap, "MADV_RANDOM"):
+        mapped.madvise(mmap.MADV_RANDOM)
+    return np.frombuffer(mapped, dtype=dtype, count=shape[0] * shape[1]).reshape(shape)
+
+
+def _write_rows(path: Path, dtype: np.dtype, dim: int, total: int, rows, values) -> None:
+    """Write ``values`` at ``rows`` of a ``(total, dim)`` row file, growing it as needed."""
+    with open(path, "ab") as handle:
+        handle.truncate(max(handle.tell(), total * dim * dtype.itemsize))
+    writable = np.memmap(path, dtype=dtype, mode="r+", shape=(total, dim))
+    writable[rows] = values
+    writable.flush()
+    del writable
+
+
+class NumpyStore:
+    """Exact cosine search over unit vectors in a memory-mapped file.
+
+    ``vectors.bin`` holds one fixed-width row per chunk (float32, float16 or
+    int8 scaled by 127); ``meta.sqlite3`` maps rows to ids, documents and
+    metadata. Readers map the file read-only, so processes on the same host
+    share its pages. Deleted rows go to a free list and are reused.
+
+    ``dims`` keeps only the leading components of each vector (Matryoshka
+    truncation, renormalised), so scans read less. With ``rescore > 0`` the
+    store also writes the full-precision vectors to ``full.bin`` and re-ranks
+    the best ``max(rescore, n_results)`` compact candidates against them;
+    only those rows of the mapped file are read. The dtype, dims and the full
+    copy are fixed when the store is created.
+
+    With ``ann_index="ivf"`` queries only scan the ``nprobe`` inverted lists
+    closest to the query (see ``app.ann_index``) once ``build_index`` has run.
+    """
+
+    def __init__(
+        self,
+        path: Path,
+        dtype: str = "float32",
+        *,
+        ann_index: str = "none",
+        nlist: int = 0,
+        nprobe: int = 8,
+        dims: int = 0,
+        rescore: int = 0,
+    ):
+        self.path = path
+        ann_index = (ann_index or "none").strip().lower()
+        if ann_index not in {"none", "ivf"}:
+            raise ValueError(f"Unknown ANN_INDEX {ann_index!r} (use none or ivf).")
+        self.index = IVFIndex(path) if ann_index == "ivf" else None
+        self.nlist = nlist
+        self.nprobe = nprobe
+        path.mkdir(parents=True, exist_ok=True)
+        self._vectors_path = path / "vectors.bin"
+        self._full_path = path / "full.bin"
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(
+            (path / "meta.sqlite3").as_posix(), timeout=30, check_same_thread=False
+        )
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute("PRAGMA synchronous=NORMAL")
+        self._conn.execute(
+            "CREATE TABLE IF NOT EXISTS items ("
+            " row INTEGER PRIMARY KEY, id TEXT NOT NULL UNIQUE, source TEXT,"
+            " document TEXT NOT NULL, metadata TEXT NOT NULL)"
+        )
+        self._conn.execute("CREATE INDEX IF NOT EXISTS items_source ON items(source)")
+        self._conn.execute("CREATE TABLE IF NOT EXISTS free (row INTEGER PRIMARY KEY)")
+        self._conn.execute("CREATE TABLE IF NOT EXISTS info (key TEXT PRIMARY KEY, value TEXT)")
+        self._conn.commit()
+        if self._info("dtype") is None and dtype not in VECTOR_DTYPES:
+            raise ValueError(f"Unknown VECTOR_DTYPE {dtype!r} (use {', '.join(VECTOR_DTYPES)}).")
+        self.dtype = self._pinned("dtype", dtype, "VECTOR_DTYPE", default="float32")
+        self._np_dtype = np.dtype(VECTOR_DTYPES[self.dtype])
+        self.dims = int(self._pinned("truncate", max(0, dims), "VECTOR_DIMS", default="0"))
+        self.full = self._pinned("full", int(rescore > 0), None, default="0") == "1"
+        if rescore > 0 and not self.full:
+            print(f"⚠️ {path}: existing store has no full-precision copy; ignoring VECTOR_RESCORE.")
+        self.rescore = max(0, rescore) if self.full else 0
+        self._conn.commit()
+        self._snapshot: Optional[Tuple[int, np.ndarray, np.ndarray, Any, Any]] = None
+
+    def _pinned(self, key: str, requested: Any, setting: Optional[str], default: str) -> str:
+        """A creation-time option: stored once, later settings only warn.
+
+        Stores that already hold rows without the key predate it and get ``default``.
+        """
+        stored = self._info(key)
+        if stored is None:
+            stored = str(requested) if not int(self._info("rows") or 0) else default
+            self._set_info(key, stored)
+        elif setting and stored != str(requested):
+            print(f"⚠️ {self.path}: existing store uses {stored}; ignoring {setting}={requested}.")
+        return stored
+
+    def _info(self, key: str) -> Optional[str]:
+        row = self._conn.execute("SELECT value FROM info WHERE key = ?", (key,)).fetchone()
+        return row[0] if row else None
+
+    def _set_info(self, key: str, value: Any) -> None:
+        self._conn.execute(
+            "INSERT OR REPLACE INTO info (key, value) VALUES (?, ?)", (key, str(value))
+        )
+
+    @property
+    def dim(self) -> Optional[int]:
+        value = self._info("dim")
+        return int(value) if value is not None else None
+
+    @property
+    def full_dim(self) -> Optional[int]:
+        value = self._info("full_dim") or self._info("dim")
+        return int(value) if value is not None else None
+
+    @property
+    def exact_embeddings(self) -> bool:
+        """Whether ``get`` returns the vectors as written: a full copy or untruncated float32.
+
+        Compact rows are lossy; re-upserting them next to fresh vectors would mix
+        widths (truncated) or quantise twice (float16/int8).
+        """
+        return self.full or (self.dtype == "float32" and self.dim == self.full_dim)
+
+    def _compact(self, unit: np.ndarray) -> np.ndarray:
+        dim = self.dim or self.dims
+        if dim and unit.shape[1] > dim:
+            return _unit_rows(unit[:, :dim])
+        return unit
+
+    def _where_sql(self, ids=None, where=None) -> Tuple[str, List[Any]]:
+        clauses: List[str] = []
+        params: List[Any] = []
+        if ids is not None:
+            clauses.append(f"id IN ({','.join('?' * len(ids))})")
+            params.extend(ids)
+        for key, value in (where or {}).items():
+            if key == "source":
+                clauses.append("source = ?")
+            else:
+                clauses.append(f"json_extract(metadata, '$.{key}') = ?")
+            params.append(value)
+        return (" WHERE " + " AND ".join(clauses)) if clauses else "", params
+
+    def _quantize(self, unit: np.ndarray) -> np.ndarray:
+        if self.dtype == "int8":
+            return np.clip(np.rint(unit * INT8_SCALE), -127, 127).astype(np.int8)
+        return unit.astype(self._np_dtype)
+
+    def _dequantize(self, rows: np.ndarray) -> np.ndarray:
+        matrix = rows.astype(np.float32)
+        return matrix / INT8_SCALE if self.dtype == "int8" else matrix
+
+    def _refresh(self) -> Tuple[int, np.ndarray, np.ndarray, Any, Any]:
+        """Return ``(version, matrix, live_mask, ivf_lists, full)``, reloading only after a write.
+
+        ``full`` is the mapped full-precision copy, or None without one.
+        """
+        with self._lock:
+            version = int(self._info("version") or 0)
+            if self._snapshot is not None and self._snapshot[0] == version:
+                return self._snapshot
+            dim = self.dim or 0
+            total = int(self._info("rows") or 0)
+            if total and dim:
+                matrix = np.memmap(
+                    self._vectors_path, dtype=self._np_dtype, mode="r", shape=(total, dim)
+                )
+            else:
+                matrix = np.zeros((0, dim), dtype=self._np_dtype)
+            full = None
+            if self.full and total and self.full_dim:
+                full = _map_random(self._full_path, np.dtype(np.float32), (total, self.full_dim))
+            live = np.zeros(total, dtype=bool)
+            rows = np.fromiter(
+                (row for (row,) in self._conn.execute("SELECT row FROM items")), dtype=np.int64
+            )
+            live[rows[rows < total]] = True
+            lists = self.index.lists(live) if self.index is not None else None
+            self._snapshot = (version, matrix, live, lists, full)
+            return self._snapshot
+
+    def _bump(self) -> None:
+        self._set_info("version", int(self._info("version") or 0) + 1)
+
+    def add(self, ids, embeddings, documents=None, metadatas=None) -> None:
+        self.upsert(ids=ids, embeddings=embeddings, documents=documents, metadatas=metadatas)
+
+    def upsert(self, ids, embeddings, documents=None, metadatas=None) -> None:
+        ids = list(ids)
+        if not ids:
+            return
+        unit = _unit_rows(embeddings)
+        compact = self._compact(unit)
+        vectors = self._quantize(compact)
+        documents = list(documents) if documents is not None else [""] * len(ids)
+        metadatas = list(metadatas) if metadatas is not None else [{}] * len(ids)
+        with self._lock:
+            dim, full_dim = self.dim, self.full_dim
+            if dim is None:
+                dim, full_dim = vectors.shape[1], unit.shape[1]
+                self._set_info("dim", dim)
+                self._set_info("full_dim", full_dim)
+            elif unit.shape[1] != full_dim:
+                raise ValueError(
+                    f"Embedding dimension {unit.shape[1]} != store dimension {full_dim}."
+                )
+            existing: Dict[str, int] = {}
+            for part in _id_batches(ids):
+                sql, params = self._where_sql(ids=part)
+                existing.update(self._conn.execute(f"SELECT id, row FROM items{sql}", params))
+            fresh = [item_id for item_id in ids if item_id not in existing]
+            free = [
+                row
+                for (row,) in self._conn.execute(
+                    "SELECT row FROM free ORDER BY row LIMIT ?", (len(fresh),)
+                )
+            ]
+            total = int(self._info("rows") or 0)
+            appended = list(range(total, total + len(fresh) - len(free)))
+            assigned = dict(zip(fresh, free + appended))
+            rows = np.array(
+                [existing.get(item_id, assigned.get(item_id)) for item_id in ids], dtype=np.int64
+            )
+            total += len(appended)
+
+            # Vectors land on disk before the metadata that points at them is committed.
+            _write_rows(self._vectors_path, self._np_dtype, dim, total, rows, vectors)
+            if self.full:
+                _write_rows(self._full_path, np.dtype(np.float32), full_dim, total, rows, unit)
+            if self.index is not None:
+                self.index.assign(rows, compact, total)
+
+            self._conn.executemany(
+                "INSERT OR REPLACE INTO items (row, id, source, document, metadata)"
+                " VALUES (?, ?, ?, ?, ?)",
+                [
+                    (
+                        int(row),
+                        item_id,
+                        (meta or {}).get("source"),
+                        doc or "",
+                        json.dumps(meta or {}),
+                    )
+                    for row, item_id, doc, meta in zip(rows, ids, documents, metadatas)
+                ],
+            )
+            if free:
+                self._conn.executemany(
+                    "DELETE FROM free WHERE row = ?", [(row,) for row in free]
+                )
+            self._set_info("rows", total)
+            self._bump()
+            self._conn.commit()
+
+    def delete(self, ids=None, where=None) -> None:
+        with self._lock:
+            removed: List[int] = []
+            for part in _id_batches(ids):
+                sql, params = self._where_sql(ids=part, where=where)
+                removed.extend(
+                    row for (row,) in self._conn.execute(f"SELECT row FROM items{sql}", params)
+                )
+                self._conn.execute(f"DELETE FROM items{sql}", params)
+            if removed:
+                self._conn.executemany(
+                    "INSERT OR IGNORE INTO free (row) VALUES (?)", [(row,) for row in removed]
+                )
+                self._bump()
+            self._conn.commit()
+
+    def _fetch(self, rows: Iterable[int]) -> Dict[int, Tuple[str, str, Dict[str, Any]]]:
+        rows = [int(row) for row in rows]
+        found: Dict[int, Tuple[str, str, Dict[str, Any]]] = {}
+        with self._lock:
+            for start in range(0, len(rows), 500):
+                part = rows[start : start + 500]
+                marks = ",".join("?" * len(part))
+                cursor = self._conn.execute(
+                    f"SELECT row, id, document, metadata FROM items WHERE row IN ({marks})", part
+                )
+                for row, item_id, document, metadata in cursor:
+                    found[row] = (item_id, document, json.loads(metadata))
+        return found
+
+    def get(self, ids=None, where=None, include=None) -> Dict[str, Any]:
+        include = include or ["documents", "metadatas"]
+        selected: List[Tuple[int, str, str, str]] = []
+        with self._lock:
+            for part in _id_batches(ids):
+                sql, params = self._where_sql(ids=part, where=where)
+                selected.extend(
+                    self._conn.execute(
+                        f"SELECT row, id, document, metadata FROM items{sql} ORDER BY row", params
+                    )
+                )
+        result: Dict[str, Any] = {"ids": [item_id for _, item_id, _, _ in selected]}
+        if "documents" in include:
+            result["documents"] = [document for _, _, document, _ in selected]
+        if "metadatas" in include:
+            result["metadatas"] = [json.loads(metadata) for _, _, _, metadata in selected]
+        if "embeddings" in include:
+            rows = [row for row, _, _, _ in selected]
+            result["embeddings"] = self._stored(self._refresh(), rows)
+        return result
+
+    def _stored(self, snapshot, rows: List[int]) -> List[List[float]]:
+        """Vectors of ``rows``: the full-precision copy if kept, else the compact rows."""
+        if not rows:
+            return []
+        full = snapshot[4]
+        if full is not None:
+            return np.asarray(full[rows]).tolist()
+        return self._dequantize(snapshot[1][rows]).tolist()
+
+    def count(self) -> int:
+        with self._lock:
+            return self._conn.execute("SELECT COUNT(*) FROM items").fetchone()[0]
+
+    def build_index(self, force: bool = False) -> Optional[Dict[str, int]]:
+        """(Re)train the IVF lists when missing, stale or when the corpus doubled since training."""
+        if self.index is None:
+            return None
+        _, matrix, live, lists, _ = self._refresh()
+        rows = int(live.sum())
+        trained_rows = int(self._info("ivf_rows") or 0)
+        if not force and lists is not None and rows <= 2 * max(trained_rows, 1):
+            return {"nlist": len(self.index.centroids), "rows": rows, "trained": 0}
+        nlist = self.index.train(lambda index: self._dequantize(matrix[index]), live, self.nlist)
+        with self._lock:
+            self._set_info("ivf_rows", rows)
+            self._bump()
+            self._conn.commit()
+        return {"nlist": nlist, "rows": rows, "trained": 1}
+
+    def _score(self, matrix: np.ndarray, rows, queries: np.ndarray) -> np.ndarray:
+        block = matrix[rows]
+        scores = queries @ (block if block.dtype == np.float32 else block.astype(np.float32)).T
+        if self.dtype == "int8":
+            scores /= INT8_SCALE
+        return scores
+
+    def search(
+        self, query_embeddings, n_results: int, nprobe: Optional[int] = None
+    ) -> Tuple[np.ndarray, np.ndarray]:
+        """Top ``n_results`` rows and cosine similarities per query, best first (row -1 pads)."""
+        unit = _unit_rows(query_embeddings)
+        queries = self._compact(unit)
+        _, matrix, live, lists, full = self._refresh()
+        k = max(1, int(n_results))
+        rescore = full is not None and self.rescore > 0
+        depth = max(k, self.rescore) if rescore else k
+        nprobe = self.nprobe if nprobe is None else nprobe
+        if lists is not None and 0 < nprobe < len(lists[1]) - 1:
+            rows, scores = self._ivf_search(matrix, lists, queries, depth, nprobe)
+        else:
+            rows, scores = self._exact_search(matrix, live, queries, depth)
+        return self._rescore(full, rows, unit, k) if rescore else (rows, scores)
+
+    def _rescore(self, full, candidates, queries, k):
+        """Re-rank compact-search candidates by exact cosine with the full-precision rows."""
+        best_rows = np.full((len(queries), k), -1, dtype=np.int64)
+        best_scores = np.full((len(queries), k), -np.inf, dtype=np.float32)
+        for qi, rows in enumerate(candidates):
+            rows = np.sort(rows[rows >= 0])  # sequential reads from the mapped file
+            if not len(rows):
+                continue
+            scores = full[rows] @ queries[qi]
+            take = min(k, len(rows))
+            part = np.argpartition(-scores, take - 1)[:take]
+            best_rows[qi, :take] = rows[part]
+            best_scores[qi, :take] = scores[part]
+        return _ranked(best_rows, best_scores)
+
+    def _exact_search(self, matrix, live, queries, k):
+        total = matrix.shape[0]
+        best_rows = np.full((len(queries), 0), -1, dtype=np.int64)
+        best_scores = np.full((len(queries), 0), -np.inf, dtype=np.float32)
+        for start in range(0, total, SCAN_BLOCK_ROWS):
+            stop = min(total, start + SCAN_BLOCK_ROWS)
+            scores = self._score(matrix, slice(start, stop), queries)
+            scores[:, ~live[start:stop]] = -np.inf
+            take = min(k, stop - start)
+            part = np.argpartition(-scores, take - 1, axis=1)[:, :take]
+            best_rows = np.concatenate([best_rows, part + start], axis=1)
+            best_scores = np.concatenate(
+                [best_scores, np.take_along_axis(scores, part, axis=1)], axis=1
+            )
+            if best_rows.shape[1] > k:
+                keep = np.argpartition(-best_scores, k - 1, axis=1)[:, :k]
+                best_rows = np.take_along_axis(best_rows, keep, axis=1)
+                best_scores = np.take_along_axis(best_scores, keep, axis=1)
+        return _ranked(best_rows, best_scores)
+
+    def _ivf_search(self, matrix, lists, queries, k, nprobe):
+        best_rows = np.full((len(queries), k), -1, dtype=np.int64)
+        best_scores = np.full((len(queries), k), -np.inf, dtype=np.float32)
+        for qi, rows in enumerate(self.index.candidates(queries, lists, nprobe)):
+            if not len(rows):
+                continue
+            rows = np.sort(rows)  # sequential reads from the mapped file
+            scores = self._score(matrix, rows, queries[qi : qi + 1])[0]
+            take = min(k, len(rows))
+            part = np.argpartition(-scores, take - 1)[:take]
+            best_rows[qi, :take] = rows[part]
+            best_scores[qi, :take] = scores[part]
+        return _ranked(best_rows, best_scores)
+
+    def query(
+        self, query_embeddings, n_results, include=None, nprobe=None
+    ) -> Dict[str, Any]:
+        include = include or ["documents", "metadatas", "distances"]
+        rows, scores = self.search(query_embeddings, n_results, nprobe=nprobe)
+        meta = self._fetch(row for row in rows.ravel() if row >= 0)
+        result: Dict[str, Any] = {"ids": [], "documents": [], "metadatas": [], "distances": []}
+        if "embeddings" in include:
+            result["embeddings"] = []
+            snapshot = self._refresh()
+        for row_ids, row_scores in zip(rows, scores):
+            hits = [
+                (int(row), float(score)) for row, score in zip(row_ids, row_scores) if row in meta
+            ]
+            result["ids"].append([meta[row][0] for row, _ in hits])
+            result["documents"].append([meta[row][1] for row, _ in hits])
+            result["metadatas"].append([meta[row][2] for row, _ in hits])
+            result["distances"].append([1.0 - score for _, score in hits])
+            if "embeddings" in include:
+                result["embeddings"].append(self._stored(snapshot, [row for row, _ in hits]))
+        return result
@@ -0,0 +1,119 @@
+"""Recall@k and latency of the IVF index against exact NumPy search and Chroma.
+
+Builds a synthetic clustered corpus (MiniLM-sized by default) in a temporary
+directory, uses exact NumPy search as ground truth and prints JSON:
+
+    python benchmarks/ann_recall.py --rows 200000 --nprobe 4 8 16 32
+"""
+from __future__ import annotations
+
+import argparse
+import json
+import statistics
+import sys
+import tempfile
+import time
+from pathlib import Path
+
+import numpy as np
+
+PROJECT_ROOT = Path(__file__).resolve().parents[1]
+sys.path.insert(0, str(PROJECT_ROOT))
+
+from app.vector_store import NumpyStore  # noqa: E402
+
+
+def synthetic_corpus(rows: int, dim: int, clusters: int, spread: float, seed: int) -> np.ndarray:
+    rng = np.random.default_rng(seed)
+    centers = rng.normal(size=(clusters, dim)).astype(np.float32)
+    labels = rng.integers(0, clusters, size=rows)
+    noise = rng.normal(scale=spread, size=(rows, dim)).astype(np.float32)
+    return centers[labels] + noise
+
+
+def _timed(fn, queries):
+    results, latencies = [], []
+    for query in queries:
+        start = time.perf_counter()
+        results.append(fn(query))
+        latencies.append((time.perf_counter() - start) * 1000)
+    latencies.sort()
+    return results, {
+        "p50_ms": statistics.median(latencies),
+        "p99_ms": latencies[min(len(latencies) - 1, int(0.99 * len(latencies)))],
+    }
+
+
+def _recall(found, truth, k):
+    return float(np.mean([len(set(f[:k]) & set(t[:k])) / k for f, t in zip(found, truth)]))
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--rows", type=int, default=50_000)
+    parser.add_argument("--dim", type=int, default=384)
+    parser.add_argument("--clusters", type=int, default=500)
+    parser.add_argument(
+        "--spread", type=float, default=1.5, help="Within-cluster noise; higher is harder."
+    )
+    parser.add_argument("--queries", type=int, default=200)
+    parser.add_argument("--top-k", type=int, default=6)
+    parser.add_argument("--nprobe", type=int, nargs="+", default=[4, 8, 16, 32])
+    parser.add_argument("--nlist", type=int, default=0, help="0 picks 4*sqrt(rows).")
+    parser.add_argument("--skip-chroma", action="store_true")
+    parser.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args()
+
+    vectors = synthetic_corpus(args.rows, args.dim, args.clusters, args.spread, args.seed)
+    rng = np.random.default_rng(args.seed + 1)
+    picks = rng.choice(args.rows, args.queries, replace=False)
+    noise = rng.normal(scale=0.5 * args.spread, size=(args.queries, args.dim))
+    queries = vectors[picks] + noise.astype(np.float32)
+    ids = [f"synthetic#{idx}" for idx in range(args.rows)]
+    k = args.top_k
+    report = {"rows": args.rows, "dim": args.dim, "top_k": k, "queries": args.queries}
+
+    with tempfile.TemporaryDirectory() as tmp:
+        store = NumpyStore(Path(tmp) / "numpy", ann_index="ivf", nlist=args.nlist)
+        for start in range(0, args.rows, 10_000):
+            stop = start + 10_000
+            store.upsert(ids=ids[start:stop], embeddings=vectors[start:stop])
+        started = time.perf_counter()
+        built = store.build_index()
+        report["ivf_build_s"] = time.perf_counter() - started
+        report["nlist"] = built["nlist"]
+
+        exact = lambda q: store.search([q], k, nprobe=0)[0][0].tolist()  # noqa: E731
+        truth, report["exact"] = _timed(exact, queries)
+        report["exact"]["recall"] = 1.0
+        for nprobe in args.nprobe:
+            found, timing = _timed(
+                lambda q: store.search([q], k, nprobe=nprobe)[0][0].tolist(), queries
+            )
+            report[f"ivf nprobe={nprobe}"] = {**timing, "recall": _recall(found, truth, k)}
+
+        if not args.skip_chroma:
+            import chromadb
+
+            client = chromadb.PersistentClient(path=str(Path(tmp) / "chroma"))
+            collection = client.get_or_create_collection(
+                "benchmark", metadata={"hnsw:space": "cosine"}, embedding_function=None
+            )
+            for start in range(0, args.rows, 5_000):
+                collection.add(
+                    ids=ids[start : start + 5_000],
+                    embeddings=vectors[start : start + 5_000].tolist(),
+                )
+
+            def chroma(q):
+                res = collection.query(query_embeddings=[q.tolist()], n_results=k, include=[])
+                return [int(item.split("#")[1]) for item in res["ids"][0]]
+
+            found, timing = _timed(chroma, queries)
+            report["chroma hnsw"] = {**timing, "recall": _recall(found, truth, k)}
+
+    print(json.dumps(report, indent=2))
+
+
+if __name__ == "__main__":
+    main()
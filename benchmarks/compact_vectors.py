@@ -0,0 +1,176 @@
+"""Disk, RAM and recall of compact vector stores against the uncompressed baseline.
+
+Builds a ``NumpyStore`` per configuration from the same vectors and compares
+its top-k with exact float32 search over the full vectors. The vectors come
+from a synthetic corpus whose variance decays across dimensions, as in
+Matryoshka-trained embeddings, or with ``--from-store`` from the configured
+store (``VECTOR_STORE``/``EMBEDDINGS_PATH``, Chroma included):
+
+    python benchmarks/compact_vectors.py --rows 20000 --dim 3072 \\
+        --configs float16 int8 int8@1024 int8@256 --rescore 0 50
+    python benchmarks/compact_vectors.py --from-store --configs int8@256 --rescore 0 50
+
+A config is ``dtype[@dims]`` and runs once per ``--rescore`` value.
+``ram_mb`` is the working set queries keep in the page cache: every query
+scans all of ``vectors.bin``, while re-scoring reads only the candidate rows
+of ``full.bin`` (``full_kb_per_query``; ``full_read_mb`` over all queries).
+"""
+from __future__ import annotations
+
+import argparse
+import json
+import statistics
+import sys
+import tempfile
+import time
+from pathlib import Path
+from typing import Any, Dict, List, Tuple
+
+import numpy as np
+
+PROJECT_ROOT = Path(__file__).resolve().parents[1]
+sys.path.insert(0, str(PROJECT_ROOT))
+
+from app.vector_store import NumpyStore  # noqa: E402
+
+MB = 1024 * 1024
+
+
+def synthetic_vectors(rows: int, dim: int, clusters: int, seed: int) -> np.ndarray:
+    """Clustered vectors whose per-dimension scale decays, so leading dims carry the most."""
+    rng = np.random.default_rng(seed)
+    decay = (1.0 / np.sqrt(1.0 + np.arange(dim) / 8)).astype(np.float32)
+    centers = rng.normal(size=(clusters, dim)).astype(np.float32)
+    noise = rng.normal(scale=0.8, size=(rows, dim)).astype(np.float32)
+    return (centers[rng.integers(0, clusters, size=rows)] + noise) * decay
+
+
+def stored_vectors() -> np.ndarray:
+    from app.config import get_settings
+    from app.vector_store import open_collection
+
+    embeddings = open_collection(get_settings()).get(include=["embeddings"]).get("embeddings")
+    if embeddings is None or not len(embeddings):
+        raise SystemExit("The configured store holds no embeddings; ingest first.")
+    return np.asarray(embeddings, dtype=np.float32)
+
+
+def _dir_mb(path: Path) -> float:
+    return sum(item.stat().st_size for item in path.rglob("*") if item.is_file()) / MB
+
+
+def _full_rows_read(store: NumpyStore, queries: np.ndarray, k: int) -> Tuple[int, int]:
+    """Candidate rows re-scoring reads from ``full.bin``: (total over queries, distinct)."""
+    if not store.rescore:
+        return 0, 0
+    rescore, store.rescore = store.rescore, 0
+    try:
+        rows, _ = store.search(queries, max(k, rescore))
+    finally:
+        store.rescore = rescore
+    rows = rows[rows >= 0]
+    return len(rows), len(np.unique(rows))
+
+
+def _parse(config: str) -> Tuple[str, int]:
+    dtype, _, dims = config.partition("@")
+    return dtype, int(dims or 0)
+
+
+def _search(store: NumpyStore, queries: np.ndarray, k: int) -> Tuple[List[set], List[float]]:
+    found, latencies = [], []
+    for query in queries:
+        start = time.perf_counter()
+        rows, _ = store.search([query], k)
+        latencies.append((time.perf_counter() - start) * 1000)
+        found.append(set(rows[0][rows[0] >= 0].tolist()))
+    return found, sorted(latencies)
+
+
+def _build(path: Path, vectors: np.ndarray, **options: Any) -> Tuple[NumpyStore, float]:
+    store = NumpyStore(path, **options)
+    ids = [f"v#{idx}" for idx in range(len(vectors))]
+    started = time.perf_counter()
+    for start in range(0, len(vectors), 5_000):
+        store.upsert(ids=ids[start : start + 5_000], embeddings=vectors[start : start + 5_000])
+    return store, time.perf_counter() - started
+
+
+def run(args: argparse.Namespace) -> Dict[str, Any]:
+    if args.from_store:
+        vectors = stored_vectors()
+    else:
+        vectors = synthetic_vectors(args.rows, args.dim, args.clusters, args.seed)
+    rng = np.random.default_rng(args.seed + 1)
+    picks = rng.choice(len(vectors), min(args.queries, len(vectors)), replace=False)
+    scale = vectors.std(axis=0, keepdims=True)
+    queries = vectors[picks] + args.noise * scale * rng.normal(size=(len(picks), vectors.shape[1]))
+    k = args.top_k
+    report: Dict[str, Any] = {"rows": len(vectors), "dim": vectors.shape[1], "top_k": k}
+
+    with tempfile.TemporaryDirectory() as tmp:
+        root = Path(tmp)
+        baseline, _ = _build(root / "baseline", vectors)
+        truth, _ = _search(baseline, queries, k)
+        baseline_mb = _dir_mb(root / "baseline")
+        for config in args.configs:
+            dtype, dims = _parse(config)
+            for rescore in args.rescore:
+                name = f"{config} rescore={rescore}" if rescore else config
+                path = root / name.replace(" ", "_").replace("@", "_")
+                store, build_s = _build(path, vectors, dtype=dtype, dims=dims, rescore=rescore)
+                found, latencies = _search(store, queries, k)
+                vectors_mb = (path / "vectors.bin").stat().st_size / MB
+                full_mb = (path / "full.bin").stat().st_size / MB if store.full else 0.0
+                read, distinct = _full_rows_read(store, queries, k)
+                full_row_mb = vectors.shape[1] * 4 / MB
+                report[name] = {
+                    "vectors_mb": vectors_mb,
+                    "full_mb": full_mb,
+                    "disk_mb": _dir_mb(path),
+                    "disk_vs_baseline": _dir_mb(path) / baseline_mb,
+                    "ram_mb": vectors_mb + distinct * full_row_mb,
+                    "full_kb_per_query": read * full_row_mb * 1024 / len(queries),
+                    "full_read_mb": distinct * full_row_mb,
+                    "recall": float(np.mean([len(f & t) / k for f, t in zip(found, truth)])),
+                    "p50_ms": statistics.median(latencies),
+                    "p99_ms": latencies[min(len(latencies) - 1, int(0.99 * len(latencies)))],
+                    "build_s": build_s,
+                }
+                print(
+                    f"{name}: {report[name]['disk_mb']:.1f} MB on disk, "
+                    f"recall@{k} {report[name]['recall']:.3f}",
+                    file=sys.stderr,
+                )
+                del store
+        _, latencies = _search(baseline, queries, k)
+        report["float32 baseline"] = {
+            "vectors_mb": (root / "baseline" / "vectors.bin").stat().st_size / MB,
+            "disk_mb": baseline_mb,
+            "ram_mb": (root / "baseline" / "vectors.bin").stat().st_size / MB,
+            "recall": 1.0,
+            "p50_ms": statistics.median(latencies),
+            "p99_ms": latencies[min(len(latencies) - 1, int(0.99 * len(latencies)))],
+        }
+    return report
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--from-store", action="store_true", help="Use the configured store.")
+    parser.add_argument("--rows", type=int, default=20_000)
+    parser.add_argument("--dim", type=int, default=3072)
+    parser.add_argument("--clusters", type=int, default=200)
+    parser.add_argument(
+        "--configs", nargs="+", default=["float16", "int8", "int8@1024", "int8@256"]
+    )
+    parser.add_argument("--rescore", type=int, nargs="+", default=[0, 50])
+    parser.add_argument("--queries", type=int, default=200)
+    parser.add_argument("--noise", type=float, default=0.3, help="Query noise per dimension std.")
+    parser.add_argument("--top-k", type=int, default=6)
+    parser.add_argument("--seed", type=int, default=0)
+    print(json.dumps(run(parser.parse_args()), indent=2))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,167 @@
+"""Synthetic book corpora for the benchmark suite.
+
+Files are generated deterministically from a seed, so two runs of the suite
+ingest byte-identical corpora. Each file is about one business topic with
+filler prose around topic keywords, which gives both dense and BM25
+retrieval something to find:
+
+    python benchmarks/corpus.py out/ --files 40 --file-kb 128 --formats txt pdf
+"""
+from __future__ import annotations
+
+import argparse
+import json
+import random
+from pathlib import Path
+from typing import Dict, List, Sequence
+
+import fitz
+from ebooklib import epub
+
+FORMATS = ("txt", "md", "pdf", "epub")
+PDF_PAGE_CHARS = 3000
+EPUB_CHAPTER_CHARS = 8000
+
+TOPICS: Dict[str, List[str]] = {
+    "pricing": ["price", "retainer", "margin", "value", "anchor", "discount", "invoice"],
+    "sales": ["pipeline", "prospect", "discovery", "objection", "closing", "quota", "demo"],
+    "brand": ["audience", "positioning", "story", "content", "reputation", "voice", "niche"],
+    "negotiation": ["leverage", "concession", "deadline", "batna", "counteroffer", "terms"],
+    "automation": ["workflow", "script", "integration", "trigger", "pipeline", "template"],
+    "hiring": ["candidate", "interview", "onboarding", "culture", "retention", "role"],
+    "scaling": ["systems", "delegation", "capacity", "operations", "growth", "processes"],
+    "psychology": ["habit", "motivation", "bias", "trust", "persuasion", "emotion"],
+    "finance": ["cashflow", "forecast", "runway", "profit", "budget", "accounts"],
+    "leadership": ["vision", "feedback", "accountability", "meeting", "team", "coaching"],
+}
+FILLER = (
+    "the a of to and in for with on that this is it as be by your you client business "
+    "should can will more most when how what why every first best small large each new "
+    "work time plan result week month simple clear strong better customer market offer"
+).split()
+
+
+def _sentence(rng: random.Random, keywords: Sequence[str]) -> str:
+    words = [
+        rng.choice(keywords) if rng.random() < 0.25 else rng.choice(FILLER)
+        for _ in range(rng.randint(8, 18))
+    ]
+    return " ".join(words).capitalize() + "."
+
+
+def _prose(rng: random.Random, keywords: Sequence[str], chars: int) -> List[str]:
+    """Paragraphs totalling about ``chars`` characters."""
+    paragraphs: List[str] = []
+    size = 0
+    while size < chars:
+        paragraph = " ".join(_sentence(rng, keywords) for _ in range(rng.randint(3, 7)))
+        paragraphs.append(paragraph)
+        size += len(paragraph) + 2
+    return paragraphs
+
+
+def _write_pdf(path: Path, title: str, paragraphs: List[str]) -> None:
+    doc = fitz.open()
+    page_text: List[str] = [title]
+    size = 0
+    for paragraph in paragraphs + [None]:
+        if paragraph is None or size + len(paragraph) > PDF_PAGE_CHARS:
+            page = doc.new_page()
+            page.insert_textbox(fitz.Rect(36, 36, 576, 756), "\n".join(page_text), fontsize=7)
+            page_text, size = [], 0
+            if paragraph is None:
+                break
+        page_text.append(paragraph)
+        size += len(paragraph)
+    doc.save(path)
+    doc.close()
+
+
+def _write_epub(path: Path, title: str, paragraphs: List[str]) -> None:
+    book = epub.EpubBook()
+    book.set_identifier(path.stem)
+    book.set_title(title)
+    book.set_language("en")
+    chapters = []
+    current: List[str] = []
+    size = 0
+    for paragraph in paragraphs + [None]:
+        if paragraph is None or size + len(paragraph) > EPUB_CHAPTER_CHARS:
+            number = len(chapters) + 1
+            chapter = epub.EpubHtml(
+                title=f"Chapter {number}", file_name=f"ch{number}.xhtml", lang="en"
+            )
+            body = "".join(f"<p>{text}</p>" for text in current)
+            chapter.content = f"<h1>Chapter {number}</h1>{body}"
+            book.add_item(chapter)
+            chapters.append(chapter)
+            current, size = [], 0
+            if paragraph is None:
+                break
+        current.append(paragraph)
+        size += len(paragraph)
+    book.toc = chapters
+    book.spine = ["nav", *chapters]
+    book.add_item(epub.EpubNcx())
+    book.add_item(epub.EpubNav())
+    epub.write_epub(str(path), book)
+
+
+def write_corpus(
+    directory: Path,
+    files: int,
+    file_kb: int,
+    formats: Sequence[str] = FORMATS,
+    seed: int = 0,
+) -> Dict[str, object]:
+    """Write ``files`` books of about ``file_kb`` KB of text each, cycling through ``formats``."""
+    directory.mkdir(parents=True, exist_ok=True)
+    topics = sorted(TOPICS)
+    by_format: Dict[str, int] = {}
+    text_bytes = 0
+    for idx in range(files):
+        rng = random.Random(f"{seed}:{idx}")
+        topic = topics[idx % len(topics)]
+        fmt = formats[idx % len(formats)]
+        title = f"{topic.title()} Playbook {idx}"
+        paragraphs = _prose(rng, TOPICS[topic], file_kb * 1024)
+        text_bytes += sum(len(paragraph) + 2 for paragraph in paragraphs)
+        path = directory / f"{topic}_{idx:05d}.{fmt}"
+        if fmt == "pdf":
+            _write_pdf(path, title, paragraphs)
+        elif fmt == "epub":
+            _write_epub(path, title, paragraphs)
+        elif fmt == "md":
+            path.write_text(f"# {title}\n\n" + "\n\n".join(paragraphs), encoding="utf-8")
+        else:
+            path.write_text(f"{title}\n\n" + "\n\n".join(paragraphs), encoding="utf-8")
+        by_format[fmt] = by_format.get(fmt, 0) + 1
+    return {"files": files, "text_bytes": text_bytes, "formats": by_format}
+
+
+def make_questions(count: int, seed: int = 0) -> List[str]:
+    """Distinct questions spread over the corpus topics."""
+    rng = random.Random(f"questions:{seed}")
+    topics = sorted(TOPICS)
+    questions = []
+    for idx in range(count):
+        keywords = TOPICS[topics[idx % len(topics)]]
+        picked = " and ".join(rng.sample(keywords, 2))
+        questions.append(f"How should a small business handle {picked}? (q{idx})")
+    return questions
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("directory", type=Path)
+    parser.add_argument("--files", type=int, default=40)
+    parser.add_argument("--file-kb", type=int, default=64)
+    parser.add_argument("--formats", nargs="+", choices=FORMATS, default=list(FORMATS))
+    parser.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args()
+    report = write_corpus(args.directory, args.files, args.file_kb, args.formats, args.seed)
+    print(json.dumps(report, indent=2))
+
+
+if __name__ == "__main__":
+    main()
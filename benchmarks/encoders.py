@@ -0,0 +1,145 @@
+"""Compare local encoder backends: import and load time, throughput, memory and agreement.
+
+Every backend runs in a fresh interpreter, after an untimed run that exports
+(and quantises) the ONNX model if it is not cached yet, so import and load
+times are cold-start numbers:
+
+    python benchmarks/encoders.py --backends torch onnx onnx-int8 --texts 512 --batch-size 32
+
+``agreement`` is the cosine similarity of each backend's vectors with the
+PyTorch vectors of the same texts (mean and min over texts).
+"""
+from __future__ import annotations
+
+import argparse
+import json
+import os
+import resource
+import subprocess
+import sys
+import tempfile
+import time
+from pathlib import Path
+from typing import Any, Dict
+
+import numpy as np
+
+PROJECT_ROOT = Path(__file__).resolve().parents[1]
+sys.path.insert(0, str(PROJECT_ROOT))
+
+BACKEND_IMPORTS = {
+    "torch": "sentence_transformers",
+    "onnx": "onnxruntime, tokenizers",
+    "onnx-int8": "onnxruntime, tokenizers",
+}
+
+
+def run_case(args: argparse.Namespace) -> Dict[str, Any]:
+    """One backend in this interpreter; vectors are saved for the agreement check."""
+    started = time.perf_counter()
+    exec(f"import {BACKEND_IMPORTS[args.backend]}")
+    from app.config import get_settings
+    from app.encoders import load_encoder
+
+    imported = time.perf_counter()
+    encoder = load_encoder(get_settings())
+    loaded = time.perf_counter()
+    report: Dict[str, Any] = {
+        "import_s": imported - started,
+        "load_s": loaded - imported,
+    }
+    if args.prepare:
+        return report
+
+    from benchmarks.corpus import make_questions
+
+    questions = make_questions(args.texts, args.seed)
+    samples = {"query": questions, "chunk": [f"{question} " * 12 for question in questions]}
+    encoder.encode(questions[: args.batch_size], batch_size=args.batch_size)
+    for kind, texts in samples.items():
+        start = time.perf_counter()
+        vectors = encoder.encode(texts, batch_size=args.batch_size, show_progress_bar=False)
+        seconds = time.perf_counter() - start
+        report[kind] = {"texts": len(texts), "texts_per_s": len(texts) / seconds}
+        np.save(Path(args.workdir) / f"{args.backend}-{kind}.npy", np.asarray(vectors))
+    report["max_rss_mb"] = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024
+    return report
+
+
+def _case(args: argparse.Namespace, backend: str, workdir: str, prepare: bool) -> Dict[str, Any]:
+    command = [
+        sys.executable,
+        str(Path(__file__).resolve()),
+        "--case",
+        backend,
+        "--workdir",
+        workdir,
+        "--texts",
+        str(args.texts),
+        "--batch-size",
+        str(args.batch_size),
+        "--seed",
+        str(args.seed),
+    ]
+    if prepare:
+        command.append("--prepare")
+    env = dict(os.environ, ENCODER_BACKEND=backend)
+    if args.model:
+        env["LOCAL_ENCODER_MODEL"] = args.model
+    proc = subprocess.run(command, cwd=PROJECT_ROOT, env=env, capture_output=True, text=True)
+    if proc.returncode:
+        sys.stderr.write(proc.stdout[-4000:] + proc.stderr[-4000:])
+        raise SystemExit(f"Benchmark case {backend} failed.")
+    return json.loads(proc.stdout.strip().splitlines()[-1])
+
+
+def run(args: argparse.Namespace) -> Dict[str, Any]:
+    from app.encoders import cosine_agreement
+
+    report: Dict[str, Any] = {}
+    with tempfile.TemporaryDirectory() as workdir:
+        for backend in args.backends:
+            if backend != "torch":
+                _case(args, backend, workdir, prepare=True)
+            report[backend] = _case(args, backend, workdir, prepare=False)
+            print(
+                f"{backend}: import {report[backend]['import_s']:.2f}s, "
+                f"load {report[backend]['load_s']:.2f}s, "
+                f"{report[backend]['chunk']['texts_per_s']:.0f} chunks/s",
+                file=sys.stderr,
+            )
+        if "torch" in args.backends:
+            for backend in args.backends:
+                report[backend]["agreement"] = {
+                    kind: cosine_agreement(
+                        np.load(Path(workdir) / f"torch-{kind}.npy"),
+                        np.load(Path(workdir) / f"{backend}-{kind}.npy"),
+                    )
+                    for kind in ("query", "chunk")
+                }
+    return report
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument(
+        "--backends", nargs="+", choices=BACKEND_IMPORTS, default=list(BACKEND_IMPORTS)
+    )
+    parser.add_argument("--model", help="Model to load (default: LOCAL_ENCODER_MODEL).")
+    parser.add_argument("--texts", type=int, default=512)
+    parser.add_argument("--batch-size", type=int, default=32)
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--case", choices=BACKEND_IMPORTS, help=argparse.SUPPRESS)
+    parser.add_argument("--workdir", help=argparse.SUPPRESS)
+    parser.add_argument("--prepare", action="store_true", help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.case:
+        args.backend = args.case
+        print(json.dumps(run_case(args)))
+    else:
+        print(json.dumps(run(args), indent=2))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,137 @@
+"""Fire concurrent /ask requests at the FastAPI service and report RPS and latency.
+
+Without ``--url`` the app in ``main.py`` is started in-process with uvicorn on a
+free port (set ``LLM_MODE=offline`` to measure the service without OpenAI):
+
+    LLM_MODE=offline python benchmarks/load_test.py --requests 500 --concurrency 50
+    python benchmarks/load_test.py --url http://localhost:8000 --repeat 0.8
+"""
+from __future__ import annotations
+
+import argparse
+import asyncio
+import json
+import random
+import socket
+import sys
+import threading
+import time
+from collections import Counter
+from pathlib import Path
+from typing import List
+
+import httpx
+
+PROJECT_ROOT = Path(__file__).resolve().parents[1]
+
+QUESTIONS = [
+    "How do I price a retainer?",
+    "What makes a sales call convert?",
+    "How should I build a personal brand?",
+    "Which tasks should I automate first?",
+    "How do I negotiate with a larger client?",
+    "What is the best way to scale a small agency?",
+]
+
+
+def _percentile(values: List[float], pct: float) -> float:
+    if not values:
+        return 0.0
+    ordered = sorted(values)
+    index = min(len(ordered) - 1, max(0, round(pct / 100 * (len(ordered) - 1))))
+    return ordered[index]
+
+
+def _serve_in_process() -> str:
+    import uvicorn
+
+    sys.path.insert(0, str(PROJECT_ROOT))
+    with socket.socket() as sock:
+        sock.bind(("127.0.0.1", 0))
+        port = sock.getsockname()[1]
+    config = uvicorn.Config("main:app", host="127.0.0.1", port=port, log_level="warning")
+    server = uvicorn.Server(config)
+    thread = threading.Thread(target=server.run, daemon=True)
+    thread.start()
+    while not server.started:
+        if not thread.is_alive():
+            raise SystemExit("In-process server failed to start (see the log above).")
+        time.sleep(0.05)
+    return f"http://127.0.0.1:{port}"
+
+
+def _question(idx: int, repeat: float, rng: random.Random) -> str:
+    # ``repeat`` is the share of requests drawn from the small hot set; the rest are unique.
+    if rng.random() < repeat:
+        return rng.choice(QUESTIONS)
+    return f"{rng.choice(QUESTIONS)} (variant {idx})"
+
+
+async def _run(url: str, total: int, concurrency: int, repeat: float, seed: int) -> dict:
+    rng = random.Random(seed)
+    questions = [_question(idx, repeat, rng) for idx in range(total)]
+    latencies: List[float] = []
+    statuses: Counter = Counter()
+    queue: asyncio.Queue = asyncio.Queue()
+    for question in questions:
+        queue.put_nowait(question)
+
+    limits = httpx.Limits(max_connections=concurrency, max_keepalive_connections=concurrency)
+    async with httpx.AsyncClient(base_url=url, timeout=120.0, limits=limits) as client:
+
+        async def worker() -> None:
+            while True:
+                try:
+                    question = queue.get_nowait()
+                except asyncio.QueueEmpty:
+                    return
+                start = time.perf_counter()
+                try:
+                    resp = await client.get("/ask", params={"q": question})
+                    body = resp.json() if resp.status_code == 200 else {}
+                    statuses["error" if "error" in body else resp.status_code] += 1
+                except httpx.HTTPError as exc:
+                    statuses[type(exc).__name__] += 1
+                latencies.append(time.perf_counter() - start)
+
+        started = time.perf_counter()
+        await asyncio.gather(*(worker() for _ in range(concurrency)))
+        elapsed = time.perf_counter() - started
+        health = (await client.get("/health")).json()
+
+    return {
+        "url": url,
+        "requests": total,
+        "concurrency": concurrency,
+        "repeat": repeat,
+        "elapsed_s": elapsed,
+        "rps": total / elapsed if elapsed else 0.0,
+        "p50_ms": _percentile(latencies, 50) * 1000,
+        "p90_ms": _percentile(latencies, 90) * 1000,
+        "p99_ms": _percentile(latencies, 99) * 1000,
+        "statuses": {str(key): value for key, value in statuses.items()},
+        "gate": health.get("gate"),
+    }
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--url", help="Target service; defaults to an in-process uvicorn server.")
+    parser.add_argument("--requests", type=int, default=200)
+    parser.add_argument("--concurrency", type=int, default=20)
+    parser.add_argument(
+        "--repeat",
+        type=float,
+        default=0.5,
+        help="Fraction of requests drawn from a small set of hot questions (0-1).",
+    )
+    parser.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args()
+
+    url = args.url or _serve_in_process()
+    report = asyncio.run(_run(url, args.requests, max(1, args.concurrency), args.repeat, args.seed))
+    print(json.dumps(report, indent=2))
+
+
+if __name__ == "__main__":
+    main()
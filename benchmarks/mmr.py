@@ -0,0 +1,126 @@
+"""Diversity and latency of MMR retrieval against plain dense top-k.
+
+Builds a synthetic library in a temporary NumPy store where each topic is
+covered by a few books and one book dominates it, then compares dense top-k
+with MMR (over-fetch with embeddings + ``mmr_select``) and prints JSON:
+
+    python benchmarks/mmr.py --rows 50000 --k 4 6 8 12
+"""
+from __future__ import annotations
+
+import argparse
+import json
+import statistics
+import sys
+import tempfile
+import time
+from pathlib import Path
+
+import numpy as np
+
+PROJECT_ROOT = Path(__file__).resolve().parents[1]
+sys.path.insert(0, str(PROJECT_ROOT))
+
+from app.mmr import mmr_select  # noqa: E402
+from app.vector_store import NumpyStore  # noqa: E402
+
+
+def synthetic_library(rows: int, dim: int, topics: int, books_per_topic: int, seed: int):
+    rng = np.random.default_rng(seed)
+    topic_centers = rng.normal(size=(topics, dim)).astype(np.float32)
+    book_centers = np.repeat(topic_centers, books_per_topic, axis=0) + rng.normal(
+        scale=0.6, size=(topics * books_per_topic, dim)
+    ).astype(np.float32)
+    # The first book of every topic holds most of its chunks.
+    weights = np.tile([4.0] + [1.0] * (books_per_topic - 1), topics)
+    books = rng.choice(len(book_centers), size=rows, p=weights / weights.sum())
+    vectors = book_centers[books] + rng.normal(scale=0.8, size=(rows, dim)).astype(np.float32)
+    queries = topic_centers + rng.normal(scale=0.3, size=topic_centers.shape).astype(np.float32)
+    return vectors, books, queries
+
+
+def _p50_p99(latencies):
+    latencies = sorted(latencies)
+    return {
+        "p50_ms": statistics.median(latencies),
+        "p99_ms": latencies[min(len(latencies) - 1, int(0.99 * len(latencies)))],
+    }
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--rows", type=int, default=50_000)
+    parser.add_argument("--dim", type=int, default=384)
+    parser.add_argument("--topics", type=int, default=200)
+    parser.add_argument("--books-per-topic", type=int, default=5)
+    parser.add_argument("--candidates", type=int, default=40)
+    parser.add_argument("--lambda", dest="lambda_", type=float, default=0.5)
+    parser.add_argument("--per-source", type=int, default=2)
+    parser.add_argument("--k", type=int, nargs="+", default=[4, 6, 8, 12])
+    parser.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args()
+
+    vectors, books, queries = synthetic_library(
+        args.rows, args.dim, args.topics, args.books_per_topic, args.seed
+    )
+    report = {"rows": args.rows, "dim": args.dim, "queries": len(queries), "results": {}}
+    with tempfile.TemporaryDirectory() as tmp:
+        store = NumpyStore(Path(tmp) / "store")
+        for start in range(0, args.rows, 10_000):
+            stop = start + 10_000
+            store.upsert(
+                ids=[f"book{book}#{idx}" for idx, book in enumerate(books[start:stop], start)],
+                embeddings=vectors[start:stop],
+                metadatas=[{"source": f"book{book}"} for book in books[start:stop]],
+            )
+        for k in args.k:
+            dense_ms, mmr_ms, select_ms = [], [], []
+            dense_sources, mmr_sources, dense_rel, mmr_rel = [], [], [], []
+            for query in queries:
+                unit = query / np.linalg.norm(query)
+                start = time.perf_counter()
+                res = store.query([query], k, include=["metadatas", "distances"])
+                dense_ms.append((time.perf_counter() - start) * 1000)
+                dense_sources.append(len({meta["source"] for meta in res["metadatas"][0]}))
+                dense_rel.append(1.0 - float(np.mean(res["distances"][0])))
+
+                start = time.perf_counter()
+                res = store.query(
+                    [query],
+                    max(k, args.candidates),
+                    include=["metadatas", "distances", "embeddings"],
+                )
+                picked_at = time.perf_counter()
+                sources = [meta["source"] for meta in res["metadatas"][0]]
+                picked = mmr_select(
+                    query,
+                    res["embeddings"][0],
+                    k,
+                    lambda_=args.lambda_,
+                    sources=sources,
+                    per_source=args.per_source,
+                )
+                done = time.perf_counter()
+                mmr_ms.append((done - start) * 1000)
+                select_ms.append((done - picked_at) * 1000)
+                mmr_sources.append(len({sources[idx] for idx in picked}))
+                chosen = np.asarray(res["embeddings"][0], dtype=np.float32)[picked]
+                mmr_rel.append(float(np.mean(chosen @ unit)))
+            report["results"][f"k={k}"] = {
+                "dense": {
+                    **_p50_p99(dense_ms),
+                    "distinct_sources": statistics.mean(dense_sources),
+                    "mean_relevance": statistics.mean(dense_rel),
+                },
+                "mmr": {
+                    **_p50_p99(mmr_ms),
+                    "select_p50_ms": statistics.median(select_ms),
+                    "distinct_sources": statistics.mean(mmr_sources),
+                    "mean_relevance": statistics.mean(mmr_rel),
+                },
+            }
+    print(json.dumps(report, indent=2))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,80 @@
+"""Measure cold-import and first-query latency of the query engine.
+
+Each measurement runs in a fresh interpreter so module caches do not leak
+between runs:
+
+    python benchmarks/startup.py --runs 3 --question "How do I price a retainer?"
+"""
+from __future__ import annotations
+
+import argparse
+import json
+import statistics
+import subprocess
+import sys
+from pathlib import Path
+
+PROJECT_ROOT = Path(__file__).resolve().parents[1]
+
+IMPORT_SNIPPET = """
+import time
+start = time.perf_counter()
+import {module}
+print(time.perf_counter() - start)
+"""
+
+QUERY_SNIPPET = """
+import json, time
+start = time.perf_counter()
+from app import query_engine
+imported = time.perf_counter()
+query_engine.warmup()
+warmed = time.perf_counter()
+query_engine.answer_with_context({question!r})
+first = time.perf_counter()
+query_engine.answer_with_context({question!r})
+second = time.perf_counter()
+print(json.dumps({{
+    "import_s": imported - start,
+    "warmup_s": warmed - imported,
+    "first_query_s": first - warmed,
+    "second_query_s": second - first,
+}}))
+"""
+
+
+def _run(snippet: str) -> str:
+    proc = subprocess.run(
+        [sys.executable, "-c", snippet],
+        cwd=PROJECT_ROOT,
+        capture_output=True,
+        text=True,
+        check=True,
+    )
+    return proc.stdout.strip().splitlines()[-1]
+
+
+def _summary(values):
+    return {"min": min(values), "median": statistics.median(values), "max": max(values)}
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--runs", type=int, default=3)
+    parser.add_argument("--question", default="How do I price a retainer?")
+    parser.add_argument("--skip-query", action="store_true", help="Only time imports.")
+    args = parser.parse_args()
+
+    report = {}
+    for module in ("app.query_engine", "app.cli", "ingest_books"):
+        timings = [float(_run(IMPORT_SNIPPET.format(module=module))) for _ in range(args.runs)]
+        report[f"import {module}"] = _summary(timings)
+    if not args.skip_query:
+        runs = [json.loads(_run(QUERY_SNIPPET.format(question=args.question))) for _ in range(args.runs)]
+        for key in runs[0]:
+            report[key] = _summary([run[key] for run in runs])
+    print(json.dumps(report, indent=2))
+
+
+if __name__ == "__main__":
+    main()
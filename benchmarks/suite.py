@@ -0,0 +1,298 @@
+"""End-to-end ingestion and query benchmarks with a baseline compare mode.
+
+``run`` generates a synthetic corpus per size (see ``benchmarks/corpus.py``),
+and in a fresh interpreter per size measures ``embed_chunks`` throughput,
+``ingest_all`` files/s and chunks/s, ``retrieve_context`` p50/p99 per top_k
+and ``answer_with_context`` with the offline LLM. Caches are disabled so
+every query does the full work. ``--encoder hash`` swaps the sentence
+transformer for a deterministic hashing encoder to time the pipeline
+without the model:
+
+    python benchmarks/suite.py run --sizes 20 100 --top-k 4 8 --out bench.json
+    python benchmarks/suite.py compare bench.json baseline.json --tolerance 0.15
+
+``compare`` exits with status 1 when a latency grew or a throughput dropped
+by more than the tolerance.
+"""
+from __future__ import annotations
+
+import argparse
+import json
+import os
+import platform
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+import zlib
+from pathlib import Path
+from typing import Any, Dict, List, Tuple
+
+import numpy as np
+
+PROJECT_ROOT = Path(__file__).resolve().parents[1]
+sys.path.insert(0, str(PROJECT_ROOT))
+
+# Keys ending in these are compared; anything else (counts, sizes) is informational.
+LOWER_IS_BETTER = ("_ms", "_s")
+HIGHER_IS_BETTER = ("_per_s",)
+
+
+class HashEncoder:
+    """Deterministic bag-of-words hashing encoder with the SentenceTransformer ``encode`` API."""
+
+    def __init__(self, dim: int = 384):
+        self.dim = dim
+
+    def encode(self, texts, **_: Any) -> np.ndarray:
+        out = np.zeros((len(texts), self.dim), dtype=np.float32)
+        for row, text in enumerate(texts):
+            for word in text.lower().split():
+                code = zlib.crc32(word.encode("utf-8"))
+                out[row, code % self.dim] += 1.0 if code & 1 << 31 else -1.0
+        norms = np.linalg.norm(out, axis=1, keepdims=True)
+        norms[norms == 0] = 1.0
+        return out / norms
+
+
+def _latency(samples: List[float]) -> Dict[str, float]:
+    ordered = sorted(samples)
+    return {
+        "p50_ms": statistics.median(ordered),
+        "p99_ms": ordered[min(len(ordered) - 1, int(0.99 * len(ordered)))],
+        "mean_ms": statistics.fmean(ordered),
+    }
+
+
+def _timed(fn, *args, **kwargs) -> Tuple[Any, float]:
+    started = time.perf_counter()
+    result = fn(*args, **kwargs)
+    return result, (time.perf_counter() - started) * 1000
+
+
+def run_case(args: argparse.Namespace) -> Dict[str, Any]:
+    """One corpus size; runs in its own interpreter because settings are read at import."""
+    from benchmarks.corpus import make_questions, write_corpus
+
+    workdir = Path(args.workdir)
+    corpus = write_corpus(workdir / "sources", args.files, args.file_kb, args.formats, args.seed)
+    os.environ.update(
+        {
+            "EMBEDDINGS_PATH": str(workdir / "embeddings"),
+            "VECTOR_STORE": args.store,
+            "LLM_MODE": "offline",
+            "EMBEDDING_CACHE": "false",
+            "QUERY_CACHE": "false",
+            "ANSWER_CACHE": "false",
+            "RETRIEVAL_MODE": args.retrieval,
+        }
+    )
+    import ingest_books
+    from app import query_engine
+
+    if args.encoder == "hash":
+        ingest_books._local_encoder = HashEncoder()
+        query_engine.encoder = HashEncoder()
+
+    report: Dict[str, Any] = {"corpus": corpus}
+    sample = [f"{question} " * 12 for question in make_questions(args.embed_chunks, args.seed)]
+    ingest_books.embed_chunks(sample[:8])  # load the model outside the measurement
+    _, ms = _timed(ingest_books.embed_chunks, sample)
+    report["embed"] = {"chunks": len(sample), "chunks_per_s": len(sample) / (ms / 1000)}
+
+    result, ms = _timed(
+        ingest_books.ingest_all, [workdir / "sources"], force=True, workers=args.workers
+    )
+    seconds = ms / 1000
+    report["ingest"] = {
+        "files": result["files"],
+        "chunks": result["chunks"],
+        "wall_s": seconds,
+        "files_per_s": result["files"] / seconds,
+        "chunks_per_s": result["chunks"] / seconds,
+        "stage_s": {stage: ms / 1000 for stage, ms in result["timings"]["files"].items()},
+    }
+
+    questions = make_questions(args.queries, args.seed + 1)
+    query_engine.warmup()
+    report["retrieve"] = {}
+    for top_k in args.top_k:
+        query_engine.retrieve_context(questions[0], top_k)
+        samples = [_timed(query_engine.retrieve_context, q, top_k)[1] for q in questions]
+        report["retrieve"][f"k={top_k}"] = _latency(samples)
+
+    samples = [_timed(query_engine.answer_with_context, q)[1] for q in questions]
+    report["answer"] = _latency(samples)
+    return report
+
+
+def _git_revision() -> str:
+    try:
+        proc = subprocess.run(
+            ["git", "rev-parse", "--short", "HEAD"],
+            cwd=PROJECT_ROOT,
+            capture_output=True,
+            text=True,
+            check=True,
+        )
+    except (OSError, subprocess.CalledProcessError):
+        return "unknown"
+    return proc.stdout.strip()
+
+
+def run(args: argparse.Namespace) -> Dict[str, Any]:
+    report: Dict[str, Any] = {
+        "meta": {
+            "revision": _git_revision(),
+            "python": platform.python_version(),
+            "machine": platform.machine(),
+            "cpus": os.cpu_count(),
+            "args": {
+                key: str(value) if isinstance(value, Path) else value
+                for key, value in vars(args).items()
+            },
+        },
+        "cases": {},
+    }
+    for files in args.sizes:
+        with tempfile.TemporaryDirectory() as workdir:
+            command = [
+                sys.executable,
+                str(Path(__file__).resolve()),
+                "case",
+                "--files",
+                str(files),
+                "--workdir",
+                workdir,
+                "--file-kb",
+                str(args.file_kb),
+                "--formats",
+                *args.formats,
+                "--top-k",
+                *map(str, args.top_k),
+                "--queries",
+                str(args.queries),
+                "--embed-chunks",
+                str(args.embed_chunks),
+                "--workers",
+                str(args.workers),
+                "--encoder",
+                args.encoder,
+                "--store",
+                args.store,
+                "--retrieval",
+                args.retrieval,
+                "--seed",
+                str(args.seed),
+            ]
+            proc = subprocess.run(command, cwd=PROJECT_ROOT, capture_output=True, text=True)
+            if proc.returncode:
+                sys.stderr.write(proc.stdout[-4000:] + proc.stderr[-4000:])
+                raise SystemExit(f"Benchmark case files={files} failed.")
+            case = json.loads(proc.stdout.strip().splitlines()[-1])
+        report["cases"][f"files={files}"] = case
+        print(
+            f"files={files}: ingest {case['ingest']['chunks_per_s']:.0f} chunks/s, "
+            f"answer p50 {case['answer']['p50_ms']:.1f} ms",
+            file=sys.stderr,
+        )
+    return report
+
+
+def flatten(tree: Dict[str, Any], prefix: str = "") -> Dict[str, float]:
+    flat: Dict[str, float] = {}
+    for key, value in tree.items():
+        name = f"{prefix}.{key}" if prefix else key
+        if isinstance(value, dict):
+            flat.update(flatten(value, name))
+        elif isinstance(value, (int, float)) and not isinstance(value, bool):
+            flat[name] = float(value)
+    return flat
+
+
+def compare(
+    current: Dict[str, Any], baseline: Dict[str, Any], tolerance: float, min_delta_ms: float
+) -> List[Dict[str, Any]]:
+    """Metrics present in both reports with their relative change and a regression flag."""
+    now, before = flatten(current["cases"]), flatten(baseline["cases"])
+    rows = []
+    for name in sorted(now.keys() & before.keys()):
+        old, new = before[name], now[name]
+        if name.endswith(HIGHER_IS_BETTER):
+            worse = new < old * (1 - tolerance)
+        elif name.endswith(LOWER_IS_BETTER):
+            delta_ms = (new - old) * (1000 if name.endswith("_s") else 1)
+            worse = new > old * (1 + tolerance) and delta_ms > min_delta_ms
+        else:
+            continue
+        change = (new - old) / old if old else 0.0
+        rows.append(
+            {"metric": name, "baseline": old, "current": new, "change": change, "regression": worse}
+        )
+    return rows
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    commands = parser.add_subparsers(dest="command", required=True)
+
+    def case_options(sub: argparse.ArgumentParser) -> None:
+        sub.add_argument("--file-kb", type=int, default=64)
+        sub.add_argument("--formats", nargs="+", default=["txt", "md", "pdf", "epub"])
+        sub.add_argument("--top-k", type=int, nargs="+", default=[4, 8])
+        sub.add_argument("--queries", type=int, default=200)
+        sub.add_argument("--embed-chunks", type=int, default=512)
+        sub.add_argument("--workers", type=int, default=1)
+        sub.add_argument("--encoder", choices=("model", "hash"), default="model")
+        sub.add_argument("--store", choices=("numpy", "chroma"), default="numpy")
+        sub.add_argument("--retrieval", default="dense")
+        sub.add_argument("--seed", type=int, default=0)
+
+    run_parser = commands.add_parser("run", help="Run the suite and write a JSON report.")
+    run_parser.add_argument("--sizes", type=int, nargs="+", default=[20, 100])
+    run_parser.add_argument("--out", type=Path, help="Write the report here (default: stdout).")
+    case_options(run_parser)
+
+    case_parser = commands.add_parser("case", help=argparse.SUPPRESS)
+    case_parser.add_argument("--files", type=int, required=True)
+    case_parser.add_argument("--workdir", required=True)
+    case_options(case_parser)
+
+    compare_parser = commands.add_parser("compare", help="Flag regressions against a baseline.")
+    compare_parser.add_argument("current", type=Path)
+    compare_parser.add_argument("baseline", type=Path)
+    compare_parser.add_argument("--tolerance", type=float, default=0.15)
+    compare_parser.add_argument(
+        "--min-delta-ms", type=float, default=0.1, help="Ignore latency changes below this."
+    )
+    args = parser.parse_args()
+
+    if args.command == "case":
+        print(json.dumps(run_case(args)))
+    elif args.command == "run":
+        report = json.dumps(run(args), indent=2)
+        if args.out:
+            args.out.write_text(report + "\n", encoding="utf-8")
+        else:
+            print(report)
+    else:
+        rows = compare(
+            json.loads(args.current.read_text(encoding="utf-8")),
+            json.loads(args.baseline.read_text(encoding="utf-8")),
+            args.tolerance,
+            args.min_delta_ms,
+        )
+        for row in rows:
+            flag = "REGRESSION" if row["regression"] else "ok"
+            print(
+                f"{flag:<10} {row['metric']:<48} {row['baseline']:>12.3f} -> "
+                f"{row['current']:>12.3f} ({row['change']:+.1%})"
+            )
+        regressions = sum(row["regression"] for row in rows)
+        print(f"{regressions} regression(s) in {len(rows)} compared metrics.")
+        raise SystemExit(1 if regressions else 0)
+
+
+if __name__ == "__main__":
+    main()
@@ -1,16 +1,38 @@
+import os
+import queue
+import threading
+import time
+from collections import deque
+from concurrent.futures import FIRST_COMPLETED, Future, ProcessPoolExecutor, wait
+from dataclasses import dataclass, replace
 from pathlib import Path
-from typing import Iterable, List, Optional, Tuple
+from typing import TYPE_CHECKING, Dict, Iterable, Iterator, List, Optional, Tuple
 
 import ebooklib
 import fitz
 from ebooklib import epub
-from langchain.text_splitter import RecursiveCharacterTextSplitter
-import chromadb
-from openai import OpenAI
-from sentence_transformers import SentenceTransformer
 from tqdm import tqdm
 
+from app import metrics
 from app.config import get_settings
+from app.embedding_cache import get_embedding_cache
+from app.embedding_server import connect as connect_embedding_server
+from app.encoders import encoder_name, load_encoder
+from app.lexical_index import LexicalIndex, get_lexical_index
+from app.manifest import (
+    IngestManifest,
+    ManifestEntry,
+    bump_generation,
+    chunk_hash,
+    hash_file,
+)
+from app.openai_embeddings import OpenAIEmbeddingBatcher
+from app.vector_store import open_collection, store_path
+
+if TYPE_CHECKING:  # torch/chromadb/openai/langchain imports are deferred until first use
+    from langchain.text_splitter import RecursiveCharacterTextSplitter
+    from openai import OpenAI
+    from sentence_transformers import SentenceTransformer
 
 settings = get_settings()
 USE_OPENAI_EMBEDDINGS = settings.use_openai_embeddings
@@ -19,8 +41,23 @@ SOURCE_DIRS = settings.source_dirs
 SUPPORTED_SUFFIXES = {suffix.lower() for suffix in settings.supported_suffixes}
 TEXT_SUFFIXES = {suffix.lower() for suffix in settings.text_suffixes}
 
-_local_encoder: Optional[SentenceTransformer] = None
-_openai_client: Optional[OpenAI] = None
+LOCAL_ENCODER_MODEL = encoder_name(settings)
+MANIFEST_FILENAME = "ingest_manifest.json"
+CHUNK_SIZE = 1000
+CHUNK_OVERLAP = 150
+WRITE_BATCH_SIZE = 2000
+STAGE_QUEUE_SIZE = 64
+STAGE_IDLE_FLUSH = 0.1
+SEGMENTS_PER_WINDOW = 64
+TEXT_WINDOW_BYTES = 4 << 20
+TEXT_SEGMENT_BYTES = 256 << 10
+
+_DONE = object()
+_worker_splitter: Optional["RecursiveCharacterTextSplitter"] = None
+
+_local_encoder: Optional["SentenceTransformer"] = None
+_openai_client: Optional["OpenAI"] = None
+_openai_batcher: Optional[OpenAIEmbeddingBatcher] = None
 
 
 def iter_source_files(directories: Iterable[Path]) -> Iterable[Tuple[Path, Path]]:
@@ -36,109 +73,845 @@ def iter_source_files(directories: Iterable[Path]) -> Iterable[Tuple[Path, Path]
                 yield path, base_dir
 
 
-def extract_text(path: Path) -> str:
+def _epub_documents(path: Path) -> list:
+    book = epub.read_epub(path)
+    return [item for item in book.get_items() if item.get_type() == ebooklib.ITEM_DOCUMENT]
+
+
+def _text_segments(path: Path, start: int, stop: Optional[int]) -> Iterator[Tuple[Optional[int], str]]:
+    # Byte windows start at the first line beginning at or after ``start``.
+    with path.open("rb") as handle:
+        if start:
+            handle.seek(start - 1)
+            handle.readline()
+        lines: List[bytes] = []
+        size = 0
+        while stop is None or handle.tell() < stop:
+            line = handle.readline()
+            if not line:
+                break
+            lines.append(line)
+            size += len(line)
+            if size >= TEXT_SEGMENT_BYTES:
+                yield None, b"".join(lines).decode("utf-8", errors="ignore")
+                lines, size = [], 0
+        if lines:
+            yield None, b"".join(lines).decode("utf-8", errors="ignore")
+
+
+def iter_text_segments(
+    path: Path, start: int = 0, stop: Optional[int] = None
+) -> Iterator[Tuple[Optional[int], str]]:
+    """Yield ``(location, text)`` per PDF page, EPUB section or block of text lines.
+
+    ``start``/``stop`` select pages, sections or byte offsets; locations are
+    1-based page/section numbers (``None`` for plain text).
+    """
     suffix = path.suffix.lower()
     if suffix == ".pdf":
         try:
             with fitz.open(path) as doc:
-                return "\n".join(page.get_text("text") for page in doc)
+                for number in range(start, min(doc.page_count, stop or doc.page_count)):
+                    yield number + 1, doc.load_page(number).get_text("text")
         except Exception as exc:  # pragma: no cover - defensive
             print(f"⚠️ {path.name}: PDF parsing failed ({exc}).")
-            return ""
+        return
     if suffix == ".epub":
         try:
-            book = epub.read_epub(path)
-            return "\n".join(
-                item.get_body_content().decode("utf-8", errors="ignore")
-                for item in book.get_items()
-                if item.get_type() == ebooklib.ITEM_DOCUMENT
-            )
+            documents = _epub_documents(path)
+            for number in range(start, min(len(documents), stop or len(documents))):
+                body = documents[number].get_body_content()
+                yield number + 1, body.decode("utf-8", errors="ignore")
         except Exception as exc:  # pragma: no cover - defensive
             print(f"⚠️ {path.name}: EPUB parsing failed ({exc}).")
-            return ""
+        return
     if suffix in TEXT_SUFFIXES:
-        try:
-            return path.read_text(encoding="utf-8")
-        except UnicodeDecodeError:
-            return path.read_text(encoding="utf-8", errors="ignore")
-    return ""
+        yield from _text_segments(path, start, stop)
+
+
+def extract_text(path: Path) -> str:
+    return "\n".join(text for _, text in iter_text_segments(path))
+
+
+def location_key(path: Path) -> Optional[str]:
+    suffix = path.suffix.lower()
+    if suffix == ".pdf":
+        return "page"
+    if suffix == ".epub":
+        return "section"
+    return None
+
+
+def plan_windows(path: Path) -> List[Tuple[int, int]]:
+    """Split a file into independently extractable page/section/byte ranges."""
+    suffix = path.suffix.lower()
+    if suffix == ".pdf":
+        with fitz.open(path) as doc:
+            total, step = doc.page_count, SEGMENTS_PER_WINDOW
+    elif suffix == ".epub":
+        total, step = len(_epub_documents(path)), SEGMENTS_PER_WINDOW
+    else:
+        total, step = path.stat().st_size, TEXT_WINDOW_BYTES
+    if total <= 0:
+        return [(0, 0)]
+    return [(start, min(start + step, total)) for start in range(0, total, step)]
+
+
+def iter_chunks(
+    segments: Iterable[Tuple[Optional[int], str]], splitter
+) -> Iterator[Tuple[str, Optional[int]]]:
+    """Split a stream of segments into chunks, carrying the unfinished tail forward.
 
+    Only the current segment plus one chunk of carry-over is held in memory.
+    Each chunk is tagged with the location of the segment it starts in.
+    """
+    carry, carry_location = "", None
+    for location, text in segments:
+        if not text.strip():
+            continue
+        buffer = f"{carry}\n{text}" if carry else text
+        boundary = len(carry) + 1 if carry else 0
+        chunks = splitter.split_text(buffer)
+        if not chunks:
+            continue
+        cursor = 0
+        located: List[Tuple[str, Optional[int]]] = []
+        for chunk in chunks:
+            position = buffer.find(chunk, cursor)
+            if position < 0:
+                position = cursor
+            located.append((chunk, carry_location if position < boundary else location))
+            cursor = position + 1
+        yield from located[:-1]
+        carry, carry_location = located[-1]
+    if carry:
+        yield carry, carry_location
 
-def get_local_encoder() -> SentenceTransformer:
+
+def get_local_encoder() -> "SentenceTransformer":
     global _local_encoder
+    if _local_encoder is None and settings.embedding_server_url:
+        _local_encoder = connect_embedding_server(
+            settings.embedding_server_url,
+            LOCAL_ENCODER_MODEL,
+            fallback=lambda: load_encoder(settings),
+        )
     if _local_encoder is None:
-        _local_encoder = SentenceTransformer("all-MiniLM-L6-v2")
+        _local_encoder = load_encoder(settings)
     return _local_encoder
 
 
-def get_openai_client() -> OpenAI:
+def get_openai_client() -> "OpenAI":
     global _openai_client
     if _openai_client is None:
+        from openai import OpenAI
+
         _openai_client = OpenAI()
     return _openai_client
 
 
+def get_openai_batcher() -> OpenAIEmbeddingBatcher:
+    global _openai_batcher
+    if _openai_batcher is None:
+        _openai_batcher = OpenAIEmbeddingBatcher(
+            get_openai_client(),
+            EMBEDDING_MODEL,
+            max_items=settings.openai_embed_max_items,
+            max_tokens=settings.openai_embed_max_tokens,
+            concurrency=settings.openai_embed_concurrency,
+        )
+    return _openai_batcher
+
+
+def _encode_uncached(chunks: List[str]) -> List[List[float]]:
+    if USE_OPENAI_EMBEDDINGS:
+        return get_openai_batcher().embed(chunks)
+    encoder = get_local_encoder()
+    return encoder.encode(chunks, show_progress_bar=False).tolist()
+
+
 def embed_chunks(chunks: List[str]) -> List[List[float]]:
     if not chunks:
         return []
+    cache = get_embedding_cache(settings)
+    if cache is None:
+        return _encode_uncached(chunks)
+    return cache.encode(embedding_model_id(), chunks, _encode_uncached)
+
+
+def embedding_model_id() -> str:
     if USE_OPENAI_EMBEDDINGS:
-        client = get_openai_client()
-        resp = client.embeddings.create(model=EMBEDDING_MODEL, input=chunks)
-        return [d.embedding for d in resp.data]
-    encoder = get_local_encoder()
-    return encoder.encode(chunks, show_progress_bar=False).tolist()
+        return f"openai:{EMBEDDING_MODEL}"
+    return f"local:{LOCAL_ENCODER_MODEL}"
+
+
+def manifest_path() -> Path:
+    return store_path(settings) / MANIFEST_FILENAME
 
 
 def source_key(path: Path, base_dir: Path) -> str:
     return f"{base_dir.name}/{path.relative_to(base_dir).as_posix()}"
 
 
-def ingest_file(path: Path, base_dir: Path, collection, splitter) -> int:
-    text = extract_text(path)
-    if not text.strip():
-        print(f"⚠️ {source_key(path, base_dir)}: no readable text (maybe scan/OCR needed).")
-        return 0
-    chunks = splitter.split_text(text)
-    if not chunks:
-        print(f"⚠️ {source_key(path, base_dir)}: splitter produced no chunks.")
-        return 0
-    embeddings = embed_chunks(chunks)
-    src = source_key(path, base_dir)
-    collection.delete(where={"source": src})
-    collection.add(
-        documents=chunks,
-        embeddings=embeddings,
-        metadatas=[{"source": src, "chunk": idx} for idx in range(len(chunks))],
-        ids=[f"{src}#{idx}" for idx in range(len(chunks))],
+def make_splitter() -> "RecursiveCharacterTextSplitter":
+    from langchain.text_splitter import RecursiveCharacterTextSplitter
+
+    return RecursiveCharacterTextSplitter(chunk_size=CHUNK_SIZE, chunk_overlap=CHUNK_OVERLAP)
+
+
+@dataclass
+class FilePlan:
+    path: Path
+    base_dir: Path
+    sha256: str
+    windows: List[Tuple[int, int]]
+    unchanged: bool = False
+    error: Optional[str] = None
+    # Taken before hashing, so the writer never has to stat a file that may be gone by then.
+    stat: Optional[os.stat_result] = None
+
+
+@dataclass
+class ExtractedWindow:
+    index: int
+    chunks: List[str]
+    locations: List[Optional[int]]
+    error: Optional[str] = None
+    extract_ms: float = 0.0
+    split_ms: float = 0.0
+
+
+def plan_file(path: Path, base_dir: Path, known_sha256: Optional[str] = None) -> FilePlan:
+    """Hash a file and split it into extraction windows. Runs inside ingest worker processes."""
+    try:
+        stat = path.stat()
+        digest = hash_file(path)
+        if known_sha256 is not None and digest == known_sha256:
+            return FilePlan(path, base_dir, digest, [], unchanged=True, stat=stat)
+        return FilePlan(path, base_dir, digest, plan_windows(path), stat=stat)
+    except Exception as exc:  # pragma: no cover - defensive
+        return FilePlan(path, base_dir, "", [], error=str(exc))
+
+
+def extract_window(path: Path, index: int, start: int, stop: int, splitter=None) -> ExtractedWindow:
+    """Extract and split one window of a file. Runs inside ingest worker processes."""
+    global _worker_splitter
+    if splitter is None:
+        if _worker_splitter is None:
+            _worker_splitter = make_splitter()
+        splitter = _worker_splitter
+    extract_seconds = 0.0
+
+    def timed_segments() -> Iterator[Tuple[Optional[int], str]]:
+        # Time spent reading pages/sections; the rest of the loop is splitting.
+        nonlocal extract_seconds
+        segments = iter_text_segments(path, start, stop)
+        while True:
+            started = time.perf_counter()
+            segment = next(segments, None)
+            extract_seconds += time.perf_counter() - started
+            if segment is None:
+                return
+            yield segment
+
+    try:
+        started = time.perf_counter()
+        chunks: List[str] = []
+        locations: List[Optional[int]] = []
+        for chunk, location in iter_chunks(timed_segments(), splitter):
+            chunks.append(chunk)
+            locations.append(location)
+        split_seconds = time.perf_counter() - started - extract_seconds
+        return ExtractedWindow(
+            index,
+            chunks,
+            locations,
+            extract_ms=extract_seconds * 1000,
+            split_ms=split_seconds * 1000,
+        )
+    except Exception as exc:  # pragma: no cover - defensive
+        return ExtractedWindow(index, [], [], error=str(exc))
+
+
+class _PendingFile:
+    """Per-file state shared by the extract, embed and write stages."""
+
+    def __init__(self, plan: FilePlan, previous: Optional[ManifestEntry]):
+        self.plan = plan
+        self.previous = previous
+        self.src = source_key(plan.path, plan.base_dir)
+        self.location_key = location_key(plan.path)
+        self.hashes: List[str] = []
+        self.next_offset = 0
+        self.failed = bool(plan.error)
+        self.reported = False
+        self.ready: Dict[int, ExtractedWindow] = {}
+        self.next_window = 0
+        self.trace = metrics.Trace("ingest_file")
+        self.timings: Optional[Dict[str, object]] = None
+        self.old_by_hash: Dict[str, List[int]] = {}
+        if previous is not None and previous.embedding_model == embedding_model_id():
+            for idx, digest in enumerate(previous.chunk_hashes):
+                self.old_by_hash.setdefault(digest, []).append(idx)
+
+    @property
+    def total_windows(self) -> int:
+        return len(self.plan.windows)
+
+    def manifest_entry(self) -> ManifestEntry:
+        stat = self.plan.stat
+        return ManifestEntry(
+            path=self.plan.path.as_posix(),
+            base=self.plan.base_dir.as_posix(),
+            size=stat.st_size,
+            mtime_ns=stat.st_mtime_ns,
+            sha256=self.plan.sha256,
+            chunks=len(self.hashes),
+            embedding_model=embedding_model_id(),
+            chunk_hashes=self.hashes,
+        )
+
+
+class _PendingWindow:
+    def __init__(self, file: _PendingFile, extracted: ExtractedWindow):
+        self.file = file
+        self.first = extracted.index == 0
+        self.last = extracted.index == file.total_windows - 1
+        self.offset = file.next_offset
+        self.chunks = extracted.chunks
+        self.locations = extracted.locations
+        self.hashes = [chunk_hash(chunk) for chunk in extracted.chunks]
+        self.embeddings: List[Optional[List[float]]] = [None] * len(extracted.chunks)
+        self.remaining = 0
+        file.next_offset += len(extracted.chunks)
+        file.hashes.extend(self.hashes)
+        file.trace.add("extract", extracted.extract_ms / 1000)
+        file.trace.add("split", extracted.split_ms / 1000)
+
+    def metadatas(self) -> List[Dict[str, object]]:
+        metadatas: List[Dict[str, object]] = []
+        for idx, location in enumerate(self.locations):
+            metadata: Dict[str, object] = {"source": self.file.src, "chunk": self.offset + idx}
+            if self.file.location_key and location is not None:
+                metadata[self.file.location_key] = location
+            metadatas.append(metadata)
+        return metadatas
+
+    def ids(self) -> List[str]:
+        return [f"{self.file.src}#{self.offset + idx}" for idx in range(len(self.chunks))]
+
+
+def _reusable_embeddings(collection, window: _PendingWindow) -> Dict[int, List[float]]:
+    """Fetch stored vectors for unchanged chunks that this run has not overwritten yet."""
+    file = window.file
+    if not file.old_by_hash or not getattr(collection, "exact_embeddings", True):
+        return {}
+    old_ids: Dict[str, List[int]] = {}
+    for idx, digest in enumerate(window.hashes):
+        old = next((j for j in file.old_by_hash.get(digest, ()) if j >= window.offset), None)
+        if old is not None:
+            old_ids.setdefault(f"{file.src}#{old}", []).append(idx)
+    if not old_ids:
+        return {}
+    try:
+        res = collection.get(ids=list(old_ids), include=["embeddings"])
+    except Exception:  # pragma: no cover - defensive
+        return {}
+    embeddings = res.get("embeddings")
+    if embeddings is None:
+        return {}
+    reused: Dict[int, List[float]] = {}
+    for item_id, embedding in zip(res.get("ids") or [], embeddings):
+        if embedding is None:
+            continue
+        for idx in old_ids.get(item_id, ()):
+            reused[idx] = list(embedding)
+    return reused
+
+
+def _share_time(stage: str, seconds: float, files: Iterable[_PendingFile]) -> None:
+    """Split the duration of a batch across its files by how many items each contributed."""
+    counts: Dict[_PendingFile, int] = {}
+    for file in files:
+        counts[file] = counts.get(file, 0) + 1
+    total = sum(counts.values())
+    for file, count in counts.items():
+        metrics.record(stage, seconds * count / total, file.trace)
+
+
+def _prepare_window(collection, file: _PendingFile, extracted: ExtractedWindow) -> Tuple[_PendingWindow, List[int]]:
+    window = _PendingWindow(file, extracted)
+    reused = _reusable_embeddings(collection, window)
+    missing: List[int] = []
+    for idx in range(len(window.chunks)):
+        if idx in reused:
+            window.embeddings[idx] = reused[idx]
+        else:
+            missing.append(idx)
+    window.remaining = len(missing)
+    return window, missing
+
+
+def _write_windows(
+    collection, manifest: Optional[IngestManifest], windows: List[_PendingWindow]
+) -> List[_PendingFile]:
+    """Write embedded windows in one batch and return the files they completed."""
+    started = time.perf_counter()
+    lexical = get_lexical_index(settings)
+    for window in windows:
+        if window.first and window.file.previous is None:
+            collection.delete(where={"source": window.file.src})
+            if lexical is not None:
+                lexical.delete(source=window.file.src)
+    documents: List[str] = []
+    embeddings: List[List[float]] = []
+    metadatas: List[Dict[str, object]] = []
+    ids: List[str] = []
+    for window in windows:
+        documents.extend(window.chunks)
+        embeddings.extend(window.embeddings)
+        metadatas.extend(window.metadatas())
+        ids.extend(window.ids())
+    for start in range(0, len(ids), WRITE_BATCH_SIZE):
+        stop = start + WRITE_BATCH_SIZE
+        collection.upsert(
+            documents=documents[start:stop],
+            embeddings=embeddings[start:stop],
+            metadatas=metadatas[start:stop],
+            ids=ids[start:stop],
+        )
+    if lexical is not None:
+        lexical.add(ids, documents, metadatas)
+    _share_time(
+        "write",
+        time.perf_counter() - started,
+        [window.file for window in windows for _ in window.chunks],
     )
-    return len(chunks)
+    finished: List[_PendingFile] = []
+    for window in windows:
+        if not window.last:
+            continue
+        file = window.file
+        if file.previous is not None and file.previous.chunks > len(file.hashes):
+            tail = [f"{file.src}#{idx}" for idx in range(len(file.hashes), file.previous.chunks)]
+            collection.delete(ids=tail)
+            if lexical is not None:
+                lexical.delete(ids=tail)
+        if manifest is not None:
+            manifest.record(file.src, file.manifest_entry())
+        file.timings = {
+            "source": file.src,
+            "chunks": len(file.hashes),
+            **metrics.finish(file.trace, source=file.src, chunks=len(file.hashes)),
+        }
+        finished.append(file)
+    return finished
 
 
-def ingest_all(source_dirs: Optional[Iterable[Path]] = None):
-    directories = list(source_dirs or SOURCE_DIRS)
-    splitter = RecursiveCharacterTextSplitter(chunk_size=1000, chunk_overlap=150)
-    client = chromadb.PersistentClient(path=settings.embeddings_path.as_posix())
-    collection = client.get_or_create_collection("josef_knowledge")
-    files = list(iter_source_files(directories))
-    if not files:
-        print("⚠️ No sources found. Add files into 'books/', 'texts/' or 'data/'.")
-        return {"files": 0, "chunks": 0, "scanned": 0}
+def ingest_file(
+    path: Path,
+    base_dir: Path,
+    collection,
+    splitter,
+    manifest: Optional[IngestManifest] = None,
+) -> int:
+    previous = manifest.get(source_key(path, base_dir)) if manifest is not None else None
+    plan = plan_file(path, base_dir)
+    if plan.error:
+        raise RuntimeError(plan.error)
+    file = _PendingFile(plan, previous)
+    for index, (start, stop) in enumerate(plan.windows):
+        extracted = extract_window(path, index, start, stop, splitter)
+        if extracted.error:
+            raise RuntimeError(extracted.error)
+        window, missing = _prepare_window(collection, file, extracted)
+        if missing:
+            with metrics.span("embed", file.trace):
+                vectors = embed_chunks([window.chunks[idx] for idx in missing])
+            for idx, vector in zip(missing, vectors):
+                window.embeddings[idx] = vector
+        _write_windows(collection, manifest, [window])
+    if not file.hashes:
+        print(f"⚠️ {file.src}: no readable text (maybe scan/OCR needed).")
+    return len(file.hashes)
+
+
+def _remove_stale_sources(collection, manifest: IngestManifest, directories, present) -> int:
+    removed = 0
+    lexical = get_lexical_index(settings)
+    for src in manifest.stale_sources(directories, present):
+        try:
+            collection.delete(where={"source": src})
+            if lexical is not None:
+                lexical.delete(source=src)
+        except Exception as exc:  # pragma: no cover - defensive
+            print(f"⚠️ {src}: removal failed ({exc}).")
+            continue
+        manifest.remove(src)
+        removed += 1
+        print(f"🗑️ {src}: removed from the knowledge base.")
+    return removed
+
+
+def _backfill_lexical(collection, manifest: IngestManifest, lexical: LexicalIndex) -> int:
+    """Index chunks stored before the BM25 index existed (its table is empty, the store is not)."""
+    if lexical.count() or not manifest.entries:
+        return 0
+    added = 0
+    for src in list(manifest.entries):
+        try:
+            res = collection.get(where={"source": src}, include=["documents", "metadatas"])
+        except Exception as exc:  # pragma: no cover - defensive
+            print(f"⚠️ {src}: BM25 backfill failed ({exc}).")
+            continue
+        ids = res.get("ids") or []
+        lexical.add(ids, res.get("documents") or [""] * len(ids), res.get("metadatas"))
+        added += len(ids)
+    return added
+
+
+def _extract_stage(
+    jobs, pool: Optional[ProcessPoolExecutor], outbox: queue.Queue, max_in_flight: int
+) -> None:
+    """Plan and extract files, emitting each file's windows in order."""
+    if pool is None:
+        splitter = make_splitter()
+        for path, base_dir, known_sha256, previous in jobs:
+            file = _PendingFile(plan_file(path, base_dir, known_sha256), previous)
+            if file.failed or file.plan.unchanged:
+                outbox.put((file, None))
+                continue
+            for index, (start, stop) in enumerate(file.plan.windows):
+                outbox.put((file, extract_window(path, index, start, stop, splitter)))
+        return
+
+    pending_jobs = iter(jobs)
+    window_tasks: deque = deque()
+    in_flight: Dict[Future, object] = {}
+
+    def submit_more() -> None:
+        while len(in_flight) < max_in_flight:
+            if window_tasks:
+                file, index, start, stop = window_tasks.popleft()
+                future = pool.submit(extract_window, file.plan.path, index, start, stop)
+                in_flight[future] = file
+                continue
+            job = next(pending_jobs, None)
+            if job is None:
+                return
+            path, base_dir, known_sha256, previous = job
+            in_flight[pool.submit(plan_file, path, base_dir, known_sha256)] = previous
+
+    submit_more()
+    while in_flight:
+        done, _ = wait(in_flight, return_when=FIRST_COMPLETED)
+        for future in done:
+            owner = in_flight.pop(future)
+            result = future.result()
+            if isinstance(result, FilePlan):
+                file = _PendingFile(result, owner)
+                if file.failed or result.unchanged:
+                    outbox.put((file, None))
+                    continue
+                window_tasks.extend(
+                    (file, index, start, stop) for index, (start, stop) in enumerate(result.windows)
+                )
+                continue
+            file = owner
+            file.ready[result.index] = result
+            while file.next_window in file.ready:
+                outbox.put((file, file.ready.pop(file.next_window)))
+                file.next_window += 1
+        submit_more()
+
 
-    total_files = 0
-    total_chunks = 0
-    for path, base_dir in tqdm(files, desc="Ingesting", unit="file"):
+def _embed_stage(collection, inbox: queue.Queue, outbox: queue.Queue, batch_size: int) -> None:
+    buffer: List[Tuple[_PendingWindow, int]] = []
+    # Windows leave in arrival order so a file's last window is never written first.
+    ordered: deque = deque()
+
+    def drain() -> None:
+        while ordered and (ordered[0].remaining == 0 or ordered[0].file.failed):
+            window = ordered.popleft()
+            if not window.file.failed:
+                outbox.put((window.file, window))
+
+    def fail(file: _PendingFile, reason) -> None:
+        file.failed = True
+        if not file.reported:
+            file.reported = True
+            print(f"⚠️ {file.src}: ingestion failed ({reason}).")
+            outbox.put((file, None))
+
+    def flush() -> None:
+        batch = [(window, idx) for window, idx in buffer[:batch_size] if not window.file.failed]
+        del buffer[:batch_size]
+        if not batch:
+            return
+        started = time.perf_counter()
+        try:
+            vectors = embed_chunks([window.chunks[idx] for window, idx in batch])
+        except Exception as exc:  # pragma: no cover - defensive
+            for window, _ in batch:
+                fail(window.file, f"embedding: {exc}")
+            return
+        _share_time("embed", time.perf_counter() - started, [window.file for window, _ in batch])
+        for (window, idx), vector in zip(batch, vectors):
+            window.embeddings[idx] = vector
+            window.remaining -= 1
+
+    while True:
+        try:
+            item = inbox.get(timeout=STAGE_IDLE_FLUSH if buffer else None)
+        except queue.Empty:
+            flush()
+            drain()
+            continue
+        if item is _DONE:
+            break
+        file, extracted = item
+        if extracted is None:
+            if file.plan.error:
+                fail(file, file.plan.error)
+            else:
+                outbox.put((file, None))
+            continue
+        if file.failed:
+            continue
         try:
-            count = ingest_file(path, base_dir, collection, splitter)
+            if extracted.error:
+                raise RuntimeError(extracted.error)
+            window, missing = _prepare_window(collection, file, extracted)
         except Exception as exc:  # pragma: no cover - defensive
-            print(f"⚠️ {source_key(path, base_dir)}: ingestion failed ({exc}).")
+            fail(file, exc)
             continue
+        ordered.append(window)
+        buffer.extend((window, idx) for idx in missing)
+        while len(buffer) >= batch_size:
+            flush()
+        drain()
+    while buffer:
+        flush()
+    drain()
+    outbox.put(_DONE)
+
+
+def _write_stage(
+    collection,
+    manifest: IngestManifest,
+    inbox: queue.Queue,
+    stats: Dict[str, int],
+    progress,
+    file_timings: List[Dict[str, object]],
+) -> None:
+    group: List[_PendingWindow] = []
+
+    def record(file: _PendingFile) -> None:
+        progress.update(1)
+        if file.timings is not None:
+            file_timings.append(file.timings)
+        count = len(file.hashes)
+        if file.previous is not None:
+            stats["updated"] += 1
         if count:
-            total_files += 1
-            total_chunks += count
-            print(f"✅ {source_key(path, base_dir)}: stored {count} chunks.")
+            stats["files"] += 1
+            stats["chunks"] += count
+            print(f"✅ {file.src}: stored {count} chunks.")
+        else:
+            print(f"⚠️ {file.src}: no readable text (maybe scan/OCR needed).")
+
+    def flush() -> None:
+        windows = [window for window in group if not window.file.failed]
+        group.clear()
+        if not windows:
+            return
+        try:
+            finished = _write_windows(collection, manifest, windows)
+        except Exception as exc:  # pragma: no cover - defensive
+            for window in windows:
+                if not window.file.failed:
+                    window.file.failed = True
+                    progress.update(1)
+                    print(f"⚠️ {window.file.src}: ingestion failed ({exc}).")
+            return
+        for file in finished:
+            record(file)
 
-    print(f"🏁 Done. {total_chunks} chunks saved from {total_files} files.")
-    return {"files": total_files, "chunks": total_chunks, "scanned": len(files)}
+    group_chunks = 0
+    while True:
+        try:
+            item = inbox.get(timeout=STAGE_IDLE_FLUSH if group else None)
+        except queue.Empty:
+            flush()
+            group_chunks = 0
+            continue
+        if item is _DONE:
+            break
+        file, window = item
+        if window is None:
+            if file.plan.unchanged:
+                manifest.touch(file.src, file.plan.stat)
+                stats["skipped"] += 1
+            progress.update(1)
+            continue
+        group.append(window)
+        group_chunks += len(window.chunks)
+        if group_chunks >= WRITE_BATCH_SIZE:
+            flush()
+            group_chunks = 0
+    flush()
+
+
+def _timing_report(
+    trace: metrics.Trace, file_timings: List[Dict[str, object]], **fields: object
+) -> Dict[str, object]:
+    """Run-level stages, per-file stages summed over files, and the slowest files."""
+    files: Dict[str, float] = {}
+    for timings in file_timings:
+        for stage, ms in timings["stages"].items():
+            files[stage] = files.get(stage, 0.0) + ms
+    slowest = sorted(file_timings, key=lambda timings: -timings["total_ms"])[:5]
+    return {
+        **metrics.finish(trace, **fields),
+        "files": {stage: round(ms, 3) for stage, ms in files.items()},
+        "slowest_files": slowest,
+    }
+
+
+def ingest_all(
+    source_dirs: Optional[Iterable[Path]] = None,
+    *,
+    force: bool = False,
+    workers: Optional[int] = None,
+    embed_batch_size: Optional[int] = None,
+):
+    directories = list(source_dirs or SOURCE_DIRS)
+    workers = max(1, int(workers or settings.ingest_workers))
+    batch_size = max(1, int(embed_batch_size or settings.embed_batch_size))
+    trace = metrics.Trace("ingest")
+    file_timings: List[Dict[str, object]] = []
+    collection = open_collection(settings)
+    manifest = IngestManifest.load(manifest_path())
+    model_id = embedding_model_id()
+    with metrics.span("scan", trace):
+        files = list(iter_source_files(directories))
+        removed = _remove_stale_sources(
+            collection, manifest, directories, (source_key(path, base) for path, base in files)
+        )
+    if not files:
+        manifest.save()
+        if removed:
+            bump_generation(settings.embeddings_path)
+        print("⚠️ No sources found. Add files into 'books/', 'texts/' or 'data/'.")
+        return {
+            "files": 0,
+            "chunks": 0,
+            "scanned": 0,
+            "skipped": 0,
+            "updated": 0,
+            "removed": removed,
+            "timings": _timing_report(trace, file_timings, files=0),
+        }
+
+    stats = {"files": 0, "chunks": 0, "skipped": 0, "updated": 0}
+    cache = get_embedding_cache(settings)
+    if cache is not None:
+        cache.reset_stats()
+    jobs = []
+    with metrics.span("scan", trace):
+        for path, base_dir in files:
+            previous = manifest.get(source_key(path, base_dir))
+            known_sha256 = None
+            if previous is not None and not force:
+                if previous.is_fresh(path.stat(), model_id):
+                    stats["skipped"] += 1
+                    continue
+                if previous.embedding_model == model_id:
+                    known_sha256 = previous.sha256
+            elif previous is not None:
+                # Forced: embed every chunk again, but still overwrite and trim the old rows.
+                previous = replace(previous, chunk_hashes=[])
+            jobs.append((path, base_dir, known_sha256, previous))
+
+    progress = tqdm(total=len(files), initial=stats["skipped"], desc="Ingesting", unit="file")
+    pipeline_started = time.perf_counter()
+    pool = ProcessPoolExecutor(max_workers=workers) if workers > 1 and len(jobs) > 1 else None
+    try:
+        if pool is not None:
+            # Start the worker processes before the stage threads exist.
+            pool.submit(os.getpid).result()
+        embed_inbox: queue.Queue = queue.Queue(maxsize=STAGE_QUEUE_SIZE)
+        write_inbox: queue.Queue = queue.Queue(maxsize=STAGE_QUEUE_SIZE)
+        embedder = threading.Thread(
+            target=_embed_stage,
+            args=(collection, embed_inbox, write_inbox, batch_size),
+            name="ingest-embed",
+            daemon=True,
+        )
+        writer = threading.Thread(
+            target=_write_stage,
+            args=(collection, manifest, write_inbox, stats, progress, file_timings),
+            name="ingest-write",
+            daemon=True,
+        )
+        embedder.start()
+        writer.start()
+        try:
+            _extract_stage(jobs, pool, embed_inbox, workers * 2)
+        finally:
+            embed_inbox.put(_DONE)
+            embedder.join()
+            writer.join()
+    finally:
+        if pool is not None:
+            pool.shutdown()
+        progress.close()
+    metrics.record("pipeline", time.perf_counter() - pipeline_started, trace)
+
+    manifest.save()
+    # New rows were already assigned to IVF lists; retrain once the corpus has outgrown them.
+    with metrics.span("ivf", trace):
+        index = collection.build_index() if hasattr(collection, "build_index") else None
+    if index and index["trained"]:
+        print(f"🧭 IVF index trained: {index['nlist']} lists over {index['rows']} chunks.")
+    lexical = get_lexical_index(settings)
+    bm25 = None
+    if lexical is not None:
+        with metrics.span("bm25", trace):
+            _backfill_lexical(collection, manifest, lexical)
+            bm25 = lexical.compile()
+        if bm25 is not None:
+            print(f"🔎 BM25 index: {bm25['terms']} terms over {bm25['documents']} chunks.")
+    if stats["files"] or stats["updated"] or removed or bm25 or (index and index["trained"]):
+        bump_generation(settings.embeddings_path)
+    print(
+        f"🏁 Done. {stats['chunks']} chunks saved from {stats['files']} files "
+        f"({stats['skipped']} unchanged, {stats['updated']} updated, {removed} removed)."
+    )
+    cache_stats = cache.stats() if cache is not None else None
+    if cache_stats is not None:
+        print(
+            f"🧊 Embedding cache: {cache_stats['hits']} hits, {cache_stats['misses']} misses "
+            f"({cache_stats['hit_rate']:.0%} hit rate), {cache_stats['entries']} entries, "
+            f"{cache_stats['bytes'] / 1024 / 1024:.1f} MB."
+        )
+    timings = _timing_report(trace, file_timings, files=stats["files"], chunks=stats["chunks"])
+    if timings["files"]:
+        breakdown = ", ".join(f"{stage} {ms / 1000:.1f}s" for stage, ms in timings["files"].items())
+        wall = timings["total_ms"] / 1000
+        print(f"⏱️ Stage time over files: {breakdown} ({wall:.1f}s wall).")
+    return {
+        "files": stats["files"],
+        "chunks": stats["chunks"],
+        "scanned": len(files),
+        "skipped": stats["skipped"],
+        "updated": stats["updated"],
+        "removed": removed,
+        "cache": cache_stats,
+        "index": index,
+        "bm25": bm25,
+        "timings": timings,
+    }
 
 
 def main():
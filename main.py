@@ -1,16 +1,155 @@
-from fastapi import FastAPI, Query
-from agent_retriever_http_fix import ask_agent
+import asyncio
+import json
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import asynccontextmanager
+from typing import Optional
 
-app = FastAPI()
+from fastapi import FastAPI, HTTPException, Query
+from fastapi.responses import PlainTextResponse, StreamingResponse
 
-@app.get("/ask")
-def ask(q: str = Query(..., description="Question for the agent")):
+from app import metrics, query_engine
+from app.config import get_settings
+from app.request_gate import GateFull, RequestGate
+
+settings = get_settings()
+BACKEND = settings.ask_backend.strip().lower()
+RESULT_KEYS = ("question", "answer", "sources", "config", "llm", "cache", "timings")
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    # One bounded pool for encoder / Chroma / Weaviate calls, shared by every request.
+    executor = ThreadPoolExecutor(
+        max_workers=max(1, settings.server_workers), thread_name_prefix="ask"
+    )
+    app.state.executor = executor
+    app.state.gate = RequestGate(settings.server_max_pending)
+    if BACKEND == "local":
+        await asyncio.get_running_loop().run_in_executor(executor, query_engine.warmup)
     try:
-        answer = ask_agent(q)
+        yield
+    finally:
+        executor.shutdown(wait=False, cancel_futures=True)
+
+app = FastAPI(lifespan=lifespan)
+
+def _too_busy(exc: GateFull) -> HTTPException:
+    return HTTPException(
+        status_code=429, detail=f"Server busy: {exc}", headers={"Retry-After": "1"}
+    )
+
+async def _answer(q: str, top_k, temperature, max_tokens):
+    if BACKEND == "weaviate":
+        from agent_retriever_http_fix import ask_agent
+
+        loop = asyncio.get_running_loop()
+        answer = await loop.run_in_executor(app.state.executor, ask_agent, q)
         return {"query": q, "answer": answer}
+    result = await query_engine.aanswer_with_context(
+        q,
+        top_k=top_k,
+        temperature=temperature,
+        max_tokens=max_tokens,
+        executor=app.state.executor,
+    )
+    payload = {key: result.get(key) for key in RESULT_KEYS}
+    payload["query"] = q
+    return payload
+
+@app.get("/ask")
+async def ask(
+    q: str = Query(..., description="Question for the agent"),
+    top_k: Optional[int] = Query(None, ge=1, le=50),
+    temperature: Optional[float] = Query(None, ge=0.0, le=2.0),
+    max_tokens: Optional[int] = Query(None, ge=1),
+):
+    # Identical questions already in flight share one answer instead of recomputing it.
+    key = (" ".join(q.split()).lower(), top_k, temperature, max_tokens)
+    try:
+        return await app.state.gate.run(key, lambda: _answer(q, top_k, temperature, max_tokens))
+    except GateFull as e:
+        raise _too_busy(e)
     except Exception as e:
         return {"error": str(e)}
 
+def _sse_events(q: str, top_k, temperature, max_tokens):
+    stream = query_engine.answer_with_context_stream(
+        q, top_k=top_k, temperature=temperature, max_tokens=max_tokens
+    )
+    try:
+        for event in stream:
+            if event["type"] == "context":
+                payload = {"sources": event["sources"]}
+            elif event["type"] == "token":
+                payload = {"text": event["text"]}
+            else:
+                result = event["result"]
+                payload = {key: result.get(key) for key in RESULT_KEYS}
+            yield f"event: {event['type']}\ndata: {json.dumps(payload)}\n\n"
+    except Exception as e:
+        yield f"event: error\ndata: {json.dumps({'error': str(e)})}\n\n"
+    finally:
+        stream.close()
+
+async def _sse_stream(q: str, top_k, temperature, max_tokens):
+    gate = app.state.gate
+    try:
+        gate.acquire()
+    except GateFull as e:
+        yield f"event: error\ndata: {json.dumps({'error': str(e)})}\n\n"
+        return
+    loop = asyncio.get_running_loop()
+    events = _sse_events(q, top_k, temperature, max_tokens)
+    # A step can still be running in a worker when the client disconnects; close waits for it.
+    lock = threading.Lock()
+
+    def step():
+        with lock:
+            return next(events, None)
+
+    def close():
+        with lock:
+            events.close()
+
+    try:
+        while True:
+            chunk = await loop.run_in_executor(app.state.executor, step)
+            if chunk is None:
+                break
+            yield chunk
+    finally:
+        gate.release()
+        # Stops retrieval and the upstream completion if the client went away mid-stream.
+        app.state.executor.submit(close)
+
+@app.get("/ask/stream")
+async def ask_stream(
+    q: str = Query(..., description="Question for the agent"),
+    top_k: Optional[int] = Query(None, ge=1, le=50),
+    temperature: Optional[float] = Query(None, ge=0.0, le=2.0),
+    max_tokens: Optional[int] = Query(None, ge=1),
+):
+    """Server-sent events: `context`, then `token`s, then `done` with the full result."""
+    if BACKEND != "local":
+        raise HTTPException(status_code=404, detail="Streaming needs ASK_BACKEND=local.")
+    try:
+        app.state.gate.check()
+    except GateFull as e:
+        raise _too_busy(e)
+    return StreamingResponse(
+        _sse_stream(q, top_k, temperature, max_tokens),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"},
+    )
+
 @app.get("/health")
 def health():
-    return {"status": "ok"}
+    gate = getattr(app.state, "gate", None)
+    return {"status": "ok", "backend": BACKEND, "gate": gate.stats() if gate else None}
+
+@app.get("/metrics")
+def prometheus_metrics():
+    """Stage latency histograms in the Prometheus text format."""
+    return PlainTextResponse(
+        metrics.render_prometheus(), media_type="text/plain; version=0.0.4; charset=utf-8"
+    )
@@ -1,8 +1,60 @@
 from __future__ import annotations
 
+import importlib
 import sys
 from pathlib import Path
 
+import pytest
+
 PROJECT_ROOT = Path(__file__).resolve().parents[1]
 if str(PROJECT_ROOT) not in sys.path:
     sys.path.insert(0, str(PROJECT_ROOT))
+
+from fakes import CountingEncoder, FakeClient  # noqa: E402
+
+
+@pytest.fixture
+def make_engine(monkeypatch, tmp_path):
+    def build(**env):
+        for key, value in env.items():
+            monkeypatch.setenv(key, value)
+        return _build_engine(monkeypatch, tmp_path)
+
+    return build
+
+
+@pytest.fixture
+def engine(make_engine):
+    return make_engine()
+
+
+def _build_engine(monkeypatch, tmp_path):
+    monkeypatch.setenv("EMBEDDINGS_PATH", str(tmp_path / "embeddings"))
+    monkeypatch.setenv("LLM_MODE", "offline")
+    monkeypatch.setenv("USE_OPENAI_EMBEDDINGS", "false")
+
+    config = importlib.import_module("app.config")
+    importlib.reload(config)
+    chromadb = importlib.import_module("chromadb")
+    monkeypatch.setattr(chromadb, "PersistentClient", FakeClient)
+    query_engine = importlib.import_module("app.query_engine")
+    importlib.reload(query_engine)
+
+    encoder = CountingEncoder()
+    monkeypatch.setattr(query_engine, "encoder", encoder)
+    collection = query_engine.get_collection()
+    docs = {
+        "pricing.md": "Pricing a retainer: anchor pricing on value, pricing tiers.",
+        "sales.md": "Sales calls: qualify, then close. Sales pipelines need follow-up.",
+        "brand.md": "Brand building compounds; brand consistency matters.",
+    }
+    for idx, (name, text) in enumerate(docs.items()):
+        collection.add(
+            documents=[text],
+            embeddings=encoder.encode([text]),
+            metadatas=[{"source": f"books/{name}", "chunk": 0}],
+            ids=[f"books/{name}#0"],
+        )
+    encoder.calls.clear()
+    collection.queries = 0
+    return query_engine
@@ -0,0 +1,104 @@
+from __future__ import annotations
+
+
+class FakeCollection:
+    def __init__(self, key):
+        self.key = key
+        self.entries = []
+
+    def add(self, documents, embeddings, metadatas, ids):
+        for doc, emb, meta, item_id in zip(documents, embeddings, metadatas, ids):
+            self.entries.append(
+                {
+                    "document": doc,
+                    "embedding": emb,
+                    "metadata": meta,
+                    "id": item_id,
+                }
+            )
+
+    def upsert(self, documents, embeddings, metadatas, ids):
+        self.delete(ids=ids)
+        self.add(documents, embeddings, metadatas, ids)
+
+    def delete(self, where=None, ids=None):
+        source = (where or {}).get("source")
+        if source:
+            self.entries = [
+                entry for entry in self.entries if entry["metadata"].get("source") != source
+            ]
+        if ids:
+            wanted = set(ids)
+            self.entries = [entry for entry in self.entries if entry["id"] not in wanted]
+
+    def get(self, ids=None, where=None, include=None):
+        selected = [
+            entry
+            for entry in self.entries
+            if (ids is None or entry["id"] in ids)
+            and all(entry["metadata"].get(key) == value for key, value in (where or {}).items())
+        ]
+        return {
+            "ids": [entry["id"] for entry in selected],
+            "documents": [entry["document"] for entry in selected],
+            "metadatas": [entry["metadata"] for entry in selected],
+            "embeddings": [entry["embedding"] for entry in selected],
+        }
+
+    def query(self, query_embeddings, n_results, include):
+        self.queries = getattr(self, "queries", 0) + 1
+        rows = {"documents": [], "metadatas": [], "ids": [], "distances": []}
+        if "embeddings" in (include or []):
+            rows["embeddings"] = []
+        for query in query_embeddings:
+            ranked = sorted(self.entries, key=lambda entry: -_cosine(query, entry["embedding"]))
+            selected = ranked[:n_results]
+            if "embeddings" in rows:
+                rows["embeddings"].append([entry["embedding"] for entry in selected])
+            rows["documents"].append([entry["document"] for entry in selected])
+            rows["metadatas"].append([entry["metadata"] for entry in selected])
+            rows["ids"].append([entry["id"] for entry in selected])
+            rows["distances"].append(
+                [1.0 - _cosine(query, entry["embedding"]) for entry in selected]
+            )
+        return rows
+
+
+def _cosine(left, right):
+    dot = sum(a * b for a, b in zip(left, right))
+    norm = (sum(a * a for a in left) ** 0.5) * (sum(b * b for b in right) ** 0.5)
+    return dot / norm if norm else 0.0
+
+
+class FakeClient:
+    _registry: dict[tuple[str, str], FakeCollection] = {}
+
+    def __init__(self, path: str):
+        self.path = path
+
+    def get_or_create_collection(self, name: str):
+        key = (self.path, name)
+        if key not in self._registry:
+            self._registry[key] = FakeCollection(key)
+        return self._registry[key]
+
+
+class DummyEmbedding(list):
+    def tolist(self):
+        return list(self)
+
+
+class CountingEncoder:
+    """Embeds text as keyword counts so retrieval is deterministic."""
+
+    keywords = ("pricing", "sales", "brand")
+
+    def __init__(self):
+        self.calls: list[list[str]] = []
+
+    def encode(self, texts, show_progress_bar=False):
+        self.calls.append(list(texts))
+        return [
+            DummyEmbedding([float(text.lower().count(word)) + 0.01 for word in self.keywords])
+            for text in texts
+        ]
@@ -0,0 +1,42 @@
+from __future__ import annotations
+
+from app.context_packer import merge_overlap, pack_contexts
+
+
+def _words(text):
+    return len(text.split())
+
+
+def test_packer_merges_neighbours_dedupes_and_fits_budget():
+    base = " ".join(f"w{idx}" for idx in range(120))
+    first, second = base[:400], base[300:]
+    contexts = [
+        {"text": second, "metadata": {"source": "a.txt", "chunk": 1}},
+        {"text": "Unrelated advice on brand voice and tone.", "metadata": {"source": "b.txt"}},
+        {"text": first, "metadata": {"source": "a.txt", "chunk": 0}},
+        {"text": second, "metadata": {"source": "copy.txt", "chunk": 7}},
+    ]
+    assert merge_overlap(first, second) == base
+
+    blocks, stats = pack_contexts(contexts, budget_tokens=0, count_tokens=_words)
+    assert [block["text"] for block in blocks] == [base, contexts[1]["text"]]
+    assert stats["merged_chunks"] == 1
+    assert stats["duplicates_dropped"] == 1
+    assert stats["tokens_saved"] == sum(_words(c["text"]) for c in contexts) - _words(
+        base + " " + contexts[1]["text"]
+    )
+
+    blocks, stats = pack_contexts(contexts, budget_tokens=60, count_tokens=_words)
+    assert len(blocks) == 1 and blocks[0]["text"].endswith(" ...")
+    assert stats["context_tokens"] <= 60
+    assert stats["over_budget_dropped"] == 1
+
+
+def test_answer_reports_packing_in_config(make_engine):
+    engine = make_engine(CONTEXT_TOKEN_BUDGET="5")
+    result = engine.answer_with_context("How should pricing work?", top_k=3)
+    packing = result["config"]["packing"]
+    assert packing["context_tokens"] <= 5
+    assert packing["tokens_saved"] > 0
+    assert "No relevant context" not in result["prompt"]  # the best chunk is cut, not dropped
+    assert len(result["contexts"]) == 3
@@ -0,0 +1,41 @@
+from __future__ import annotations
+
+from app.embedding_cache import EmbeddingCache
+
+
+def test_cache_hits_normalized_text_and_evicts_lru(tmp_path):
+    cache = EmbeddingCache(tmp_path / "cache.sqlite3", max_bytes=3 * 4 * 4)
+    calls: list[list[str]] = []
+
+    def encode(texts):
+        calls.append(list(texts))
+        return [[float(len(text))] * 4 for text in texts]
+
+    first = cache.encode("local:test", ["alpha", "beta", "alpha"], encode)
+    assert calls == [["alpha", "beta"]]
+    assert first[0] == first[2] == [5.0] * 4
+
+    again = cache.encode("local:test", ["  alpha\n", "beta"], encode)
+    assert again == [[5.0] * 4, [4.0] * 4]
+    assert len(calls) == 1
+    assert cache.stats()["hits"] == 2
+
+    cache.encode("other-model", ["alpha"], encode)
+    assert len(calls) == 2
+
+    cache.encode("local:test", ["gamma", "delta"], encode)
+    assert cache.stats()["bytes"] <= 3 * 4 * 4
+    cache.encode("local:test", ["alpha"], encode)
+    assert calls[-1] == ["alpha"]
+
+
+def test_re_putting_cached_keys_does_not_inflate_size_or_evict(tmp_path):
+    cache = EmbeddingCache(tmp_path / "cache.sqlite3", max_bytes=3 * 4 * 4)
+    hashes = ["a", "b", "c"]
+    cache.put_many("local:test", hashes, [[1.0] * 4] * 3)
+    for _ in range(3):
+        cache.put_many("local:test", hashes + ["a"], [[2.0] * 4] * 4)
+
+    assert cache.stats()["bytes"] == 3 * 4 * 4
+    assert cache.stats()["entries"] == 3
+    assert cache.get_many("local:test", hashes)["c"] == [2.0] * 4
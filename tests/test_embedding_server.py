@@ -0,0 +1,101 @@
+from __future__ import annotations
+
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+import numpy as np
+import pytest
+
+from app.embedding_server import EmbeddingClient, batching_encoder, connect, make_server
+
+MODEL = "all-MiniLM-L6-v2"
+
+
+class SlowKeywordEncoder:
+    """Keyword counts like ``CountingEncoder``, with a fixed cost per forward pass."""
+
+    keywords = ("pricing", "sales", "brand")
+
+    def __init__(self, delay: float = 0.01):
+        self.delay = delay
+        self.batches: list[int] = []
+
+    def encode(self, texts, batch_size=32, show_progress_bar=False):
+        time.sleep(self.delay)
+        self.batches.append(len(texts))
+        return np.array(
+            [[text.lower().count(word) + 0.01 for word in self.keywords] for text in texts],
+            dtype=np.float32,
+        )
+
+
+@pytest.fixture
+def server():
+    model = SlowKeywordEncoder()
+    batcher = batching_encoder(model, max_batch=64, max_wait_ms=5)
+    httpd = make_server(batcher, MODEL, port=0)
+    thread = threading.Thread(target=httpd.serve_forever, daemon=True)
+    thread.start()
+    yield f"http://127.0.0.1:{httpd.server_port}", model
+    httpd.shutdown()
+    httpd.server_close()
+
+
+def test_concurrent_clients_share_forward_passes(server):
+    url, model = server
+    client = EmbeddingClient(url)
+    texts = [f"pricing {'brand ' * (idx % 3)}question {idx}" for idx in range(32)]
+
+    with ThreadPoolExecutor(max_workers=16) as pool:
+        vectors = list(pool.map(lambda text: client.encode([text])[0], texts))
+
+    expected = SlowKeywordEncoder(delay=0).encode(texts)
+    np.testing.assert_allclose(np.stack(vectors), expected)
+    assert sum(model.batches) == 32
+    assert len(model.batches) < 32
+    stats = client.health()
+    assert stats["model"] == MODEL
+    assert stats["requests"] == 32 and stats["requests_per_batch"] > 1
+
+
+def test_query_engine_encodes_through_the_server(server, make_engine, monkeypatch):
+    url, model = server
+    engine = make_engine(EMBEDDING_SERVER_URL=url)
+    monkeypatch.setattr(engine, "encoder", None)
+
+    contexts = engine.retrieve_context("How should brand work?", top_k=1)
+
+    assert isinstance(engine.get_encoder(), EmbeddingClient)
+    assert contexts[0]["metadata"]["source"] == "books/brand.md"
+    assert model.batches == [1]
+
+
+def test_connect_falls_back_when_no_server_answers(capsys):
+    assert connect("http://127.0.0.1:9", MODEL) is None
+    assert "loading all-MiniLM-L6-v2 in-process" in capsys.readouterr().out
+
+
+def test_empty_input_is_rejected_not_a_server_error(server):
+    url, model = server
+    client = EmbeddingClient(url)
+    assert client.encode([]).shape == (0, 0)
+    response, data = client._request("POST", "/encode", b'{"texts": []}')
+    assert response.status == 400 and b"non-empty" in data
+    assert client.encode(["pricing"]).shape == (1, 3)
+    assert model.batches == [1]
+
+
+def test_client_falls_back_to_local_encoder_when_server_goes_away(capsys):
+    local = SlowKeywordEncoder(delay=0)
+    loads = []
+    client = EmbeddingClient(
+        "http://127.0.0.1:9", timeout=1, fallback=lambda: loads.append(1) or local
+    )
+
+    np.testing.assert_allclose(client.encode(["brand sales"]), local.encode(["brand sales"]))
+    assert client.encode(["pricing"], batch_size=8).shape == (1, 3)
+    assert loads == [1] and local.batches == [1, 1, 1]
+    assert "went away" in capsys.readouterr().out
+    with pytest.raises(OSError):
+        EmbeddingClient("http://127.0.0.1:9", timeout=1).encode(["pricing"])
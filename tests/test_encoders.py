@@ -0,0 +1,105 @@
+from __future__ import annotations
+
+import numpy as np
+import pytest
+
+pytest.importorskip("onnxruntime")
+pytest.importorskip("onnx")
+pytest.importorskip("sentence_transformers")
+
+from app import encoders
+from app.encoders import CHECK_TEXTS, OnnxEncoder, cosine_agreement, load_onnx_encoder
+
+
+def _tiny_model(root):
+    """A randomly initialised MiniLM-shaped sentence-transformers model saved under ``root``."""
+    from sentence_transformers import SentenceTransformer, models
+    from tokenizers import Tokenizer, normalizers, pre_tokenizers, processors
+    from tokenizers.models import WordPiece
+    from transformers import BertConfig, BertModel, BertTokenizerFast
+
+    specials = ["[PAD]", "[UNK]", "[CLS]", "[SEP]", "[MASK]"]
+    words = sorted({word for text in CHECK_TEXTS for word in text.lower().split()})
+    vocab = {token: idx for idx, token in enumerate(specials + words + ["##s", "##ing"])}
+    tokenizer = Tokenizer(WordPiece(vocab, unk_token="[UNK]"))
+    tokenizer.normalizer = normalizers.BertNormalizer(lowercase=True)
+    tokenizer.pre_tokenizer = pre_tokenizers.BertPreTokenizer()
+    tokenizer.post_processor = processors.TemplateProcessing(
+        single="[CLS] $A [SEP]", special_tokens=[("[CLS]", 2), ("[SEP]", 3)]
+    )
+    hf_tokenizer = BertTokenizerFast(
+        tokenizer_object=tokenizer,
+        pad_token="[PAD]",
+        unk_token="[UNK]",
+        cls_token="[CLS]",
+        sep_token="[SEP]",
+        mask_token="[MASK]",
+    )
+    config = BertConfig(
+        vocab_size=len(vocab),
+        hidden_size=32,
+        num_hidden_layers=2,
+        num_attention_heads=2,
+        intermediate_size=64,
+        max_position_embeddings=64,
+    )
+    transformer_dir = root / "bert"
+    BertModel(config).save_pretrained(transformer_dir)
+    hf_tokenizer.save_pretrained(transformer_dir)
+    transformer = models.Transformer(str(transformer_dir), max_seq_length=16)
+    model = SentenceTransformer(
+        modules=[transformer, models.Pooling(32, "mean"), models.Normalize()], device="cpu"
+    )
+    model.save(str(root / "tiny-minilm"))
+    return str(root / "tiny-minilm"), model
+
+
+def test_onnx_export_matches_pytorch_and_int8_stays_close(tmp_path, capsys):
+    model_name, model = _tiny_model(tmp_path)
+    target = tmp_path / "onnx" / "tiny"
+    texts = list(CHECK_TEXTS) + ["pricing " * 40, "sales"]
+
+    fp32 = load_onnx_encoder(model_name, target)
+    int8 = load_onnx_encoder(model_name, target, quantized=True)
+
+    reference = model.encode(texts, batch_size=4)
+    vectors = fp32.encode(texts, batch_size=4)
+    assert vectors.shape == reference.shape and vectors.dtype == np.float32
+    np.testing.assert_allclose(vectors, reference, atol=1e-4)
+    assert cosine_agreement(reference, int8.encode(texts))["min"] > 0.95
+    assert fp32.encode("sales").shape == (32,)
+    out = capsys.readouterr().out
+    assert "Exporting" in out and "(onnx-int8) agrees with PyTorch" in out
+
+    # A second load reuses the export without torch doing any work.
+    reloaded = OnnxEncoder(target)
+    np.testing.assert_allclose(reloaded.encode(texts[:3]), vectors[:3], atol=1e-6)
+    assert reloaded.agreement()["min"] > 0.9999
+
+
+def test_unsupported_backend_and_fallback(make_engine, monkeypatch, capsys):
+    engine = make_engine(ENCODER_BACKEND="onnx-int8", LOCAL_ENCODER_MODEL="org/some-model")
+    assert engine.QUERY_ENCODER_MODEL == "org/some-model@int8"
+    assert encoders.onnx_model_dir(engine.settings).parts[-2:] == ("onnx", "org__some-model")
+
+    def unavailable(*args, **kwargs):
+        raise ImportError("No module named 'onnxruntime'")
+
+    loaded = []
+    monkeypatch.setattr(encoders, "load_onnx_encoder", unavailable)
+    monkeypatch.setattr(
+        "sentence_transformers.SentenceTransformer", lambda name: loaded.append(name) or name
+    )
+    assert encoders.load_encoder(engine.settings) == "org/some-model"
+    assert "onnx-int8 encoder unavailable (ImportError" in capsys.readouterr().out
+
+    def broken(*args, **kwargs):
+        raise RuntimeError("[ONNXRuntimeError] : 10 : INVALID_GRAPH")
+
+    monkeypatch.setattr(encoders, "load_onnx_encoder", broken)
+    assert encoders.load_encoder(engine.settings) == "org/some-model"
+    assert "unavailable (RuntimeError: [ONNXRuntimeError]" in capsys.readouterr().out
+    assert loaded == ["org/some-model"] * 2
+
+    with pytest.raises(ValueError, match="Unknown ENCODER_BACKEND"):
+        encoders.load_encoder(make_engine(ENCODER_BACKEND="tensorrt").settings)
@@ -1,54 +1,8 @@
 from __future__ import annotations
 
 import importlib
-class FakeCollection:
-    def __init__(self, key):
-        self.key = key
-        self.entries = []
 
-    def add(self, documents, embeddings, metadatas, ids):
-        for doc, emb, meta, item_id in zip(documents, embeddings, metadatas, ids):
-            self.entries.append(
-                {
-                    "document": doc,
-                    "embedding": emb,
-                    "metadata": meta,
-                    "id": item_id,
-                }
-            )
-
-    def delete(self, where):
-        source = where.get("source")
-        if source:
-            self.entries = [
-                entry for entry in self.entries if entry["metadata"].get("source") != source
-            ]
-
-    def query(self, query_embeddings, n_results, include):
-        selected = self.entries[:n_results]
-        documents = [entry["document"] for entry in selected]
-        metadatas = [entry["metadata"] for entry in selected]
-        ids = [entry["id"] for entry in selected]
-        distances = [idx * 0.1 for idx, _ in enumerate(selected)]
-        return {
-            "documents": [documents],
-            "metadatas": [metadatas],
-            "ids": [ids],
-            "distances": [distances],
-        }
-
-
-class FakeClient:
-    _registry: dict[tuple[str, str], FakeCollection] = {}
-
-    def __init__(self, path: str):
-        self.path = path
-
-    def get_or_create_collection(self, name: str):
-        key = (self.path, name)
-        if key not in self._registry:
-            self._registry[key] = FakeCollection(key)
-        return self._registry[key]
+from fakes import FakeClient
 
 
 def test_ingest_and_answer(monkeypatch, tmp_path):
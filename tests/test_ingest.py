@@ -0,0 +1,312 @@
+from __future__ import annotations
+
+import importlib
+
+import numpy as np
+import pytest
+
+from fakes import CountingEncoder, FakeClient
+
+
+def _load_ingest(monkeypatch, tmp_path, source_dir):
+    monkeypatch.setenv("SOURCE_DIRS", str(source_dir))
+    monkeypatch.setenv("EMBEDDINGS_PATH", str(tmp_path / "embeddings"))
+    monkeypatch.setenv("USE_OPENAI_EMBEDDINGS", "false")
+
+    config = importlib.import_module("app.config")
+    importlib.reload(config)
+
+    chromadb = importlib.import_module("chromadb")
+    monkeypatch.setattr(chromadb, "PersistentClient", FakeClient)
+
+    ingest_books = importlib.import_module("ingest_books")
+    importlib.reload(ingest_books)
+    return ingest_books
+
+
+def test_incremental_ingest(monkeypatch, tmp_path):
+    source_dir = tmp_path / "sources"
+    source_dir.mkdir()
+    keep = source_dir / "keep.txt"
+    edit = source_dir / "edit.md"
+    gone = source_dir / "gone.txt"
+    keep.write_text("Pricing a retainer starts with value.", encoding="utf-8")
+    edit.write_text("First paragraph about sales.\n\n" + "Negotiation " * 120, encoding="utf-8")
+    gone.write_text("Temporary notes.", encoding="utf-8")
+
+    ingest_books = _load_ingest(monkeypatch, tmp_path, source_dir)
+    embedded: list[str] = []
+
+    def fake_embed(chunks):
+        embedded.extend(chunks)
+        return [[1.0, 0.0, 0.0]] * len(chunks)
+
+    monkeypatch.setattr(ingest_books, "embed_chunks", fake_embed)
+
+    first = ingest_books.ingest_all([source_dir])
+    assert first["files"] == 3
+    assert first["skipped"] == 0
+
+    embedded.clear()
+    second = ingest_books.ingest_all([source_dir])
+    assert second["skipped"] == 3
+    assert second["files"] == 0
+    assert embedded == []
+
+    edit.write_text(
+        "First paragraph about sales.\n\n" + "Negotiation " * 120 + "\n\nA new closing note.",
+        encoding="utf-8",
+    )
+    gone.unlink()
+    third = ingest_books.ingest_all([source_dir])
+    assert third["updated"] == 1
+    assert third["removed"] == 1
+    assert third["skipped"] == 1
+    assert all("First paragraph" not in chunk for chunk in embedded)
+
+    collection = FakeClient(str(tmp_path / "embeddings")).get_or_create_collection(
+        "josef_knowledge"
+    )
+    sources = {entry["metadata"]["source"] for entry in collection.entries}
+    assert sources == {"sources/keep.txt", "sources/edit.md"}
+
+
+def test_parallel_pipeline_batches_across_files(monkeypatch, tmp_path):
+    source_dir = tmp_path / "sources"
+    source_dir.mkdir()
+    for idx in range(5):
+        (source_dir / f"note{idx}.txt").write_text(f"Note {idx} on automation.", encoding="utf-8")
+
+    ingest_books = _load_ingest(monkeypatch, tmp_path, source_dir)
+    batches: list[int] = []
+
+    def fake_embed(chunks):
+        batches.append(len(chunks))
+        return [[0.5, 0.5, 0.0]] * len(chunks)
+
+    monkeypatch.setattr(ingest_books, "embed_chunks", fake_embed)
+
+    result = ingest_books.ingest_all([source_dir], workers=2, embed_batch_size=2)
+    assert result["files"] == 5
+    assert result["chunks"] == 5
+    assert sum(batches) == 5
+    assert max(batches) <= 2
+
+    collection = FakeClient(str(tmp_path / "embeddings")).get_or_create_collection(
+        "josef_knowledge"
+    )
+    assert len(collection.entries) == 5
+
+
+def test_streaming_extraction_windows_and_pages(monkeypatch, tmp_path):
+    fitz = importlib.import_module("fitz")
+    source_dir = tmp_path / "sources"
+    source_dir.mkdir()
+    doc = fitz.open()
+    for number in range(1, 6):
+        page = doc.new_page()
+        page.insert_text((72, 72), f"Page {number} covers pricing strategy {number}.")
+    doc.save(source_dir / "manual.pdf")
+    doc.close()
+    notes = source_dir / "notes.txt"
+    notes.write_text("".join(f"line {idx}\n" for idx in range(400)), encoding="utf-8")
+
+    ingest_books = _load_ingest(monkeypatch, tmp_path, source_dir)
+    monkeypatch.setattr(ingest_books, "SEGMENTS_PER_WINDOW", 2)
+    monkeypatch.setattr(ingest_books, "TEXT_WINDOW_BYTES", 500)
+    monkeypatch.setattr(ingest_books, "embed_chunks", lambda chunks: [[1.0, 0.0]] * len(chunks))
+
+    assert len(ingest_books.plan_windows(source_dir / "manual.pdf")) == 3
+    streamed = "\n".join(
+        text
+        for start, stop in ingest_books.plan_windows(notes)
+        for _, text in ingest_books.iter_text_segments(notes, start, stop)
+    )
+    assert streamed.split() == notes.read_text(encoding="utf-8").split()
+
+    result = ingest_books.ingest_all([source_dir])
+    assert result["files"] == 2
+
+    collection = FakeClient(str(tmp_path / "embeddings")).get_or_create_collection(
+        "josef_knowledge"
+    )
+    pdf_entries = [e for e in collection.entries if e["metadata"]["source"] == "sources/manual.pdf"]
+    assert {e["metadata"]["page"] for e in pdf_entries} == {1, 3, 5}
+    assert sorted(e["metadata"]["chunk"] for e in pdf_entries) == list(range(len(pdf_entries)))
+    assert "Page 4" in " ".join(e["document"] for e in pdf_entries)
+
+
+def test_incremental_ingest_into_numpy_store(monkeypatch, tmp_path):
+    monkeypatch.setenv("VECTOR_STORE", "numpy")
+    source_dir = tmp_path / "sources"
+    source_dir.mkdir()
+    doc = source_dir / "doc.md"
+    doc.write_text("Sales lesson. " * 200, encoding="utf-8")
+
+    ingest_books = _load_ingest(monkeypatch, tmp_path, source_dir)
+    monkeypatch.setattr(
+        ingest_books, "embed_chunks", lambda chunks: [[float(len(c)), 1.0] for c in chunks]
+    )
+    first = ingest_books.ingest_all([source_dir])
+    doc.write_text("Sales lesson. " * 20, encoding="utf-8")
+    second = ingest_books.ingest_all([source_dir])
+
+    store = ingest_books.open_collection(ingest_books.settings)
+    assert first["chunks"] > 1
+    assert second["updated"] == 1
+    assert store.count() == second["chunks"] == 1
+    assert (tmp_path / "embeddings" / "numpy_store" / "ingest_manifest.json").exists()
+
+
+def test_bm25_index_follows_ingest_and_drives_hybrid_retrieval(monkeypatch, tmp_path):
+    source_dir = tmp_path / "sources"
+    source_dir.mkdir()
+    (source_dir / "a_pricing.txt").write_text("Price retainers on value.", encoding="utf-8")
+    (source_dir / "b_brand.txt").write_text("Brand building compounds.", encoding="utf-8")
+    spin = source_dir / "c_spin.txt"
+    spin.write_text("SPIN Selling by Neil Rackham covers large deals.", encoding="utf-8")
+
+    monkeypatch.setenv("RETRIEVAL_MODE", "hybrid")
+    monkeypatch.setenv("LLM_MODE", "offline")
+    ingest_books = _load_ingest(monkeypatch, tmp_path, source_dir)
+    # Identical vectors: dense search alone cannot tell the files apart.
+    monkeypatch.setattr(
+        ingest_books, "embed_chunks", lambda chunks: [[1.0, 0.0, 0.0]] * len(chunks)
+    )
+    result = ingest_books.ingest_all([source_dir])
+    assert result["bm25"]["documents"] == 3
+    timings = result["timings"]
+    assert {"scan", "pipeline", "bm25"} <= set(timings["stages"])
+    assert {"extract", "split", "embed", "write"} <= set(timings["files"])
+    assert len(timings["slowest_files"]) == 3
+    assert timings["slowest_files"][0]["chunks"] == 1
+
+    query_engine = importlib.import_module("app.query_engine")
+    importlib.reload(query_engine)
+    monkeypatch.setattr(query_engine, "encoder", CountingEncoder())
+
+    top = query_engine.retrieve_context("Who wrote SPIN selling?", top_k=1)
+    assert top[0]["metadata"]["source"] == "sources/c_spin.txt"
+    assert top[0]["bm25"] > 0
+    query_engine.set_retrieval_mode("bm25")
+    assert [ctx["id"] for ctx in query_engine.retrieve_context("rackham", top_k=3)] == [
+        "sources/c_spin.txt#0"
+    ]
+
+    spin.write_text("Closing techniques for large deals.", encoding="utf-8")
+    assert ingest_books.ingest_all([source_dir])["bm25"]["documents"] == 3
+    assert query_engine.retrieve_context("rackham", top_k=3) == []
+    assert query_engine.retrieve_context("closing", top_k=3)[0]["text"].startswith("Closing")
+
+
+def test_bm25_queries_serve_last_compile_while_ingest_writes(tmp_path):
+    from app.lexical_index import LexicalIndex
+
+    index = LexicalIndex(tmp_path / "lexical")
+    index.add(["a#0"], ["Neil Rackham wrote SPIN Selling."], [{"source": "a"}])
+    assert not index.compiled and index.search(["rackham"], 3) == [[]]
+    assert index.compile()["documents"] == 1
+    stamp = index.postings_path.stat().st_mtime_ns
+
+    # An ingest in progress bumps the version; queries keep the compiled postings.
+    index.delete(source="a")
+    index.add(["b#0"], ["Rackham on large deals."], [{"source": "b"}])
+    assert [hit for hit, _ in index.search(["rackham"], 3)[0]] == ["a#0"]
+    assert index.postings_path.stat().st_mtime_ns == stamp
+    assert not index.postings_path.with_suffix(".tmp").exists()
+
+    index.compile()
+    assert [hit for hit, _ in index.search(["rackham"], 3)[0]] == ["b#0"]
+
+
+def test_file_deleted_after_planning_does_not_stall_ingest(monkeypatch, tmp_path):
+    import os
+    import threading
+
+    source_dir = tmp_path / "sources"
+    source_dir.mkdir()
+    doc = source_dir / "doc.txt"
+    doc.write_text("Pricing a retainer starts with value.", encoding="utf-8")
+    ingest_books = _load_ingest(monkeypatch, tmp_path, source_dir)
+    monkeypatch.setattr(ingest_books, "embed_chunks", lambda chunks: [[1.0, 0.0]] * len(chunks))
+    assert ingest_books.ingest_all([source_dir], workers=1)["files"] == 1
+
+    # Same content, newer mtime: planned as unchanged, then gone before the writer sees it.
+    os.utime(doc, ns=(doc.stat().st_atime_ns, doc.stat().st_mtime_ns + 10**9))
+    plan_file = ingest_books.plan_file
+
+    def plan_then_delete(path, *args):
+        plan = plan_file(path, *args)
+        path.unlink()
+        return plan
+
+    monkeypatch.setattr(ingest_books, "plan_file", plan_then_delete)
+    result = {}
+    worker = threading.Thread(
+        target=lambda: result.update(ingest_books.ingest_all([source_dir], workers=1))
+    )
+    worker.start()
+    worker.join(timeout=30)
+    assert not worker.is_alive() and result["skipped"] == 1
+
+
+@pytest.mark.parametrize("dtype, dims", [("float32", "2"), ("int8", "0")])
+def test_compact_numpy_stores_re_embed_edited_files(monkeypatch, tmp_path, dtype, dims):
+    monkeypatch.setenv("VECTOR_STORE", "numpy")
+    monkeypatch.setenv("VECTOR_DTYPE", dtype)
+    monkeypatch.setenv("VECTOR_DIMS", dims)
+    source_dir = tmp_path / "sources"
+    source_dir.mkdir()
+    doc = source_dir / "doc.md"
+    doc.write_text("\n\n".join(f"Sales lesson {idx}. " * 40 for idx in range(4)), "utf-8")
+
+    ingest_books = _load_ingest(monkeypatch, tmp_path, source_dir)
+    embedded: list[str] = []
+
+    def fake_embed(chunks):
+        embedded.extend(chunks)
+        return [[float(len(chunk)), 1.0, 0.5, 0.25] for chunk in chunks]
+
+    monkeypatch.setattr(ingest_books, "embed_chunks", fake_embed)
+    assert ingest_books.ingest_all([source_dir])["chunks"] > 1
+
+    # Stored rows are truncated or quantised, so unchanged chunks are embedded again.
+    embedded.clear()
+    doc.write_text(doc.read_text("utf-8") + "\n\nA new closing note.", "utf-8")
+    second = ingest_books.ingest_all([source_dir])
+    assert second["updated"] == 1 and len(embedded) == second["chunks"]
+
+    store = ingest_books.open_collection(ingest_books.settings)
+    assert not store.exact_embeddings
+    stored = store.get(include=["embeddings", "documents"])
+    expected = np.asarray([[float(len(doc)), 1.0, 0.5, 0.25] for doc in stored["documents"]])
+    expected = expected[:, : store.dim]
+    expected /= np.linalg.norm(expected, axis=1, keepdims=True)
+    assert np.asarray(stored["embeddings"]) == pytest.approx(expected, abs=0.02)
+
+
+def test_forced_ingest_re_embeds_every_chunk(monkeypatch, tmp_path):
+    source_dir = tmp_path / "sources"
+    source_dir.mkdir()
+    doc = source_dir / "doc.md"
+    doc.write_text("\n\n".join(f"Sales lesson {idx}. " * 40 for idx in range(4)), "utf-8")
+
+    ingest_books = _load_ingest(monkeypatch, tmp_path, source_dir)
+    embedded: list[str] = []
+
+    def fake_embed(chunks):
+        embedded.extend(chunks)
+        return [[1.0, 0.0, 0.0]] * len(chunks)
+
+    monkeypatch.setattr(ingest_books, "embed_chunks", fake_embed)
+    first = ingest_books.ingest_all([source_dir])
+    assert first["chunks"] > 1 and len(embedded) == first["chunks"]
+
+    embedded.clear()
+    forced = ingest_books.ingest_all([source_dir], force=True)
+    assert forced["updated"] == 1 and forced["chunks"] == first["chunks"]
+    assert len(embedded) == first["chunks"]
+    collection = FakeClient(str(tmp_path / "embeddings")).get_or_create_collection(
+        "josef_knowledge"
+    )
+    assert len(collection.entries) == first["chunks"]
@@ -0,0 +1,50 @@
+from __future__ import annotations
+
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+import pytest
+
+from app.micro_batcher import MicroBatcher
+
+
+def test_concurrent_calls_share_batches_and_keep_their_results():
+    batches = []
+
+    def square(items):
+        time.sleep(0.005)
+        batches.append(len(items))
+        return [item * item for item in items]
+
+    batcher = MicroBatcher(square, max_batch=16, max_wait_ms=20, name="test_square")
+    with ThreadPoolExecutor(max_workers=12) as pool:
+        results = list(pool.map(lambda n: batcher([n, n + 1]), range(48)))
+
+    assert results == [[n * n, (n + 1) * (n + 1)] for n in range(48)]
+    assert sum(batches) == 96
+    assert max(batches) <= 16 + 2
+    stats = batcher.stats()
+    assert stats["requests"] == 48 and stats["requests_per_batch"] > 1
+
+
+def test_lone_caller_is_not_delayed_and_errors_reach_every_caller():
+    def fail_on_boom(items):
+        if "boom" in items:
+            raise ValueError("boom")
+        return items
+
+    batcher = MicroBatcher(fail_on_boom, max_batch=8, max_wait_ms=500, name="test_boom")
+    started = time.perf_counter()
+    assert batcher(["a"]) == ["a"]
+    assert batcher(["b"]) == ["b"]
+    assert time.perf_counter() - started < 0.4
+    assert batcher([]) == []
+    with pytest.raises(ValueError):
+        batcher(["boom"])
+
+
+def test_query_encodes_go_through_the_batcher(engine):
+    engine.answer_with_context("How should pricing work?")
+
+    stats = engine.cache_stats()["encode_batching"]
+    assert stats["batches"] >= 1 and stats["items"] >= 1
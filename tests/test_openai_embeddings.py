@@ -0,0 +1,84 @@
+from __future__ import annotations
+
+import json
+import threading
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+import pytest
+from openai import OpenAI
+
+from app.openai_embeddings import OpenAIEmbeddingBatcher
+
+
+class FakeEmbeddingsHandler(BaseHTTPRequestHandler):
+    rate_limited_once = False
+    batch_sizes: list[int] = []
+
+    def do_POST(self):
+        body = json.loads(self.rfile.read(int(self.headers["Content-Length"])))
+        cls = type(self)
+        if not cls.rate_limited_once:
+            cls.rate_limited_once = True
+            self._send(429, {"error": {"message": "slow down", "type": "rate_limit"}})
+            return
+        inputs = body["input"]
+        cls.batch_sizes.append(len(inputs))
+        data = [
+            {"object": "embedding", "index": idx, "embedding": [float(len(text)), 1.0]}
+            for idx, text in reversed(list(enumerate(inputs)))
+        ]
+        self._send(
+            200,
+            {
+                "object": "list",
+                "data": data,
+                "model": body["model"],
+                "usage": {"prompt_tokens": 1, "total_tokens": 1},
+            },
+        )
+
+    def _send(self, status, payload):
+        raw = json.dumps(payload).encode("utf-8")
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(raw)))
+        if status == 429:
+            self.send_header("retry-after", "0")
+        self.end_headers()
+        self.wfile.write(raw)
+
+    def log_message(self, *args):
+        pass
+
+
+@pytest.fixture
+def fake_openai():
+    FakeEmbeddingsHandler.rate_limited_once = False
+    FakeEmbeddingsHandler.batch_sizes = []
+    server = ThreadingHTTPServer(("127.0.0.1", 0), FakeEmbeddingsHandler)
+    thread = threading.Thread(target=server.serve_forever, daemon=True)
+    thread.start()
+    client = OpenAI(
+        base_url=f"http://127.0.0.1:{server.server_address[1]}/v1",
+        api_key="sk-test",
+        max_retries=0,
+    )
+    yield client
+    server.shutdown()
+
+
+def test_batcher_packs_retries_and_preserves_order(fake_openai):
+    texts = ["x" * (idx + 1) for idx in range(25)]
+    batcher = OpenAIEmbeddingBatcher(
+        fake_openai, "text-embedding-3-small", max_items=4, max_tokens=8, concurrency=3
+    )
+
+    vectors = batcher.embed(texts)
+
+    assert [vector[0] for vector in vectors] == [float(len(text)) for text in texts]
+    assert batcher.retries == 1
+    assert sum(FakeEmbeddingsHandler.batch_sizes) == len(texts)
+    assert max(FakeEmbeddingsHandler.batch_sizes) <= 4
+    for start, stop in batcher.plan(texts):
+        cost = sum(batcher.count_tokens(text) for text in texts[start:stop])
+        assert cost <= 8 or stop - start == 1
@@ -0,0 +1,182 @@
+from __future__ import annotations
+
+import importlib
+import threading
+import time
+
+
+def test_answer_many_batches_encode_and_query(engine):
+    questions = ["How should pricing work?", "Tips for sales?", "How to grow a brand?"]
+
+    results = engine.answer_many(questions, top_k=1, concurrency=2)
+
+    assert [result["question"] for result in results] == questions
+    assert [result["sources"][0]["source"] for result in results] == [
+        "books/pricing.md",
+        "books/sales.md",
+        "books/brand.md",
+    ]
+    assert engine.encoder.calls == [questions]
+    assert engine.get_collection().queries == 1
+
+
+def test_retrieval_cache_hits_until_generation_bump(engine, tmp_path):
+    manifest = importlib.import_module("app.manifest")
+
+    first = engine.retrieve_context("How should PRICING work?", top_k=1)
+    second = engine.retrieve_context("how should   pricing work?", top_k=1)
+    assert first == second
+    assert engine.get_collection().queries == 1
+    assert len(engine.encoder.calls) == 1
+    assert engine.cache_stats()["retrieval"]["hits"] == 1
+
+    manifest.bump_generation(tmp_path / "embeddings")
+    engine.retrieve_context("How should pricing work?", top_k=1)
+    assert engine.get_collection().queries == 2
+    assert len(engine.encoder.calls) == 1
+
+
+def test_semantic_answer_cache_skips_llm(make_engine, monkeypatch):
+    engine = make_engine(ANSWER_CACHE="true", ANSWER_CACHE_THRESHOLD="0.9")
+
+    class CountingLLM:
+        mode = "openai"
+        model_name = "fake-model"
+
+        def __init__(self):
+            self.calls = 0
+
+        def generate(self, messages, *, temperature, max_tokens):
+            self.calls += 1
+            return f"answer #{self.calls}"
+
+    llm = CountingLLM()
+    monkeypatch.setattr(engine, "llm", llm)
+
+    first = engine.answer_with_context("How should pricing work?", top_k=1)
+    again = engine.answer_with_context("How should pricing work today?", top_k=1)
+    other = engine.answer_with_context("How should pricing work?", top_k=1, temperature=0.9)
+
+    assert llm.calls == 2
+    assert first["cache"]["answer"] == "miss"
+    assert again["cache"]["answer"] == "hit"
+    assert again["raw_answer"] == first["raw_answer"]
+    assert other["cache"]["answer"] == "miss"
+
+
+def test_streaming_answer_matches_blocking_answer(engine):
+    events = list(engine.answer_with_context_stream("Tips for sales?", top_k=2))
+
+    assert events[0]["type"] == "context"
+    assert events[-1]["type"] == "done"
+    tokens = [event["text"] for event in events if event["type"] == "token"]
+    assert len(tokens) > 1
+    streamed = "".join(tokens)
+    assert streamed == events[-1]["result"]["answer"]
+    assert streamed == engine.answer_with_context("Tips for sales?", top_k=2)["answer"]
+
+
+def test_rerank_reorders_caches_pairs_and_respects_budget(make_engine):
+    engine = make_engine(RERANK="true", RERANK_CANDIDATES="3", RERANK_BUDGET_MS="50")
+
+    class FakeCrossEncoder:
+        def __init__(self):
+            self.pairs = []
+            self.delay = 0.0
+
+        def predict(self, pairs, batch_size=32, show_progress_bar=False):
+            time.sleep(self.delay)
+            self.pairs.append(list(pairs))
+            return [float("brand" in text.lower()) for _, text in pairs]
+
+    model = FakeCrossEncoder()
+    reranker = engine.get_reranker(engine.settings)
+    reranker._model = model
+    reranker._scores.clear()
+
+    first = engine.answer_with_context("How should pricing work?", top_k=1)
+    assert first["sources"][0]["source"] == "books/brand.md"
+    assert first["rerank"]["candidates"] == 3 and first["rerank"]["cached"] == 0
+    assert [len(batch) for batch in model.pairs] == [3]  # one batched forward pass
+
+    again = engine.answer_with_context("How should pricing work?", top_k=1)
+    assert again["rerank"]["cached"] == 3
+    assert len(model.pairs) == 1
+
+    model.delay = 0.3
+    slow = engine.answer_with_context("Tips for sales?", top_k=1)
+    assert slow["rerank"]["fallback"] == "budget"
+    assert slow["sources"][0]["source"] == "books/sales.md"  # retrieval order
+    time.sleep(0.4)
+    assert engine.answer_with_context("Tips for sales?", top_k=1)["rerank"]["cached"] == 3
+
+    plain = engine.answer_with_context("Tips for sales?", top_k=1, rerank=False)
+    assert "rerank" not in plain and plain["config"]["rerank"] is False
+
+
+def test_rerank_under_concurrency_bounds_backlog_and_cancels_abandoned_passes():
+    from app.reranker import CrossEncoderReranker
+
+    class SlowCrossEncoder:
+        def __init__(self):
+            self.calls = 0
+
+        def predict(self, pairs, batch_size=32, show_progress_bar=False):
+            self.calls += 1
+            time.sleep(0.2)
+            return [1.0] * len(pairs)
+
+    model = SlowCrossEncoder()
+    reranker = CrossEncoderReranker("fake", budget_ms=300, max_pending=2)
+    reranker._model = model
+    contexts = [{"text": "pricing"}, {"text": "sales"}]
+    results = []
+
+    def ask(idx):
+        results.append(reranker.rerank(f"question {idx}", contexts, 1)[1]["fallback"])
+
+    threads = [threading.Thread(target=ask, args=(idx,)) for idx in range(16)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    time.sleep(0.5)
+    assert results.count("busy") >= 14 and False in results
+    assert model.calls <= 2  # no backlog of abandoned passes runs after the callers left
+    assert reranker._pending == 0
+
+    # A pass still queued when its caller's budget runs out is cancelled, not run.
+    reranker.max_pending = 8
+    blocker = reranker._pool.submit(time.sleep, 0.4)
+    assert reranker.rerank("late", contexts, 1)[1]["fallback"] == "budget"
+    blocker.result()
+    time.sleep(0.05)
+    assert model.calls <= 2 and reranker._pending == 0
+
+
+def test_mmr_mode_diversifies_sources(make_engine):
+    mmr = importlib.import_module("app.mmr")
+    vectors = [[1.0, 0.0], [0.99, 0.01], [0.98, 0.02], [0.7, 0.7]]
+    assert mmr.mmr_select([1.0, 0.0], vectors, 2, lambda_=1.0) == [0, 1]
+    assert mmr.mmr_select([1.0, 0.0], vectors, 2, lambda_=0.3) == [0, 3]
+    capped = mmr.mmr_select([1.0, 0.0], vectors, 3, lambda_=1.0, sources="aabb", per_source=1)
+    assert capped == [0, 2, 1]  # caps first, then filled by score
+
+    engine = make_engine(RETRIEVAL_MODE="mmr", MMR_PER_SOURCE="1", MMR_LAMBDA="0.9")
+    collection = engine.get_collection()
+    for chunk in (1, 2):
+        text = f"More pricing: pricing pricing page {chunk}."
+        collection.add(
+            documents=[text],
+            embeddings=engine.encoder.encode([text]),
+            metadatas=[{"source": "books/pricing.md", "chunk": chunk}],
+            ids=[f"books/pricing.md#{chunk}"],
+        )
+    contexts = engine.retrieve_context("pricing pricing", top_k=3)
+    sources = [ctx["metadata"]["source"] for ctx in contexts]
+    assert sources[0] == "books/pricing.md"
+    assert len(set(sources)) == 3
+
+    engine.set_retrieval_mode("dense")
+    dense = engine.retrieve_context("pricing pricing", top_k=3)
+    assert {ctx["metadata"]["source"] for ctx in dense} == {"books/pricing.md"}
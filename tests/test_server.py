@@ -0,0 +1,121 @@
+from __future__ import annotations
+
+import asyncio
+import importlib
+import threading
+
+import pytest
+from fastapi.testclient import TestClient
+
+from app.request_gate import GateFull, RequestGate
+
+
+def test_gate_coalesces_identical_requests_and_rejects_overflow():
+    async def scenario():
+        gate = RequestGate(max_pending=1)
+        release = asyncio.Event()
+        calls = []
+
+        async def work():
+            calls.append(1)
+            await release.wait()
+            return {"answer": "shared"}
+
+        leader = asyncio.ensure_future(gate.run("q", work))
+        follower = asyncio.ensure_future(gate.run("q", work))
+        await asyncio.sleep(0)
+        with pytest.raises(GateFull):
+            await gate.run("other", work)
+        release.set()
+        results = await asyncio.gather(leader, follower)
+        return gate, calls, results
+
+    gate, calls, results = asyncio.run(scenario())
+
+    assert calls == [1]
+    assert results == [{"answer": "shared"}, {"answer": "shared"}]
+    assert gate.stats()["coalesced"] == 1
+    assert gate.stats()["rejected"] == 1
+    assert gate.pending == 0
+
+
+def test_ask_endpoint_uses_local_query_engine(engine, monkeypatch):
+    monkeypatch.setenv("ASK_BACKEND", "local")
+    monkeypatch.setenv("SERVER_MAX_PENDING", "4")
+    main = importlib.reload(importlib.import_module("main"))
+
+    with TestClient(main.app) as client:
+        resp = client.get("/ask", params={"q": "How should pricing work?", "top_k": 1})
+        health = client.get("/health").json()
+
+    assert resp.status_code == 200
+    payload = resp.json()
+    assert payload["query"] == "How should pricing work?"
+    assert payload["sources"][0]["source"] == "books/pricing.md"
+    assert payload["llm"]["mode"] == "offline"
+    assert health["gate"]["pending"] == 0
+
+
+def test_answer_timings_feed_the_metrics_endpoint(engine, monkeypatch):
+    monkeypatch.setenv("ASK_BACKEND", "local")
+    main = importlib.reload(importlib.import_module("main"))
+    metrics = importlib.import_module("app.metrics")
+    metrics.stage_seconds.reset()
+
+    with TestClient(main.app) as client:
+        payload = client.get("/ask", params={"q": "How should pricing work?"}).json()
+        resp = client.get("/metrics")
+
+    stages = payload["timings"]["stages"]
+    assert {"retrieve", "encode", "vector_query", "llm"} <= set(stages)
+    assert payload["timings"]["total_ms"] >= stages["retrieve"] >= stages["vector_query"]
+    assert resp.headers["content-type"].startswith("text/plain")
+    text = resp.text
+    assert "# TYPE josefgpt_stage_seconds histogram" in text
+    assert 'josefgpt_stage_seconds_bucket{op="answer",stage="llm",le="+Inf"} 1' in text
+    assert 'josefgpt_stage_seconds_count{op="answer",stage="total"} 1' in text
+
+
+def test_histogram_buckets_are_cumulative():
+    from app.metrics import Histogram
+
+    histogram = Histogram("demo_seconds", "Demo.", buckets=(0.1, 1.0))
+    for value in (0.05, 0.5, 0.7, 5.0):
+        histogram.observe(value, stage="x")
+    lines = histogram.render()
+    assert 'demo_seconds_bucket{stage="x",le="0.1"} 1' in lines
+    assert 'demo_seconds_bucket{stage="x",le="1.0"} 3' in lines
+    assert 'demo_seconds_bucket{stage="x",le="+Inf"} 4' in lines
+    assert 'demo_seconds_sum{stage="x"} 6.250000' in lines
+
+
+def test_sse_disconnect_closes_the_answer_stream(engine, monkeypatch):
+    monkeypatch.setenv("ASK_BACKEND", "local")
+    main = importlib.reload(importlib.import_module("main"))
+    closed = threading.Event()
+
+    def endless_answer(question, **kwargs):
+        try:
+            yield {"type": "context", "sources": []}
+            while True:
+                yield {"type": "token", "text": "more "}
+        finally:
+            closed.set()
+
+    monkeypatch.setattr(main.query_engine, "answer_with_context_stream", endless_answer)
+    # Hold a reference, as a traceback cycle can, so only an explicit close ends the stream.
+    sse_events, kept = main._sse_events, []
+    monkeypatch.setattr(
+        main, "_sse_events", lambda *args: kept.append(sse_events(*args)) or kept[-1]
+    )
+
+    async def disconnect_after_two_events():
+        stream = main._sse_stream("Tips?", None, None, None)
+        assert (await stream.__anext__()).startswith("event: context")
+        assert (await stream.__anext__()).startswith("event: token")
+        await stream.aclose()
+
+    with TestClient(main.app):
+        asyncio.run(disconnect_after_two_events())
+        assert closed.wait(5)
+        assert main.app.state.gate.pending == 0
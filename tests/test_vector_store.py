@@ -0,0 +1,142 @@
+from __future__ import annotations
+
+import numpy as np
+import pytest
+
+from app.vector_store import NumpyStore
+from fakes import FakeCollection
+
+
+def _corpus(count=300, dim=16, seed=0):
+    rng = np.random.default_rng(seed)
+    vectors = rng.normal(size=(count, dim)).astype(np.float32)
+    ids = [f"books/doc{idx % 7}.md#{idx}" for idx in range(count)]
+    metadatas = [{"source": f"books/doc{idx % 7}.md", "chunk": idx} for idx in range(count)]
+    return ids, vectors, metadatas
+
+
+@pytest.mark.parametrize("dtype", ["float32", "float16", "int8"])
+def test_numpy_store_matches_exact_cosine_ranking(tmp_path, dtype):
+    ids, vectors, metadatas = _corpus()
+    store = NumpyStore(tmp_path / "store", dtype=dtype)
+    store.upsert(ids=ids, embeddings=vectors, documents=ids, metadatas=metadatas)
+    reference = FakeCollection("ref")
+    reference.add(ids, [list(v) for v in vectors], metadatas, ids)
+    queries = vectors[:5] + 0.05
+
+    got = store.query(query_embeddings=queries, n_results=5)
+    want = reference.query(query_embeddings=queries.tolist(), n_results=5, include=None)
+
+    for row in range(5):
+        overlap = len(set(got["ids"][row]) & set(want["ids"][row]))
+        assert overlap >= (5 if dtype == "float32" else 4)
+        assert got["distances"][row] == sorted(got["distances"][row])
+        assert got["documents"][row][0] == got["ids"][row][0]
+
+
+def test_numpy_store_delete_reuse_and_reopen(tmp_path):
+    ids, vectors, metadatas = _corpus(count=20)
+    store = NumpyStore(tmp_path / "store")
+    store.upsert(ids=ids, embeddings=vectors, documents=ids, metadatas=metadatas)
+
+    store.delete(where={"source": "books/doc0.md"})
+    removed = [item for item in ids if item.startswith("books/doc0.md")]
+    assert store.count() == len(ids) - len(removed)
+    hits = store.query(query_embeddings=[vectors[0]], n_results=3)["ids"][0]
+    assert ids[0] not in hits
+
+    store.upsert(ids=["new#0"], embeddings=[vectors[0]], documents=["fresh"], metadatas=[{}])
+    store.delete(ids=[ids[1]])
+
+    reopened = NumpyStore(tmp_path / "store", dtype="int8")  # stored dtype wins
+    assert reopened.dtype == "float32"
+    assert reopened.count() == len(ids) - len(removed)
+    assert reopened.query(query_embeddings=[vectors[0]], n_results=1)["ids"] == [["new#0"]]
+    fetched = reopened.get(ids=[ids[2]], include=["embeddings"])
+    expected = vectors[2] / np.linalg.norm(vectors[2])
+    assert np.allclose(fetched["embeddings"][0], expected, atol=1e-6)
+    assert (tmp_path / "store" / "vectors.bin").stat().st_size == 20 * 16 * 4
+
+
+def test_query_engine_reads_numpy_store(make_engine):
+    engine = make_engine(VECTOR_STORE="numpy")
+
+    contexts = engine.retrieve_context("pricing for a retainer", top_k=1)
+
+    assert isinstance(engine.get_collection(), NumpyStore)
+    assert contexts[0]["metadata"]["source"] == "books/pricing.md"
+    assert 0.0 < contexts[0]["score"] <= 1.0
+
+
+def test_mmr_retrieval_over_truncated_numpy_store(make_engine):
+    engine = make_engine(VECTOR_STORE="numpy", VECTOR_DIMS="2", RETRIEVAL_MODE="mmr")
+
+    contexts = engine.retrieve_context("pricing for a retainer", top_k=2)
+
+    assert engine.get_collection().dim == 2
+    assert contexts[0]["metadata"]["source"] == "books/pricing.md"
+
+
+def _clustered(count, dim=32, clusters=20, seed=1):
+    rng = np.random.default_rng(seed)
+    centers = rng.normal(size=(clusters, dim))
+    labels = rng.integers(0, clusters, size=count)
+    return (centers[labels] + 0.3 * rng.normal(size=(count, dim))).astype(np.float32)
+
+
+def test_ivf_index_recall_incremental_updates_and_persistence(tmp_path):
+    vectors = _clustered(2000)
+    ids = [f"c#{idx}" for idx in range(len(vectors))]
+    store = NumpyStore(tmp_path / "store", ann_index="ivf", nprobe=4)
+    store.upsert(ids=ids, embeddings=vectors, documents=ids)
+    assert store.search(vectors[:1], 5, nprobe=1)[0].shape == (1, 5)  # exact until built
+
+    built = store.build_index()
+    assert built["trained"] == 1 and built["nlist"] > 4
+    assert store.build_index()["trained"] == 0
+
+    queries = vectors[:50] + 0.01
+    exact_rows, _ = store.search(queries, 10, nprobe=built["nlist"])
+    ann_rows, _ = store.search(queries, 10)
+    recall = np.mean([len(set(a) & set(e)) / 10 for a, e in zip(ann_rows, exact_rows)])
+    assert recall >= 0.8
+
+    extra = _clustered(10, seed=7)
+    store.upsert(ids=[f"new#{idx}" for idx in range(10)], embeddings=extra)
+    store.delete(ids=["c#0"])
+    reopened = NumpyStore(tmp_path / "store", ann_index="ivf", nprobe=4)
+    hits = reopened.query(query_embeddings=extra[:3], n_results=1)["ids"]
+    assert hits == [["new#0"], ["new#1"], ["new#2"]]
+    assert "c#0" not in reopened.query(query_embeddings=vectors[:1], n_results=5)["ids"][0]
+
+
+def test_truncated_int8_store_rescores_with_full_precision_copy(tmp_path, capsys):
+    rng = np.random.default_rng(3)
+    decay = 1.0 / np.sqrt(1.0 + np.arange(32))  # leading components carry most of the signal
+    vectors = (rng.normal(size=(500, 32)) * decay).astype(np.float32)
+    ids = [f"m#{idx}" for idx in range(len(vectors))]
+    queries = vectors[:40] + (rng.normal(scale=0.05, size=(40, 32)) * decay).astype(np.float32)
+    baseline = NumpyStore(tmp_path / "baseline")
+    compact = NumpyStore(tmp_path / "compact", dtype="int8", dims=8)
+    rescored = NumpyStore(tmp_path / "rescored", dtype="int8", dims=8, rescore=40)
+    for store in (baseline, compact, rescored):
+        store.upsert(ids=ids, embeddings=vectors, documents=ids)
+
+    def recall(store):
+        found = store.query(query_embeddings=queries, n_results=5)["ids"]
+        truth = baseline.query(query_embeddings=queries, n_results=5)["ids"]
+        return np.mean([len(set(f) & set(t)) / 5 for f, t in zip(found, truth)])
+
+    assert recall(rescored) >= 0.95 and recall(rescored) > recall(compact)
+    got = rescored.query(query_embeddings=queries[:3], n_results=5, include=["embeddings"])
+    want = baseline.query(query_embeddings=queries[:3], n_results=5)
+    np.testing.assert_allclose(got["distances"], want["distances"], atol=1e-5)
+    assert len(got["embeddings"][0][0]) == 32
+    assert (tmp_path / "rescored" / "vectors.bin").stat().st_size == 500 * 8
+    assert (tmp_path / "rescored" / "full.bin").stat().st_size == 500 * 32 * 4
+    assert not (tmp_path / "compact" / "full.bin").exists()
+
+    reopened = NumpyStore(tmp_path / "compact", dtype="int8", dims=16, rescore=10)
+    assert (reopened.dims, reopened.full, reopened.rescore) == (8, False, 0)
+    assert "ignoring VECTOR_DIMS=16" in capsys.readouterr().out
+    assert len(reopened.get(ids=ids[:1], include=["embeddings"])["embeddings"][0]) == 8
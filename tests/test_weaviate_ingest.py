@@ -0,0 +1,212 @@
+from __future__ import annotations
+
+import importlib
+import json
+import threading
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+import pytest
+
+from agent_retriever_http_fix import WeaviateRetriever
+
+
+class FakeBatchHandler(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"
+    objects: dict = {}
+    flaky: set = set()
+    throttled_once = False
+    batch_sizes: list = []
+    replies: list = []  # "short" drops the last result, "garbage" sends strings as results
+
+    def do_GET(self):
+        self._send(200, {})
+
+    def do_POST(self):
+        cls = type(self)
+        body = self._body()
+        if not cls.throttled_once:
+            cls.throttled_once = True
+            self._send(429, {"error": [{"message": "slow down"}]}, {"Retry-After": "0"})
+            return
+        cls.batch_sizes.append(len(body["objects"]))
+        results = []
+        for obj in body["objects"]:
+            result = {}
+            if obj["id"] in cls.flaky:
+                cls.flaky.discard(obj["id"])
+                result = {"errors": {"error": [{"message": "shard busy"}]}}
+            else:
+                cls.objects[obj["id"]] = obj
+            results.append({"id": obj["id"], "result": result})
+        reply = cls.replies.pop(0) if cls.replies else None
+        if reply == "garbage":
+            self._send(200, ["stored"] * len(results))
+            return
+        if reply == "short":
+            cls.objects.pop(results.pop()["id"])
+        self._send(200, results)
+
+    def do_DELETE(self):
+        found = type(self).objects.pop(self.path.rsplit("/", 1)[-1], None)
+        self.send_response(204 if found else 404)
+        self.send_header("Content-Length", "0")
+        self.end_headers()
+
+    def _body(self):
+        return json.loads(self.rfile.read(int(self.headers["Content-Length"])))
+
+    def _send(self, status, payload, headers=None):
+        raw = json.dumps(payload).encode("utf-8")
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(raw)))
+        for key, value in (headers or {}).items():
+            self.send_header(key, value)
+        self.end_headers()
+        self.wfile.write(raw)
+
+    def log_message(self, *args):
+        pass
+
+
+@pytest.fixture
+def weaviate(monkeypatch, tmp_path):
+    FakeBatchHandler.objects = {}
+    FakeBatchHandler.flaky = set()
+    FakeBatchHandler.throttled_once = False
+    FakeBatchHandler.batch_sizes = []
+    FakeBatchHandler.replies = []
+    server = ThreadingHTTPServer(("127.0.0.1", 0), FakeBatchHandler)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    yield WeaviateRetriever(f"http://127.0.0.1:{server.server_address[1]}")
+    server.shutdown()
+
+
+def test_bulk_ingest_retries_and_resumes(monkeypatch, tmp_path, weaviate):
+    source_dir = tmp_path / "books"
+    source_dir.mkdir()
+    long_doc = source_dir / "long.md"
+    long_doc.write_text("\n\n".join(f"Sales lesson {idx}. " * 40 for idx in range(12)), "utf-8")
+    (source_dir / "short.txt").write_text("Pricing a retainer starts with value.", "utf-8")
+    # Same words in its path as long.md: trimming long.md must not touch it.
+    (source_dir / "advanced").mkdir()
+    (source_dir / "advanced" / "long.md").write_text(long_doc.read_text("utf-8"), "utf-8")
+    monkeypatch.setenv("EMBEDDINGS_PATH", str(tmp_path / "embeddings"))
+    monkeypatch.setenv("USE_OPENAI_EMBEDDINGS", "false")
+    importlib.reload(importlib.import_module("app.config"))
+    importlib.reload(importlib.import_module("ingest_books"))
+    agent_ingest_index = importlib.reload(importlib.import_module("agent_ingest_index"))
+    monkeypatch.setattr(
+        agent_ingest_index.ingest_books,
+        "embed_chunks",
+        lambda chunks: [[float(len(chunk)), 1.0] for chunk in chunks],
+    )
+    FakeBatchHandler.flaky = {
+        agent_ingest_index.object_id("books/long.md", 0),
+        agent_ingest_index.object_id("books/short.txt", 0),
+    }
+
+    first = agent_ingest_index.ingest_to_weaviate([source_dir], retriever=weaviate, batch_size=4)
+
+    stored = FakeBatchHandler.objects
+    assert first["files"] == 3
+    assert first["failed"] == 0
+    assert first["retried"] >= 2
+    assert len(stored) == first["chunks"]
+    assert {obj["properties"]["source"] for obj in stored.values()} == {
+        "books/long.md",
+        "books/advanced/long.md",
+        "books/short.txt",
+    }
+    assert all(obj["vector"][1] == 1.0 for obj in stored.values())
+
+    second = agent_ingest_index.ingest_to_weaviate([source_dir], retriever=weaviate)
+    assert second["files"] == 0
+    assert second["skipped"] == 3
+
+    long_doc.write_text("Only one short sales lesson now.", "utf-8")
+    third = agent_ingest_index.ingest_to_weaviate([source_dir], retriever=weaviate)
+    assert third["files"] == 1
+    sources = [obj["properties"]["source"] for obj in stored.values()]
+    assert sources.count("books/long.md") == 1
+    assert sources.count("books/advanced/long.md") > 1
+
+
+def test_window_error_is_not_checkpointed(monkeypatch, tmp_path, weaviate):
+    source_dir = tmp_path / "books"
+    source_dir.mkdir()
+    (source_dir / "broken.txt").write_text("Pricing a retainer starts with value.", "utf-8")
+    monkeypatch.setenv("EMBEDDINGS_PATH", str(tmp_path / "embeddings"))
+    monkeypatch.setenv("USE_OPENAI_EMBEDDINGS", "false")
+    importlib.reload(importlib.import_module("app.config"))
+    ingest_books = importlib.reload(importlib.import_module("ingest_books"))
+    agent_ingest_index = importlib.reload(importlib.import_module("agent_ingest_index"))
+    monkeypatch.setattr(ingest_books, "embed_chunks", lambda chunks: [[1.0, 0.0]] * len(chunks))
+    extract_window = ingest_books.extract_window
+    monkeypatch.setattr(
+        ingest_books,
+        "extract_window",
+        lambda *args: ingest_books.ExtractedWindow(args[1], [], [], error="unreadable"),
+    )
+
+    first = agent_ingest_index.ingest_to_weaviate([source_dir], retriever=weaviate)
+    assert first["files"] == 0 and first["failed_files"] == 1
+    assert not FakeBatchHandler.objects
+
+    monkeypatch.setattr(ingest_books, "extract_window", extract_window)
+    second = agent_ingest_index.ingest_to_weaviate([source_dir], retriever=weaviate)
+    assert second["files"] == 1 and second["skipped"] == 0
+    assert len(FakeBatchHandler.objects) == second["chunks"] == 1
+
+
+def test_embedding_error_fails_only_that_source(monkeypatch, tmp_path, weaviate):
+    source_dir = tmp_path / "books"
+    source_dir.mkdir()
+    (source_dir / "brand.txt").write_text("Brand building compounds.", "utf-8")
+    (source_dir / "pricing.txt").write_text("Pricing a retainer starts with value.", "utf-8")
+    monkeypatch.setenv("EMBEDDINGS_PATH", str(tmp_path / "embeddings"))
+    monkeypatch.setenv("USE_OPENAI_EMBEDDINGS", "false")
+    importlib.reload(importlib.import_module("app.config"))
+    ingest_books = importlib.reload(importlib.import_module("ingest_books"))
+    agent_ingest_index = importlib.reload(importlib.import_module("agent_ingest_index"))
+    FakeBatchHandler.throttled_once = True
+
+    def embed(chunks):
+        if any("Brand" in chunk for chunk in chunks):
+            raise RuntimeError("rate limited")
+        return [[1.0, 0.0]] * len(chunks)
+
+    monkeypatch.setattr(ingest_books, "embed_chunks", embed)
+    first = agent_ingest_index.ingest_to_weaviate([source_dir], retriever=weaviate)
+    assert first["files"] == 1 and first["failed_files"] == 1
+    assert [obj["properties"]["source"] for obj in FakeBatchHandler.objects.values()] == [
+        "books/pricing.txt"
+    ]
+
+    monkeypatch.setattr(ingest_books, "embed_chunks", lambda chunks: [[1.0, 0.0]] * len(chunks))
+    second = agent_ingest_index.ingest_to_weaviate([source_dir], retriever=weaviate)
+    assert second["files"] == 1 and second["skipped"] == 1
+
+
+def test_malformed_batch_replies_fail_or_retry_objects(monkeypatch, tmp_path, weaviate):
+    source_dir = tmp_path / "books"
+    source_dir.mkdir()
+    (source_dir / "short.txt").write_text("Pricing a retainer starts with value.", "utf-8")
+    monkeypatch.setenv("EMBEDDINGS_PATH", str(tmp_path / "embeddings"))
+    monkeypatch.setenv("USE_OPENAI_EMBEDDINGS", "false")
+    importlib.reload(importlib.import_module("app.config"))
+    ingest_books = importlib.reload(importlib.import_module("ingest_books"))
+    agent_ingest_index = importlib.reload(importlib.import_module("agent_ingest_index"))
+    monkeypatch.setattr(ingest_books, "embed_chunks", lambda chunks: [[1.0, 0.0]] * len(chunks))
+    FakeBatchHandler.throttled_once = True
+
+    FakeBatchHandler.replies = ["short"]
+    first = agent_ingest_index.ingest_to_weaviate([source_dir], retriever=weaviate)
+    assert first["retried"] == 1 and first["failed"] == 0
+    assert len(FakeBatchHandler.objects) == 1
+
+    FakeBatchHandler.objects.clear()
+    FakeBatchHandler.replies = ["garbage"]
+    second = agent_ingest_index.ingest_to_weaviate([source_dir], retriever=weaviate, force=True)
+    assert second["failed"] == 1 and second["failed_files"] == 1
+    assert not FakeBatchHandler.replies  # one malformed reply fails the batch without a retry
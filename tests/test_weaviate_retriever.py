@@ -0,0 +1,105 @@
+from __future__ import annotations
+
+import json
+import re
+import threading
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+import pytest
+
+from agent_retriever_http_fix import WeaviateRetriever, WeaviateUnavailable
+
+
+class FakeWeaviateHandler(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"  # keep-alive, so reused connections are observable
+    ready = True
+    client_ports: set = set()
+    requests_seen: list = []
+
+    def do_GET(self):
+        type(self).client_ports.add(self.client_address[1])
+        self._send(200 if type(self).ready else 503, {})
+
+    def do_POST(self):
+        cls = type(self)
+        cls.client_ports.add(self.client_address[1])
+        cls.requests_seen.append(self.path)
+        body = json.loads(self.rfile.read(int(self.headers["Content-Length"])))
+        if self.path == "/v1/graphql/batch":
+            self._send(200, [self._answer(item["query"]) for item in body])
+        else:
+            self._send(200, self._answer(body["query"]))
+
+    def _answer(self, query):
+        concept = json.loads(re.search(r"concepts: \[(\".*?\")\]", query).group(1))
+        limit = int(re.search(r"limit: (\d+)", query).group(1))
+        docs = [
+            {"content": f"{concept} #{idx}", "_additional": {"distance": 0.1}}
+            for idx in range(limit)
+        ]
+        return {"data": {"Get": {"Document": docs}}}
+
+    def _send(self, status, payload):
+        raw = json.dumps(payload).encode("utf-8")
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(raw)))
+        self.end_headers()
+        self.wfile.write(raw)
+
+    def log_message(self, *args):
+        pass
+
+
+@pytest.fixture
+def weaviate_url():
+    FakeWeaviateHandler.ready = True
+    FakeWeaviateHandler.client_ports = set()
+    FakeWeaviateHandler.requests_seen = []
+    server = ThreadingHTTPServer(("127.0.0.1", 0), FakeWeaviateHandler)
+    thread = threading.Thread(target=server.serve_forever, daemon=True)
+    thread.start()
+    yield f"http://127.0.0.1:{server.server_address[1]}"
+    server.shutdown()
+
+
+def test_retriever_reuses_one_connection_and_batches(weaviate_url):
+    retriever = WeaviateRetriever(weaviate_url, openai_api_key="sk-test", limit=2)
+
+    first = retriever.search('How do I "close" a deal?')
+    second = retriever.search("Pricing?", limit=3)
+    batched = retriever.search_many(["brand", "sales"])
+
+    assert [doc["content"] for doc in first] == [
+        'How do I "close" a deal? #0',
+        'How do I "close" a deal? #1',
+    ]
+    assert len(second) == 3
+    assert [[doc["content"] for doc in docs] for docs in batched] == [
+        ["brand #0", "brand #1"],
+        ["sales #0", "sales #1"],
+    ]
+    assert FakeWeaviateHandler.requests_seen.count("/v1/graphql/batch") == 1
+    assert len(FakeWeaviateHandler.client_ports) == 1
+    assert retriever.sessions_created == 1
+
+
+def test_retriever_reconnects_after_failed_health_check(weaviate_url):
+    retriever = WeaviateRetriever(weaviate_url, health_interval=0.0)
+    retriever.search("warm")
+
+    FakeWeaviateHandler.ready = False
+    with pytest.raises(WeaviateUnavailable):
+        retriever.search("down")
+    FakeWeaviateHandler.ready = True
+
+    assert retriever.search("back")[0]["content"] == "back #0"
+    assert retriever.sessions_created >= 2
+
+
+@pytest.mark.parametrize("value, limit", [("", 1), ("three", 1), ("0", 1), (" 4 ", 4)])
+def test_from_env_parses_limit_leniently(monkeypatch, value, limit):
+    monkeypatch.setenv("WEAVIATE_URL", "http://127.0.0.1:9")
+    monkeypatch.setenv("OPENAI_API_KEY", "sk-test")
+    monkeypatch.setenv("WEAVIATE_LIMIT", value)
+    assert WeaviateRetriever.from_env().limit == limit